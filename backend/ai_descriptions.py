@@ -0,0 +1,254 @@
+"""
+AI service description generator
+Descriptions are cached by normalized (title, category, additional_info):
+- in-process LRU + TTL with single-flight, so identical in-flight requests share one LLM call
+- Mongo tier (ai_descriptions, TTL index on expires_at) shared across workers and restarts
+LLM calls are capped at LLM_MAX_CONCURRENCY and bounded by LLM_TIMEOUT_SECONDS; on timeout
+or error the template description is returned and nothing is cached.
+
+stream_description() yields tokens as they arrive for the SSE endpoint. It streams through
+litellm and falls back to the blocking path when a stream cannot be opened. Like LlmChat,
+it sends Emergent universal keys to the Emergent LLM proxy and provider keys straight to
+the provider; LLM_API_BASE overrides the endpoint for both.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Optional
+
+import integrations
+from cache import ResponseCache, make_key
+from metrics import observe_outbound
+
+logger = logging.getLogger(__name__)
+
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 4))
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', 15))
+LLM_API_BASE = os.environ.get('LLM_API_BASE') or None
+# Where LlmChat sends EMERGENT_LLM_KEY; OpenAI itself rejects these keys
+EMERGENT_LLM_PROXY = "https://integrations.emergentagent.com/llm"
+EMERGENT_KEY_PREFIX = "sk-emergent-"
+DESCRIPTION_CACHE_SIZE = int(os.environ.get('DESCRIPTION_CACHE_SIZE', 512))
+DESCRIPTION_CACHE_TTL = float(os.environ.get('DESCRIPTION_CACHE_TTL', 7 * 24 * 3600))
+
+SYSTEM_MESSAGE = "You are a professional service description writer. Create compelling, professional service descriptions that highlight key benefits and attract customers. Keep it concise (2-3 sentences, max 150 words)."
+LLM_PROVIDER = "openai"
+LLM_MODEL = "gpt-4o-mini"
+
+description_cache = ResponseCache(maxsize=DESCRIPTION_CACHE_SIZE, ttl=DESCRIPTION_CACHE_TTL)
+_llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+
+def normalize(text) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def cache_key(title: str, category: str, additional_info=None) -> tuple:
+    return make_key(
+        "description",
+        title=normalize(title),
+        category=normalize(category),
+        additional_info=normalize(additional_info),
+    )
+
+
+def storage_key(key: tuple) -> str:
+    return hashlib.sha256(repr(key).encode()).hexdigest()
+
+
+def build_prompt(title: str, category: str, additional_info=None) -> str:
+    prompt = f"Create a professional service description for: {title} in category {category}."
+    if additional_info:
+        prompt += f" Additional info: {additional_info}"
+    return prompt
+
+
+def fallback_description(title: str, category: str) -> str:
+    return f"Professional {category} service - {title}. Contact us for more details."
+
+
+async def new_chat():
+    # The LLM SDK is imported on first use, not at worker boot
+    llm = await integrations.aget("llm")
+    return llm.LlmChat(
+        api_key=os.environ.get('EMERGENT_LLM_KEY'),
+        session_id=f"service-desc-{datetime.utcnow().timestamp()}",
+        system_message=SYSTEM_MESSAGE
+    ).with_model(LLM_PROVIDER, LLM_MODEL)
+
+
+@asynccontextmanager
+async def _llm_slot(timeout: Optional[float] = None):
+    """
+    Hold one of the LLM_MAX_CONCURRENCY slots; waiting longer than timeout raises TimeoutError
+    A wait that is cancelled or times out never keeps a permit, even when the acquire
+    completes at the same moment (which Semaphore.acquire can leak before Python 3.12).
+    """
+    acquire = asyncio.ensure_future(_llm_semaphore.acquire())
+    try:
+        await asyncio.wait_for(asyncio.shield(acquire), timeout)
+    except BaseException:
+        acquire.add_done_callback(_release_if_acquired)
+        acquire.cancel()
+        raise
+    try:
+        yield
+    finally:
+        _llm_semaphore.release()
+
+
+def _release_if_acquired(acquire: asyncio.Future):
+    if not acquire.cancelled() and acquire.exception() is None:
+        _llm_semaphore.release()
+
+
+async def _call_llm(prompt: str) -> str:
+    # Queueing for a slot counts against the timeout too
+    async with _llm_slot():
+        async with observe_outbound("llm", "generate_description"):
+            llm = await integrations.aget("llm")
+            chat = await new_chat()
+            return await chat.send_message(llm.UserMessage(text=prompt))
+
+
+async def load_stored(key: tuple):
+    from database import ai_descriptions_collection
+
+    doc = await ai_descriptions_collection.find_one(
+        {"key": storage_key(key), "expires_at": {"$gt": datetime.utcnow()}},
+        {"_id": 0, "description": 1}
+    )
+    return doc['description'] if doc else None
+
+
+async def store(key: tuple, description: str):
+    from database import ai_descriptions_collection
+
+    now = datetime.utcnow()
+    try:
+        await ai_descriptions_collection.update_one(
+            {"key": storage_key(key)},
+            {"$set": {
+                "description": description,
+                "created_at": now,
+                # BSON date, required by the TTL index
+                "expires_at": now + timedelta(seconds=DESCRIPTION_CACHE_TTL),
+            }},
+            upsert=True
+        )
+    except Exception as e:
+        logger.warning(f"Failed to persist AI description: {e}")
+
+
+async def _load_or_generate(key: tuple, prompt: str) -> str:
+    description = await load_stored(key)
+    if description:
+        return description
+    description = await asyncio.wait_for(_call_llm(prompt), LLM_TIMEOUT_SECONDS)
+    if not description:
+        raise ValueError("LLM returned an empty description")
+    await store(key, description)
+    return description
+
+
+async def generate_description(title: str, category: str, additional_info=None) -> str:
+    key = cache_key(title, category, additional_info)
+    prompt = build_prompt(title, category, additional_info)
+    try:
+        return await description_cache.get_or_compute(key, lambda: _load_or_generate(key, prompt))
+    except Exception as e:
+        # Failures are never cached; the next request retries the LLM
+        logger.error(f"AI description generation failed: {e!r}")
+        return fallback_description(title, category)
+
+
+def stream_api_base(api_key: Optional[str]) -> Optional[str]:
+    """The endpoint for a streaming call with api_key, matching what LlmChat uses"""
+    if LLM_API_BASE:
+        return LLM_API_BASE
+    if api_key and api_key.startswith(EMERGENT_KEY_PREFIX):
+        return EMERGENT_LLM_PROXY
+    return None
+
+
+async def _open_stream(prompt: str):
+    litellm = await integrations.aget("llm_stream")
+    api_key = os.environ.get('EMERGENT_LLM_KEY')
+    return await litellm.acompletion(
+        model=f"{LLM_PROVIDER}/{LLM_MODEL}",
+        messages=[
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": prompt},
+        ],
+        api_key=api_key,
+        api_base=stream_api_base(api_key),
+        stream=True,
+    )
+
+
+async def _close_stream(stream):
+    close = getattr(stream, "aclose", None)
+    if close:
+        try:
+            await close()
+        except Exception:
+            pass
+
+
+async def stream_description(title: str, category: str, additional_info=None):
+    """
+    Yield ("delta", {"text": ...}) events as tokens arrive, then one
+    ("done", {"description": ..., "fallback": bool}) with the full text.
+    Cancelling the consumer (client disconnect) closes the upstream stream and frees the slot.
+    """
+    key = cache_key(title, category, additional_info)
+    description = description_cache.get(key) or await load_stored(key)
+    if description:
+        yield "done", {"description": description, "fallback": False}
+        return
+
+    parts = []
+    stream = None
+    try:
+        async with _llm_slot(LLM_TIMEOUT_SECONDS):
+            try:
+                async with observe_outbound("llm", "stream_description"):
+                    stream = await asyncio.wait_for(_open_stream(build_prompt(title, category, additional_info)),
+                                                    LLM_TIMEOUT_SECONDS)
+                    chunks = stream.__aiter__()
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), LLM_TIMEOUT_SECONDS)
+                        except StopAsyncIteration:
+                            break
+                        text = chunk.choices[0].delta.content if chunk.choices else None
+                        if text:
+                            parts.append(text)
+                            yield "delta", {"text": text}
+            finally:
+                if stream is not None:
+                    await _close_stream(stream)
+    except asyncio.TimeoutError:
+        logger.error("AI description stream timed out")
+        yield "done", {"description": fallback_description(title, category), "fallback": True}
+        return
+    except Exception as e:
+        logger.error(f"AI description stream failed: {e!r}")
+        if not parts:
+            # Streaming unavailable: use the blocking path, which has its own fallback
+            description = await generate_description(title, category, additional_info)
+            yield "done", {"description": description, "fallback": description == fallback_description(title, category)}
+        else:
+            yield "done", {"description": fallback_description(title, category), "fallback": True}
+        return
+
+    description = "".join(parts).strip()
+    if not description:
+        yield "done", {"description": fallback_description(title, category), "fallback": True}
+        return
+    description_cache.put(key, description)
+    await store(key, description)
+    yield "done", {"description": description, "fallback": False}
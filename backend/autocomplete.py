@@ -0,0 +1,231 @@
+"""
+Type-ahead suggestions for the browse UI
+An in-memory sorted-array prefix index over service titles, categories and provider names.
+Lookups never touch Mongo: bisect to the prefix range, then take the top-k by popularity.
+Writes update the index incrementally in the worker that handled them; a periodic rebuild
+(AUTOCOMPLETE_REBUILD_SECONDS) reconciles changes made through other workers.
+"""
+import asyncio
+import bisect
+import heapq
+import logging
+import os
+import re
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+AUTOCOMPLETE_REBUILD_SECONDS = float(os.environ.get('AUTOCOMPLETE_REBUILD_SECONDS', 300))
+MAX_SUGGESTIONS = 20
+# Prefixes this short match huge ranges; their top-k lists are memoized until the next write
+MEMO_PREFIX_LENGTH = 2
+# Categories are few but always relevant
+CATEGORY_BOOST = 5.0
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize(text: str) -> str:
+    return " ".join(_WORD_RE.findall((text or "").lower()))
+
+
+class _Term:
+    __slots__ = ("kind", "text", "ref", "count", "weight")
+
+    def __init__(self, kind: str, text: str, ref: Optional[str]):
+        self.kind = kind
+        self.text = text
+        self.ref = ref
+        self.count = 0
+        self.weight = 0.0
+
+
+class PrefixIndex:
+    def __init__(self):
+        # (kind, normalized text) -> term
+        self._terms: Dict[Tuple[str, str], _Term] = {}
+        # sorted (fragment, term key) pairs; one fragment per word start of each term
+        self._fragments: List[Tuple[str, Tuple[str, str]]] = []
+        # service_id -> (title, category, weight); provider_id -> (name, weight)
+        self._services: Dict[str, Tuple[str, str, float]] = {}
+        self._providers: Dict[str, Tuple[str, float]] = {}
+        self._memo: Dict[Tuple[str, int], list] = {}
+        self._bulk = False
+
+    def __len__(self):
+        return len(self._terms)
+
+    @staticmethod
+    def _word_starts(normalized: str):
+        words = normalized.split(" ")
+        for i in range(len(words)):
+            yield " ".join(words[i:])
+
+    def _add(self, kind: str, text: str, weight: float, ref: Optional[str] = None):
+        normalized = normalize(text)
+        if not normalized:
+            return
+        key = (kind, normalized)
+        term = self._terms.get(key)
+        if term is None:
+            term = self._terms[key] = _Term(kind, text, ref)
+            for fragment in self._word_starts(normalized):
+                if self._bulk:
+                    self._fragments.append((fragment, key))
+                else:
+                    bisect.insort(self._fragments, (fragment, key))
+        term.count += 1
+        term.weight += weight
+        self._memo.clear()
+
+    def _remove(self, kind: str, text: str, weight: float):
+        normalized = normalize(text)
+        key = (kind, normalized)
+        term = self._terms.get(key)
+        if term is None:
+            return
+        term.count -= 1
+        term.weight -= weight
+        if term.count <= 0:
+            del self._terms[key]
+            for fragment in self._word_starts(normalized):
+                i = bisect.bisect_left(self._fragments, (fragment, key))
+                if i < len(self._fragments) and self._fragments[i] == (fragment, key):
+                    del self._fragments[i]
+        self._memo.clear()
+
+    @contextmanager
+    def bulk_load(self):
+        """Append fragments unsorted and sort once at the end; for the initial build"""
+        self._bulk = True
+        try:
+            yield self
+        finally:
+            self._bulk = False
+            self._fragments.sort()
+            self._memo.clear()
+
+    # Incremental maintenance
+
+    def set_service(self, service_id: str, title: str, category: str, weight: Optional[float] = None):
+        if weight is None:
+            weight = self._services.get(service_id, (None, None, 1.0))[2]
+        self.remove_service(service_id)
+        self._add("service", title, weight)
+        self._add("category", category, CATEGORY_BOOST)
+        self._services[service_id] = (title, category, weight)
+
+    def remove_service(self, service_id: str):
+        previous = self._services.pop(service_id, None)
+        if previous:
+            title, category, weight = previous
+            self._remove("service", title, weight)
+            self._remove("category", category, CATEGORY_BOOST)
+
+    def set_provider(self, provider_id: str, full_name: str, weight: Optional[float] = None):
+        if weight is None:
+            weight = self._providers.get(provider_id, (None, 1.0))[1]
+        self.remove_provider(provider_id)
+        # One term per provider so namesakes stay separate suggestions
+        self._add(f"provider:{provider_id}", full_name, weight, ref=provider_id)
+        self._providers[provider_id] = (full_name, weight)
+
+    def remove_provider(self, provider_id: str):
+        previous = self._providers.pop(provider_id, None)
+        if previous:
+            full_name, weight = previous
+            self._remove(f"provider:{provider_id}", full_name, weight)
+
+    def add_category(self, name: str):
+        # Known categories are suggested even before any service uses them
+        self._add("category", name, CATEGORY_BOOST)
+
+    # Lookup
+
+    def suggest(self, prefix: str, limit: int = 10) -> list:
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        limit = min(max(limit, 1), MAX_SUGGESTIONS)
+
+        memo_key = (prefix, limit)
+        if len(prefix) <= MEMO_PREFIX_LENGTH and memo_key in self._memo:
+            return self._memo[memo_key]
+
+        fragments = self._fragments
+        i = bisect.bisect_left(fragments, (prefix,))
+        matched = set()
+        while i < len(fragments) and fragments[i][0].startswith(prefix):
+            matched.add(fragments[i][1])
+            i += 1
+
+        terms = heapq.nlargest(limit, (self._terms[key] for key in matched), key=lambda t: (t.weight, -len(t.text)))
+        suggestions = [
+            {
+                "text": term.text,
+                "type": "provider" if term.ref else term.kind,
+                "id": term.ref,
+                "weight": round(term.weight, 2),
+            }
+            for term in terms
+        ]
+        if len(prefix) <= MEMO_PREFIX_LENGTH:
+            self._memo[memo_key] = suggestions
+        return suggestions
+
+
+class Autocomplete:
+    """Owns the live PrefixIndex and rebuilds it from Mongo"""
+
+    def __init__(self):
+        self.index = PrefixIndex()
+        self._rebuild_task: Optional[asyncio.Task] = None
+
+    async def build(self):
+        from categories import SERVICE_CATEGORIES
+        from database import users_collection, services_collection, provider_profiles_collection
+
+        index = PrefixIndex()
+        with index.bulk_load():
+            for category in SERVICE_CATEGORIES:
+                index.add_category(category["name"])
+
+            async for service in services_collection.find(
+                {}, {"_id": 0, "id": 1, "title": 1, "category": 1, "provider_bookings": 1}
+            ):
+                index.set_service(service['id'], service.get('title', ''), service.get('category', ''),
+                                  1.0 + (service.get('provider_bookings') or 0))
+
+            bookings = {}
+            async for profile in provider_profiles_collection.find({}, {"_id": 0, "user_id": 1, "total_bookings": 1}):
+                bookings[profile['user_id']] = profile.get('total_bookings') or 0
+            async for provider in users_collection.find(
+                {"user_type": "provider", "is_active": True}, {"_id": 0, "id": 1, "full_name": 1}
+            ):
+                index.set_provider(provider['id'], provider.get('full_name', ''), 1.0 + bookings.get(provider['id'], 0))
+
+        # Swap atomically; lookups in flight keep using the old index
+        self.index = index
+        logger.info(f"Autocomplete index built with {len(index)} terms")
+
+    async def _rebuild_periodically(self):
+        while True:
+            await asyncio.sleep(AUTOCOMPLETE_REBUILD_SECONDS)
+            try:
+                await self.build()
+            except Exception as e:
+                logger.error(f"Autocomplete rebuild failed: {e}")
+
+    async def start(self):
+        await self.build()
+        if AUTOCOMPLETE_REBUILD_SECONDS > 0:
+            self._rebuild_task = asyncio.create_task(self._rebuild_periodically())
+
+    async def stop(self):
+        if self._rebuild_task:
+            self._rebuild_task.cancel()
+            self._rebuild_task = None
+
+
+autocomplete = Autocomplete()
@@ -0,0 +1,6 @@
+"""
+Benchmark tooling for the QuickOne API
+- seed.py: synthetic data generator for a local mongod
+- loadtest.py: load harness for the hot endpoints, reports JSON
+- importtime.py: worker cold-start import budget
+"""
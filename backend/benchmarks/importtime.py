@@ -0,0 +1,103 @@
+"""
+Cold-start import benchmark for the API worker
+Runs `python -X importtime -c "import server"` in a fresh interpreter, reports the slowest
+imports, and exits non-zero when the total exceeds the budget or when a lazily loaded
+integration (integrations.LAZY_MODULES) is pulled in at boot.
+
+Usage (from backend/):
+    python -m benchmarks.importtime
+    python -m benchmarks.importtime --budget-ms 1500 --top 15 --runs 3 --out importtime.json
+    IMPORT_BUDGET_MS=4000 python -m benchmarks.importtime
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+
+from integrations import LAZY_MODULES
+
+ROOT_DIR = Path(__file__).parent.parent
+# Slow CI runners can raise the budget without touching the code
+DEFAULT_BUDGET_MS = float(os.environ.get('IMPORT_BUDGET_MS', 2000))
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)\s*$")
+
+
+def parse_importtime(stderr: str) -> list:
+    """(module, self_us, cumulative_us, depth) for every line of -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append((module, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return rows
+
+
+def measure(target: str = "server") -> list:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=ROOT_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        # Import errors go to stderr after the timing lines
+        raise RuntimeError(f"import {target} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def lazy_violations(rows: list) -> list:
+    return sorted({
+        module for module, _, _, _ in rows
+        if any(module == lazy or module.startswith(lazy + ".") for lazy in LAZY_MODULES)
+    })
+
+
+def main(args) -> int:
+    totals = []
+    rows = []
+    for _ in range(args.runs):
+        rows = measure(args.target)
+        target_row = next((row for row in rows if row[0] == args.target), None)
+        totals.append(target_row[2] / 1000 if target_row else 0.0)
+    # Best of N: the run least disturbed by the rest of the machine
+    total_ms = min(totals)
+
+    slowest = sorted((row for row in rows if row[3] == 0), key=lambda row: row[2], reverse=True)[:args.top]
+    violations = lazy_violations(rows)
+
+    report = {
+        "target": args.target,
+        "total_ms": round(total_ms, 1),
+        "runs_ms": [round(t, 1) for t in totals],
+        "budget_ms": args.budget_ms,
+        "slowest_top_level": [{"module": m, "cumulative_ms": round(c / 1000, 1)} for m, _, c, _ in slowest],
+        "lazy_violations": violations,
+    }
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+
+    print(f"import {args.target}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms, best of {args.runs})")
+    for entry in report["slowest_top_level"]:
+        print(f"  {entry['cumulative_ms']:>8.1f} ms  {entry['module']}")
+
+    failed = False
+    if violations:
+        print(f"FAIL: imported at boot but registered as lazy: {', '.join(violations)}")
+        failed = True
+    if total_ms > args.budget_ms:
+        print(f"FAIL: {total_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure and budget API worker import time")
+    parser.add_argument("--target", default="server", help="module to import")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=10, help="slowest top-level imports to list")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--out", help="write the JSON report here")
+    sys.exit(main(parser.parse_args()))
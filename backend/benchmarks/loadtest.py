@@ -0,0 +1,233 @@
+"""
+Load harness for the hot QuickOne endpoints
+Runs each scenario with a fixed number of concurrent workers for a fixed duration
+against a running server seeded by benchmarks.seed, and writes machine-readable JSON
+so runs can be diffed across commits.
+
+Usage (from backend/):
+    python -m benchmarks.loadtest --base-url http://localhost:8001 --out bench_output.json
+    python -m benchmarks.loadtest --scenarios services_geo,providers --concurrency 32 --duration 30
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+import websockets
+
+from benchmarks.seed import BENCH_PASSWORD, CITY_CENTRES, EMAIL_DOMAIN
+
+ROOT_DIR = Path(__file__).parent.parent
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies: list, errors: int, elapsed: float) -> dict:
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "min": round(latencies[0] * 1000, 2) if latencies else 0.0,
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        },
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT_DIR, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+class LoadTest:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.customer_tokens = []
+        self.customer_bookings = []  # (token, user_id, booking_id)
+        self.admin_token = None
+
+    async def _login(self, client: httpx.AsyncClient, email: str):
+        response = await client.post("/api/auth/login", json={"email": email, "password": BENCH_PASSWORD})
+        response.raise_for_status()
+        return response.json()
+
+    async def setup(self, client: httpx.AsyncClient):
+        """Log in a pool of seeded customers and the seeded admin"""
+        for i in range(self.args.customers):
+            try:
+                data = await self._login(client, f"customer{i}@{EMAIL_DOMAIN}")
+            except httpx.HTTPStatusError:
+                continue
+            token = data["access_token"]
+            self.customer_tokens.append(token)
+            bookings = await client.get("/api/bookings", headers={"Authorization": f"Bearer {token}"})
+            for booking in bookings.json()[:3]:
+                self.customer_bookings.append((token, data["user"]["id"], booking["id"]))
+
+        data = await self._login(client, f"bench-admin@{EMAIL_DOMAIN}")
+        self.admin_token = data["access_token"]
+
+    def _geo_params(self):
+        _, lat, lon = self.rng.choice(CITY_CENTRES)
+        return {
+            "latitude": round(lat + self.rng.uniform(-0.1, 0.1), 4),
+            "longitude": round(lon + self.rng.uniform(-0.1, 0.1), 4),
+            "max_distance": self.rng.choice([5, 10, 25, 50]),
+        }
+
+    # Each scenario performs one request and returns when it completes
+
+    async def services_geo(self, client):
+        params = self._geo_params()
+        params["sort_by"] = self.rng.choice(["distance", "price"])
+        response = await client.get("/api/services", params=params)
+        response.raise_for_status()
+
+    async def providers(self, client):
+        response = await client.get("/api/providers", params=self._geo_params())
+        response.raise_for_status()
+
+    async def bookings(self, client):
+        token = self.rng.choice(self.customer_tokens)
+        response = await client.get("/api/bookings", headers={"Authorization": f"Bearer {token}"})
+        response.raise_for_status()
+
+    async def admin_stats(self, client):
+        response = await client.get("/api/admin/stats", headers={"Authorization": f"Bearer {self.admin_token}"})
+        response.raise_for_status()
+
+    SCENARIOS = ("services_geo", "providers", "bookings", "admin_stats", "chat_ws")
+
+    async def _run_http(self, name: str, client: httpx.AsyncClient) -> dict:
+        request = getattr(self, name)
+        latencies, errors = [], 0
+        deadline = time.perf_counter() + self.args.duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    await request(client)
+                    latencies.append(time.perf_counter() - started)
+                except Exception:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+        return summarize(latencies, errors, time.perf_counter() - started)
+
+    async def _run_chat(self) -> dict:
+        """Round-trip time from sending a chat message to receiving its broadcast"""
+        ws_base = self.args.base_url.replace("http://", "ws://").replace("https://", "wss://")
+        latencies, errors = [], 0
+        deadline = time.perf_counter() + self.args.duration
+
+        async def worker(user_id: str, booking_id: str):
+            nonlocal errors
+            try:
+                async with websockets.connect(f"{ws_base}/api/ws/chat/{booking_id}") as ws:
+                    while time.perf_counter() < deadline:
+                        started = time.perf_counter()
+                        await ws.send(json.dumps({"sender_id": user_id, "text": "benchmark ping"}))
+                        await ws.recv()
+                        latencies.append(time.perf_counter() - started)
+            except Exception:
+                errors += 1
+
+        # One connection per booking so broadcasts are not shared between workers
+        rooms = self.customer_bookings[:self.args.concurrency]
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(user_id, booking_id) for _, user_id, booking_id in rooms))
+        result = summarize(latencies, errors, time.perf_counter() - started)
+        result["connections"] = len(rooms)
+        return result
+
+    async def run(self) -> dict:
+        limits = httpx.Limits(max_connections=self.args.concurrency, max_keepalive_connections=self.args.concurrency)
+        async with httpx.AsyncClient(base_url=self.args.base_url, timeout=self.args.timeout, limits=limits) as client:
+            await self.setup(client)
+
+            results = {}
+            for name in self.args.scenarios:
+                if name == "chat_ws":
+                    results[name] = await self._run_chat()
+                else:
+                    # Warm connections and caches before measuring
+                    for _ in range(self.args.warmup):
+                        try:
+                            await getattr(self, name)(client)
+                        except Exception:
+                            pass
+                    results[name] = await self._run_http(name, client)
+                summary = results[name]
+                print(
+                    f"{name:<14} {summary['throughput_rps']:>9.1f} rps  "
+                    f"p50 {summary['latency_ms']['p50']:>8.1f}ms  "
+                    f"p95 {summary['latency_ms']['p95']:>8.1f}ms  "
+                    f"p99 {summary['latency_ms']['p99']:>8.1f}ms  "
+                    f"errors {summary['errors']}"
+                )
+
+        return {
+            "commit": _git_commit(),
+            "timestamp": datetime.utcnow().isoformat(),
+            "python": platform.python_version(),
+            "config": {
+                "base_url": self.args.base_url,
+                "concurrency": self.args.concurrency,
+                "duration_s": self.args.duration,
+                "seed": self.args.seed,
+            },
+            "results": results,
+        }
+
+
+async def main(args):
+    report = await LoadTest(args).run()
+    output = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(output)
+        print(f"Wrote {args.out}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the QuickOne API")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--scenarios", default=",".join(LoadTest.SCENARIOS),
+                        type=lambda value: [s for s in value.split(",") if s])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per scenario")
+    parser.add_argument("--customers", type=int, default=50, help="seeded customers to log in")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    unknown = set(args.scenarios) - set(LoadTest.SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    asyncio.run(main(args))
@@ -0,0 +1,295 @@
+"""
+Synthetic data generator for benchmarks
+Fills a local mongod with users, provider profiles (with coordinates), services,
+bookings, messages and reviews shaped like the documents server.py writes.
+
+Usage (from backend/):
+    python -m benchmarks.seed --users 10000 --drop
+    python -m benchmarks.seed --users 200000 --db quickone_bench_large --drop
+
+Every seeded account uses the password BENCH_PASSWORD. Known logins:
+    bench-admin@bench.quickone.test
+    customer{i}@bench.quickone.test / provider{i}@bench.quickone.test
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+
+from auth import get_password_hash
+from categories import SERVICE_CATEGORIES
+from indexes import ensure_indexes
+from completeness import backfill as backfill_completion
+from ranking import backfill as backfill_ranking
+from scheduling import backfill as backfill_slots
+from search import backfill as backfill_search
+
+ROOT_DIR = Path(__file__).parent.parent
+load_dotenv(ROOT_DIR / '.env')
+
+BENCH_PASSWORD = "benchmark123"
+EMAIL_DOMAIN = "bench.quickone.test"
+BATCH_SIZE = 1000
+
+# Lagos, Abuja, Port Harcourt, Ibadan, Kano
+CITY_CENTRES = [
+    ("Lagos", 6.5244, 3.3792),
+    ("Abuja", 9.0765, 7.3986),
+    ("Port Harcourt", 4.8156, 7.0498),
+    ("Ibadan", 7.3775, 3.9470),
+    ("Kano", 12.0022, 8.5920),
+]
+FIRST_NAMES = ["Ada", "Chinedu", "Tunde", "Ngozi", "Emeka", "Funke", "Bola", "Kemi", "Ibrahim", "Aisha", "Segun", "Zainab"]
+LAST_NAMES = ["Okafor", "Adeyemi", "Bello", "Eze", "Balogun", "Okonkwo", "Musa", "Olawale", "Nwosu", "Abubakar"]
+SERVICE_WORDS = ["Professional", "Affordable", "Express", "Premium", "Reliable", "Same-day", "Certified", "Friendly"]
+BOOKING_STATUSES = ["pending", "accepted", "completed", "customer_confirmed", "cancelled"]
+CHAT_LINES = [
+    "Hello, are you available this weekend?",
+    "Yes, I can come by on Saturday morning.",
+    "Great, please bring your own tools.",
+    "No problem. See you then!",
+    "What is the best time to reach you?",
+]
+# 1x1 PNG so image-bearing fields carry a realistic data URL shape
+TINY_IMAGE = "data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=="
+
+
+def _iso(dt: datetime) -> str:
+    return dt.isoformat()
+
+
+def _random_point(rng: random.Random):
+    city, lat, lon = rng.choice(CITY_CENTRES)
+    # ~0.25 degrees is roughly a 25km spread around the city centre
+    return city, round(lat + rng.uniform(-0.25, 0.25), 6), round(lon + rng.uniform(-0.25, 0.25), 6)
+
+
+def _random_past(rng: random.Random, now: datetime, days: int = 365) -> datetime:
+    return now - timedelta(seconds=rng.randint(0, days * 86400))
+
+
+class Seeder:
+    def __init__(self, db, args):
+        self.db = db
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.now = datetime.utcnow()
+        self.password_hash = get_password_hash(BENCH_PASSWORD)
+        self.counts = {}
+
+    def _uuid(self) -> str:
+        # Drawn from the seeded RNG so reruns produce identical ids
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    async def _insert(self, collection_name: str, docs: list):
+        if docs:
+            await self.db[collection_name].insert_many(docs, ordered=False)
+            self.counts[collection_name] = self.counts.get(collection_name, 0) + len(docs)
+
+    def _user(self, user_type: str, index: int):
+        city, lat, lon = _random_point(self.rng)
+        return {
+            "id": self._uuid(),
+            "email": f"{user_type}{index}@{EMAIL_DOMAIN}",
+            "password": self.password_hash,
+            "full_name": f"{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}",
+            "user_type": user_type,
+            "phone": f"+234 80{self.rng.randint(0, 9)} {self.rng.randint(100, 999)} {self.rng.randint(1000, 9999)}",
+            "profile_photo": TINY_IMAGE if self.rng.random() < 0.5 else None,
+            "location": city,
+            "latitude": lat,
+            "longitude": lon,
+            "is_verified": True,
+            "is_active": self.rng.random() > 0.02,
+            "email_verified": True,
+            "created_at": _iso(_random_past(self.rng, self.now)),
+        }
+
+    def _profile(self, provider: dict):
+        categories = self.rng.sample([c["name"] for c in SERVICE_CATEGORIES], self.rng.randint(1, 3))
+        return {
+            "user_id": provider["id"],
+            "bio": "Experienced and dependable. " * self.rng.randint(1, 8),
+            "service_categories": categories,
+            "pricing_type": self.rng.choice(["hourly", "fixed"]),
+            "hourly_rate": float(self.rng.randint(2, 50) * 500),
+            "fixed_price": None,
+            "years_experience": self.rng.randint(0, 20),
+            "is_available": self.rng.random() > 0.2,
+            "portfolio_images": [TINY_IMAGE] * self.rng.randint(0, 5),
+            "balance": 0.0,
+            "total_earned": 0.0,
+            "bank_account_number": f"{self.rng.randint(10**9, 10**10 - 1)}",
+            "bank_code": "058",
+            "account_name": provider["full_name"],
+            "average_rating": 0.0,
+            "total_reviews": 0,
+            "total_bookings": 0,
+            "created_at": provider["created_at"],
+        }
+
+    def _service(self, provider: dict, categories: list):
+        category = self.rng.choice(categories)
+        created_at = _random_past(self.rng, self.now)
+        return {
+            "id": self._uuid(),
+            "provider_id": provider["id"],
+            "title": f"{self.rng.choice(SERVICE_WORDS)} {category}",
+            "description": f"{category} delivered by a vetted professional. " * self.rng.randint(2, 10),
+            "category": category,
+            "price": float(self.rng.randint(4, 200) * 500),
+            "duration": self.rng.choice([30, 60, 90, 120, 240]),
+            "images": [TINY_IMAGE] * self.rng.randint(0, 4),
+            "location": provider["location"],
+            "latitude": provider["latitude"],
+            "longitude": provider["longitude"],
+            "created_at": _iso(created_at),
+            "updated_at": _iso(created_at),
+        }
+
+    def _booking(self, customer: dict, service: dict):
+        created_at = _random_past(self.rng, self.now, days=180)
+        status = self.rng.choice(BOOKING_STATUSES)
+        return {
+            "id": self._uuid(),
+            "service_id": service["id"],
+            "provider_id": service["provider_id"],
+            "customer_id": customer["id"],
+            "preferred_date": (created_at + timedelta(days=self.rng.randint(1, 14))).date().isoformat(),
+            "preferred_time": f"{self.rng.randint(8, 18):02d}:00",
+            "service_location": customer["location"],
+            "notes": None,
+            "estimated_budget": None,
+            "status": status,
+            "payment_status": "paid" if status == "customer_confirmed" and self.rng.random() < 0.7 else "pending",
+            "total_amount": service["price"],
+            "agreed_price": None,
+            "price_negotiated": False,
+            "created_at": _iso(created_at),
+            "updated_at": _iso(created_at),
+        }
+
+    async def run(self):
+        args = self.args
+        n_providers = max(1, int(args.users * args.provider_ratio))
+        n_customers = max(1, args.users - n_providers)
+
+        admin = self._user("admin", 0)
+        admin["email"] = f"bench-admin@{EMAIL_DOMAIN}"
+        await self._insert("users", [admin])
+
+        # Providers, their profiles and services
+        services = []
+        for start in range(0, n_providers, BATCH_SIZE):
+            users, profiles, batch_services = [], [], []
+            for i in range(start, min(start + BATCH_SIZE, n_providers)):
+                provider = self._user("provider", i)
+                profile = self._profile(provider)
+                users.append(provider)
+                profiles.append(profile)
+                for _ in range(self.rng.randint(1, args.services_per_provider * 2 - 1)):
+                    batch_services.append(self._service(provider, profile["service_categories"]))
+            await self._insert("users", users)
+            await self._insert("provider_profiles", profiles)
+            await self._insert("services", batch_services)
+            # Keep only what bookings need
+            services.extend({"id": s["id"], "provider_id": s["provider_id"], "price": s["price"]} for s in batch_services)
+
+        # Customers and their bookings, messages, reviews
+        ratings = {}
+        for start in range(0, n_customers, BATCH_SIZE):
+            users, bookings, messages, reviews = [], [], [], []
+            for i in range(start, min(start + BATCH_SIZE, n_customers)):
+                customer = self._user("customer", i)
+                users.append(customer)
+                for _ in range(self.rng.randint(0, args.bookings_per_customer * 2)):
+                    booking = self._booking(customer, self.rng.choice(services))
+                    bookings.append(booking)
+                    booking_created = datetime.fromisoformat(booking["created_at"])
+                    for m in range(self.rng.randint(0, args.messages_per_booking * 2)):
+                        sender = customer if m % 2 == 0 else {"id": booking["provider_id"], "full_name": "Provider"}
+                        messages.append({
+                            "id": self._uuid(),
+                            "booking_id": booking["id"],
+                            "sender_id": sender["id"],
+                            "sender_name": sender["full_name"],
+                            "text": self.rng.choice(CHAT_LINES),
+                            "created_at": _iso(booking_created + timedelta(minutes=m * 7)),
+                        })
+                    if booking["status"] in ("completed", "customer_confirmed") and self.rng.random() < args.review_ratio:
+                        rating = self.rng.choices([1, 2, 3, 4, 5], weights=[1, 1, 3, 6, 9])[0]
+                        reviews.append({
+                            "id": self._uuid(),
+                            "booking_id": booking["id"],
+                            "provider_id": booking["provider_id"],
+                            "customer_id": customer["id"],
+                            "customer_name": customer["full_name"],
+                            "rating": rating,
+                            "comment": "Great job!" if rating >= 4 else "Could be better.",
+                            "created_at": _iso(booking_created + timedelta(days=2)),
+                        })
+                        total, count = ratings.get(booking["provider_id"], (0, 0))
+                        ratings[booking["provider_id"]] = (total + rating, count + 1)
+            await self._insert("users", users)
+            await self._insert("bookings", bookings)
+            await self._insert("messages", messages)
+            await self._insert("reviews", reviews)
+
+        # Denormalized provider rating, as create_review maintains it
+        for provider_id, (total, count) in ratings.items():
+            await self.db.provider_profiles.update_one(
+                {"user_id": provider_id},
+                {"$set": {"average_rating": total / count, "total_reviews": count}}
+            )
+        await backfill_ranking(self.db)
+        await backfill_completion(self.db)
+        await backfill_slots(self.db)
+        await backfill_search(self.db)
+
+
+async def main(args):
+    client = AsyncIOMotorClient(args.mongo_url)
+    db = client[args.db]
+
+    if args.drop:
+        await client.drop_database(args.db)
+        print(f"Dropped database {args.db}")
+
+    started = time.perf_counter()
+    seeder = Seeder(db, args)
+    await seeder.run()
+    if not args.skip_indexes:
+        await ensure_indexes(db)
+    elapsed = time.perf_counter() - started
+
+    print(f"Seeded {args.db} in {elapsed:.1f}s:")
+    for name, count in seeder.counts.items():
+        print(f"   {name}: {count}")
+    print(f"   total: {sum(seeder.counts.values())}")
+    print(f"Password for all accounts: {BENCH_PASSWORD}")
+
+    client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed a local mongod with synthetic QuickOne data")
+    parser.add_argument("--mongo-url", default=os.environ.get('MONGO_URL', 'mongodb://localhost:27017'))
+    # Never default to the app database; seeding with --drop would wipe it
+    parser.add_argument("--db", default=os.environ.get('BENCH_DB_NAME', 'quickone_bench'))
+    parser.add_argument("--users", type=int, default=10000, help="total customers + providers")
+    parser.add_argument("--provider-ratio", type=float, default=0.2)
+    parser.add_argument("--services-per-provider", type=int, default=3, help="mean services per provider")
+    parser.add_argument("--bookings-per-customer", type=int, default=2, help="mean bookings per customer")
+    parser.add_argument("--messages-per-booking", type=int, default=3, help="mean messages per booking")
+    parser.add_argument("--review-ratio", type=float, default=0.6, help="share of finished bookings with a review")
+    parser.add_argument("--seed", type=int, default=42, help="RNG seed, same seed gives the same data shape")
+    parser.add_argument("--drop", action="store_true", help="drop the target database first")
+    parser.add_argument("--skip-indexes", action="store_true")
+    asyncio.run(main(parser.parse_args()))
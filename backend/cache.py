@@ -0,0 +1,145 @@
+"""
+In-process response caches for browse endpoints and per-user dashboards
+LRU + TTL eviction (cachetools.TTLCache), single-flight computation per key,
+and predicate-based invalidation driven by the write endpoints.
+"""
+import asyncio
+import logging
+import os
+from typing import Awaitable, Callable, Dict
+
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_SIZE = int(os.environ.get('RESPONSE_CACHE_SIZE', 1024))
+RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 30))
+# Dashboards are per user and change with every booking / payment; keep them briefly
+DASHBOARD_CACHE_SIZE = int(os.environ.get('DASHBOARD_CACHE_SIZE', 4096))
+DASHBOARD_CACHE_TTL = float(os.environ.get('DASHBOARD_CACHE_TTL', 10))
+# 3 decimals is ~110m, plenty for km-level distance sorting
+COORD_PRECISION = 3
+
+
+def make_key(namespace: str, **params) -> tuple:
+    """Normalized cache key: namespace plus sorted params"""
+    return (namespace,) + tuple(sorted(params.items()))
+
+
+def key_params(key: tuple) -> Dict:
+    return dict(key[1:])
+
+
+def round_coord(value):
+    return round(value, COORD_PRECISION) if value is not None else None
+
+
+def _retrieve_exception(task: asyncio.Task):
+    # Mark retrieved so a failure nobody is still waiting for does not log a warning
+    if not task.cancelled():
+        task.exception()
+
+
+class ResponseCache:
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        # key -> task computing it, shared by every request waiting on the same cold key
+        self._in_flight: Dict[tuple, asyncio.Task] = {}
+        # in-flight keys invalidated while computing; their result must not be stored
+        self._stale = set()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: tuple, default=None):
+        return self._entries.get(key, default)
+
+    def put(self, key: tuple, value):
+        self._entries[key] = value
+
+    async def get_or_compute(self, key: tuple, compute: Callable[[], Awaitable]):
+        try:
+            value = self._entries[key]
+            self.hits += 1
+            return value
+        except KeyError:
+            pass
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            task = asyncio.create_task(self._compute(key, compute))
+            task.add_done_callback(_retrieve_exception)
+            self._in_flight[key] = task
+        # The computation is its own task: a cancelled caller, leader or not, leaves it
+        # running for everyone else waiting on the key
+        return await asyncio.shield(task)
+
+    async def _compute(self, key: tuple, compute: Callable[[], Awaitable]):
+        try:
+            value = await compute()
+            if key not in self._stale:
+                self._entries[key] = value
+            return value
+        finally:
+            self._in_flight.pop(key, None)
+            self._stale.discard(key)
+
+    def invalidate(self, namespace: str, predicate: Callable[[Dict], bool] = lambda params: True) -> int:
+        """Drop every entry in namespace whose params match predicate"""
+        removed = 0
+        for key in list(self._entries.keys()):
+            if key[0] == namespace and predicate(key_params(key)):
+                self._entries.pop(key, None)
+                removed += 1
+        for key in self._in_flight:
+            if key[0] == namespace and predicate(key_params(key)):
+                self._stale.add(key)
+        if removed:
+            logger.debug(f"Invalidated {removed} {namespace} cache entries")
+        return removed
+
+    def clear(self):
+        self._entries.clear()
+        self._stale.update(self._in_flight)
+
+
+browse_cache = ResponseCache()
+dashboard_cache = ResponseCache(maxsize=DASHBOARD_CACHE_SIZE, ttl=DASHBOARD_CACHE_TTL)
+
+
+def invalidate_services(categories=None, provider_id: str = None, geo_only: bool = False):
+    """
+    Invalidate /services results that could include a service in categories from provider_id
+    categories=None matches any category; geo_only limits it to distance-based results
+    """
+    categories = set(categories) if categories is not None else None
+
+    def matches(params):
+        if categories is not None and params.get("category") is not None and params["category"] not in categories:
+            return False
+        if params.get("provider_id") is not None and params["provider_id"] != provider_id:
+            return False
+        if geo_only and params.get("latitude") is None:
+            return False
+        return True
+
+    return browse_cache.invalidate("services", matches)
+
+
+def invalidate_providers(categories=None):
+    """Invalidate /providers results; categories=None means every entry"""
+    if categories is None:
+        return browse_cache.invalidate("providers")
+    categories = set(categories)
+    return browse_cache.invalidate(
+        "providers",
+        lambda params: params.get("category") is None or params["category"] in categories
+    )
+
+
+def invalidate_dashboard(*user_ids: str):
+    """Drop the cached /dashboard of each user whose bookings, wallet or profile just changed"""
+    user_ids = set(user_ids)
+    return dashboard_cache.invalidate("dashboard", lambda params: params.get("user_id") in user_ids)
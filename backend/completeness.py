@@ -0,0 +1,150 @@
+"""
+Profile completeness
+Each required field is one bit of users.completion; completion_percentage and
+profile_completed are derived from it and stored alongside. The bits are set by the
+writes that change the fields (register, /auth/profile, /provider/profile), so
+/auth/profile-status is a single projected read and never writes.
+
+The user's own fields and the provider profile fields are written independently; each
+writer only replaces its own bits, with a compare-and-set on the previous bitmap.
+
+Backfill existing users with:
+    python completeness.py
+"""
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logger = logging.getLogger(__name__)
+
+# Bit per required field, in the order they are reported
+USER_FIELD_BITS = {
+    "profile_photo": 1 << 0,
+    "full_name": 1 << 1,
+    "phone": 1 << 2,
+    "location": 1 << 3,
+}
+PROVIDER_FIELD_BITS = {
+    "service_categories": 1 << 4,
+    "portfolio": 1 << 5,
+    "experience_level": 1 << 6,
+}
+USER_MASK = sum(USER_FIELD_BITS.values())
+PROVIDER_MASK = sum(PROVIDER_FIELD_BITS.values())
+
+MIN_PORTFOLIO_IMAGES = 3
+# Compare-and-set attempts before giving up on a contended user
+MAX_RETRIES = 5
+
+STATUS_PROJECTION = {"_id": 0, "user_type": 1, "completion": 1}
+
+
+def user_bits(user: dict) -> int:
+    return sum(bit for field, bit in USER_FIELD_BITS.items() if user.get(field))
+
+
+def profile_bits(profile: Optional[dict]) -> int:
+    if not profile:
+        return 0
+    bits = 0
+    if profile.get("service_categories"):
+        bits |= PROVIDER_FIELD_BITS["service_categories"]
+    if len(profile.get("portfolio_images") or []) >= MIN_PORTFOLIO_IMAGES:
+        bits |= PROVIDER_FIELD_BITS["portfolio"]
+    if profile.get("years_experience") is not None:
+        bits |= PROVIDER_FIELD_BITS["experience_level"]
+    return bits
+
+
+def _required(user_type: str) -> dict:
+    if user_type == "provider":
+        return {**USER_FIELD_BITS, **PROVIDER_FIELD_BITS}
+    return USER_FIELD_BITS
+
+
+def completion_fields(completion: int, user_type: str) -> dict:
+    """The stored fields derived from a bitmap"""
+    required = _required(user_type)
+    completed = sum(1 for bit in required.values() if completion & bit)
+    percentage = int(completed / len(required) * 100)
+    return {
+        "completion": completion,
+        "completion_percentage": percentage,
+        "profile_completed": percentage == 100,
+    }
+
+
+def profile_status(completion: int, user_type: str) -> dict:
+    """/auth/profile-status response for a stored bitmap"""
+    required_fields = {field: bool(completion & bit) for field, bit in _required(user_type).items()}
+    fields = completion_fields(completion, user_type)
+    return {
+        "profile_completed": fields["profile_completed"],
+        "completion_percentage": fields["completion_percentage"],
+        "user_type": user_type,
+        "required_fields": required_fields,
+        "missing_fields": [field for field, done in required_fields.items() if not done]
+    }
+
+
+async def record(user_id: str, bits: int, mask: int) -> Optional[dict]:
+    """
+    Replace the bits under mask with bits and store the derived fields
+    Returns the stored fields, or None when the user does not exist.
+    """
+    from database import users_collection
+
+    for _ in range(MAX_RETRIES):
+        user = await users_collection.find_one({"id": user_id}, STATUS_PROJECTION)
+        if not user:
+            return None
+        current = user.get("completion")
+        fields = completion_fields(((current or 0) & ~mask) | (bits & mask), user["user_type"])
+        if fields["completion"] == current:
+            return fields
+        # Matches only if no other writer changed the bitmap since our read
+        result = await users_collection.update_one({"id": user_id, "completion": current}, {"$set": fields})
+        if result.matched_count:
+            return fields
+    logger.warning(f"Gave up recording profile completion for {user_id} after {MAX_RETRIES} attempts")
+    return None
+
+
+async def backfill(db) -> int:
+    """Recompute the bitmap of every user from their documents"""
+    updated = 0
+    async for user in db.users.find({}, {"_id": 0, "id": 1, "user_type": 1, **{f: 1 for f in USER_FIELD_BITS}}):
+        completion = user_bits(user)
+        if user.get("user_type") == "provider":
+            profile = await db.provider_profiles.find_one(
+                {"user_id": user["id"]},
+                {"_id": 0, "service_categories": 1, "portfolio_images": 1, "years_experience": 1}
+            )
+            completion |= profile_bits(profile)
+        result = await db.users.update_one(
+            {"id": user["id"]},
+            {"$set": completion_fields(completion, user.get("user_type"))}
+        )
+        updated += result.modified_count
+    return updated
+
+
+async def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    updated = await backfill(db)
+    print(f"Updated profile completion on {updated} users")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
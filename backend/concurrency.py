@@ -0,0 +1,68 @@
+"""
+Concurrent fan-out for independent reads
+Endpoints that need several unrelated queries run them together with one shared deadline,
+so latency is the slowest query instead of the sum. Reads not listed as required degrade
+to a default value when they fail or time out; the names of those reads are reported so
+the response can say it is partial.
+"""
+import asyncio
+import logging
+import os
+from typing import Awaitable, Dict, Iterable, Optional
+
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+FANOUT_TIMEOUT_SECONDS = float(os.environ.get('FANOUT_TIMEOUT_SECONDS', 5))
+
+
+class FanOutResult(dict):
+    """Read name -> result; failed lists the optional reads that fell back to their default"""
+
+    def __init__(self):
+        super().__init__()
+        self.failed = []
+
+
+async def fan_out(
+    reads: Dict[str, Awaitable],
+    defaults: Optional[Dict] = None,
+    required: Iterable[str] = (),
+    timeout: float = FANOUT_TIMEOUT_SECONDS,
+) -> FanOutResult:
+    """
+    Run reads concurrently and wait at most timeout for all of them
+    A failed or timed-out required read cancels the rest and raises (504 on timeout);
+    any other read gets defaults.get(name) and is listed in result.failed.
+    """
+    defaults = defaults or {}
+    required = set(required)
+    tasks = {name: asyncio.ensure_future(read) for name, read in reads.items()}
+    try:
+        done, pending = await asyncio.wait(tasks.values(), timeout=timeout)
+        result = FanOutResult()
+        for name, task in tasks.items():
+            if task in pending:
+                if name in required:
+                    raise HTTPException(status_code=504, detail=f"Timed out loading {name}")
+                logger.warning(f"Fan-out read {name} timed out after {timeout}s")
+            elif task.exception() is not None:
+                if name in required:
+                    raise task.exception()
+                logger.error(f"Fan-out read {name} failed: {task.exception()!r}")
+            else:
+                result[name] = task.result()
+                continue
+            result[name] = defaults.get(name)
+            result.failed.append(name)
+        return result
+    finally:
+        # Also runs when the request itself is cancelled: never leave reads running
+        for task in tasks.values():
+            if not task.done():
+                task.cancel()
+        for task in tasks.values():
+            if task.done() and not task.cancelled():
+                # Retrieve so unraised errors of abandoned reads are not logged as never retrieved
+                task.exception()
@@ -2,12 +2,14 @@ from motor.motor_asyncio import AsyncIOMotorClient
 import os
 from dotenv import load_dotenv
 from pathlib import Path
+from db_monitoring import command_listener
+from metrics import pool_listener
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[command_listener, pool_listener])
 db = client[os.environ['DB_NAME']]
 
 # Collections
@@ -20,7 +22,12 @@ transactions_collection = db.transactions
 provider_profiles_collection = db.provider_profiles
 notifications_collection = db.notifications
 withdrawals_collection = db.withdrawals
-price_offers_collection = db.price_offers
+email_outbox_collection = db.email_outbox
+verification_codes_collection = db.verification_codes
+ai_descriptions_collection = db.ai_descriptions
+wallet_ledger_collection = db.wallet_ledger
+idempotency_keys_collection = db.idempotency_keys
+schedule_locks_collection = db.schedule_locks
 
 async def get_db():
     return db
\ No newline at end of file
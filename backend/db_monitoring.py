@@ -0,0 +1,154 @@
+"""
+Per-request MongoDB instrumentation
+A pymongo CommandListener attributes every command to the HTTP request that issued it
+(via a contextvar), and DbStatsMiddleware reports the totals:
+- as X-DB-* response headers when DEBUG=true
+- as a slow-query log line for any command slower than SLOW_QUERY_MS
+"""
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+DEBUG = os.environ.get('DEBUG', 'false').lower() == 'true'
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 100))
+
+# Commands that carry a filter worth reporting, and the key it lives under
+_FILTER_KEYS = {
+    "find": "filter",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "aggregate": "pipeline",
+}
+
+
+def query_shape(value):
+    """Strip literal values from a filter, keeping field names and operators"""
+    if isinstance(value, dict):
+        return {k: query_shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(v, dict) for v in value):
+            return [query_shape(v) for v in value]
+        return "?"
+    return "?"
+
+
+def _command_shape(command_name: str, command: dict):
+    key = _FILTER_KEYS.get(command_name)
+    if key:
+        return query_shape(command.get(key, {}))
+    if command_name in ("update", "delete"):
+        statements = command.get("updates") or command.get("deletes") or []
+        if statements:
+            return query_shape(statements[0].get("q", {}))
+    return None
+
+
+class DbStats:
+    """DB call totals for a single request"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest: Optional[str] = None
+        # request_id -> (command_name, collection, shape) for in-flight commands
+        self._pending: dict = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        collection = event.command.get(event.command_name)
+        self._pending[event.request_id] = (
+            event.command_name,
+            collection if isinstance(collection, str) else None,
+            _command_shape(event.command_name, event.command),
+        )
+
+    def finished(self, request_id: int, duration_micros: int):
+        command_name, collection, shape = self._pending.pop(request_id, (None, None, None))
+        if command_name is None:
+            return
+
+        elapsed_ms = duration_micros / 1000
+        self.count += 1
+        self.total_ms += elapsed_ms
+
+        description = f"{command_name} {collection or ''} {shape if shape is not None else ''}".strip()
+        if elapsed_ms >= self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest = description
+
+        if elapsed_ms >= SLOW_QUERY_MS:
+            logger.warning(f"[SLOW QUERY] {elapsed_ms:.1f}ms {self.path} {description}")
+
+
+_current_stats: ContextVar[Optional[DbStats]] = ContextVar("db_stats", default=None)
+
+
+def current_db_stats() -> Optional[DbStats]:
+    return _current_stats.get()
+
+
+class CommandStatsListener(monitoring.CommandListener):
+    """Routes command events to the DbStats of the request that issued them"""
+
+    def started(self, event):
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.started(event)
+
+    def succeeded(self, event):
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.finished(event.request_id, event.duration_micros)
+
+    def failed(self, event):
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.finished(event.request_id, event.duration_micros)
+
+
+command_listener = CommandStatsListener()
+
+
+class DbStatsMiddleware:
+    """ASGI middleware that opens a DbStats scope around every HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = DbStats(scope.get("path", ""))
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and DEBUG:
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-calls", str(stats.count).encode()))
+                headers.append((b"x-db-time-ms", f"{stats.total_ms:.1f}".encode()))
+                if stats.slowest:
+                    headers.append((b"x-db-slowest", f"{stats.slowest_ms:.1f}ms {stats.slowest}".encode("latin-1", "replace")))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current_stats.reset(token)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if stats.total_ms >= SLOW_QUERY_MS:
+                logger.warning(
+                    f"[DB] {scope.get('method')} {stats.path}: {stats.count} calls, "
+                    f"{stats.total_ms:.1f}ms in DB of {elapsed_ms:.1f}ms total"
+                )
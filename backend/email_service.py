@@ -1,19 +1,44 @@
 """
 Email service for sending verification codes and notifications
-Replace with real email service (SendGrid, Mailgun, AWS SES) in production
+Emails are written to a durable outbox collection and delivered by EmailOutboxWorker,
+so request latency never depends on the email provider.
+Delivery goes over SMTP when EMAIL_ENABLED=true and SMTP_HOST is set, otherwise emails are logged.
+For local testing run an SMTP stand-in, e.g. `python -m aiosmtpd -n -l localhost:1025`,
+and set SMTP_HOST=localhost SMTP_PORT=1025.
 """
+import asyncio
 import logging
 import os
-from typing import Optional
+import random
+import smtplib
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from typing import List, Optional
+
 
 logger = logging.getLogger(__name__)
 
+# Outbox worker settings
+EMAIL_BATCH_SIZE = int(os.environ.get('EMAIL_BATCH_SIZE', 50))
+EMAIL_CONCURRENCY = int(os.environ.get('EMAIL_CONCURRENCY', 4))
+EMAIL_MAX_ATTEMPTS = int(os.environ.get('EMAIL_MAX_ATTEMPTS', 6))
+EMAIL_POLL_SECONDS = float(os.environ.get('EMAIL_POLL_SECONDS', 5))
+EMAIL_BACKOFF_BASE_SECONDS = float(os.environ.get('EMAIL_BACKOFF_BASE_SECONDS', 30))
+EMAIL_BACKOFF_MAX_SECONDS = float(os.environ.get('EMAIL_BACKOFF_MAX_SECONDS', 3600))
+# A claimed email not finished within this lease is picked up again (e.g. worker crashed)
+EMAIL_LEASE_SECONDS = float(os.environ.get('EMAIL_LEASE_SECONDS', 300))
+# Sent and dead emails are dropped by the purge_at TTL index after this long
+EMAIL_RETENTION_HOURS = float(os.environ.get('EMAIL_RETENTION_HOURS', 24 * 7))
+
 class EmailService:
-    """Email service - currently logs to console, can be replaced with real email provider"""
+    """Email service - queues emails in the outbox for EmailOutboxWorker to deliver"""
     
     def __init__(self):
         self.enabled = os.environ.get('EMAIL_ENABLED', 'false').lower() == 'true'
         self.from_email = os.environ.get('EMAIL_FROM', 'noreply@quickone.com')
+        # Set by EmailOutboxWorker so new mail is delivered without waiting for the next poll
+        self.wakeup: Optional[asyncio.Event] = None
     
     async def send_verification_code(self, to_email: str, code: str, name: str = "User"):
         """Send email verification code"""
@@ -62,38 +87,238 @@ QuickOne Team
         return await self._send_email(to_email, subject, body)
     
     async def _send_email(self, to_email: str, subject: str, body: str) -> bool:
+        """Queue an email in the outbox; delivery happens in EmailOutboxWorker"""
+        from database import email_outbox_collection
+        
+        now = datetime.utcnow().isoformat()
+        await email_outbox_collection.insert_one({
+            "id": str(uuid.uuid4()),
+            "to": to_email,
+            "from": self.from_email,
+            "subject": subject,
+            "body": body,
+            "status": "pending",  # pending, sending, sent, dead
+            "attempts": 0,
+            "next_attempt_at": now,
+            "locked_until": None,
+            "last_error": None,
+            "created_at": now,
+            "sent_at": None
+        })
+        
+        if self.wakeup is not None:
+            self.wakeup.set()
+        return True
+
+class LoggingTransport:
+    """Development transport: logs emails instead of sending them"""
+    
+    def send_batch(self, emails: List[dict]) -> List[Optional[str]]:
+        for email in emails:
+            logger.info("="*60)
+            logger.info(f"[EMAIL] To: {email['to']}")
+            logger.info(f"[EMAIL] Subject: {email['subject']}")
+            logger.info(f"[EMAIL] Body:\n{email['body']}")
+            logger.info("="*60)
+        return [None] * len(emails)
+
+class SmtpTransport:
+    """Sends a batch of emails over a single SMTP connection"""
+    
+    def __init__(self):
+        self.host = os.environ.get('SMTP_HOST', 'localhost')
+        self.port = int(os.environ.get('SMTP_PORT', 587))
+        self.username = os.environ.get('SMTP_USER')
+        self.password = os.environ.get('SMTP_PASSWORD')
+        self.starttls = os.environ.get('SMTP_STARTTLS', 'true').lower() == 'true'
+        self.timeout = float(os.environ.get('SMTP_TIMEOUT', 30))
+    
+    def send_batch(self, emails: List[dict]) -> List[Optional[str]]:
+        """Blocking; returns an error string (or None on success) per email"""
+        try:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        except Exception as e:
+            return [f"connect failed: {e}"] * len(emails)
+        
+        errors = []
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password)
+            for email in emails:
+                message = EmailMessage()
+                message["From"] = email["from"]
+                message["To"] = email["to"]
+                message["Subject"] = email["subject"]
+                message.set_content(email["body"])
+                try:
+                    smtp.send_message(message)
+                    errors.append(None)
+                except Exception as e:
+                    errors.append(str(e))
+        except Exception as e:
+            errors.extend([str(e)] * (len(emails) - len(errors)))
+        finally:
+            try:
+                smtp.quit()
+            except Exception:
+                pass
+        return errors
+
+def backoff_seconds(attempts: int) -> float:
+    """Exponential backoff with full jitter"""
+    delay = min(EMAIL_BACKOFF_MAX_SECONDS, EMAIL_BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)))
+    return random.uniform(delay / 2, delay)
+
+class EmailOutboxWorker:
+    """Drains the email outbox: claims batches, sends them concurrently, retries with backoff, dead-letters"""
+    
+    def __init__(self, service: EmailService, transport=None):
+        self.service = service
+        if transport is None:
+            smtp_configured = service.enabled and os.environ.get('SMTP_HOST')
+            transport = SmtpTransport() if smtp_configured else LoggingTransport()
+        self.transport = transport
+        self._semaphore = asyncio.Semaphore(EMAIL_CONCURRENCY)
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+    
+    async def _claim_batch(self) -> List[dict]:
         """
-        Internal method to send email
-        Replace this with real email provider integration
+        Lease up to EMAIL_BATCH_SIZE due emails in three round trips
+        The candidates are picked with one find and leased with one update_many that
+        re-checks they are still due and stamps this claim's lease_token, so emails a
+        concurrent worker leased in between are left out; the batch is read back by token.
+        Every lease counts as an attempt, so an email whose delivery keeps crashing or
+        hanging the worker is dead-lettered instead of being reclaimed forever.
         """
-        if self.enabled:
-            # TODO: Replace with real email service (SendGrid, Mailgun, AWS SES)
-            # Example for SendGrid:
-            # from sendgrid import SendGridAPIClient
-            # from sendgrid.helpers.mail import Mail
-            # 
-            # message = Mail(
-            #     from_email=self.from_email,
-            #     to_emails=to_email,
-            #     subject=subject,
-            #     plain_text_content=body
-            # )
-            # sg = SendGridAPIClient(os.environ.get('SENDGRID_API_KEY'))
-            # response = sg.send(message)
-            # return response.status_code == 202
+        from database import email_outbox_collection
+        
+        now = datetime.utcnow()
+        lease = (now + timedelta(seconds=EMAIL_LEASE_SECONDS)).isoformat()
+        due = {"$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": now.isoformat()}},
+            {"status": "sending", "locked_until": {"$lte": now.isoformat()}}
+        ]}
+        
+        candidates = await email_outbox_collection.find(due, {"_id": 0, "id": 1}).sort(
+            "next_attempt_at", 1
+        ).limit(EMAIL_BATCH_SIZE).to_list(EMAIL_BATCH_SIZE)
+        if not candidates:
+            return []
+        
+        token = str(uuid.uuid4())
+        await email_outbox_collection.update_many(
+            {"id": {"$in": [email['id'] for email in candidates]}, **due},
+            {"$set": {"status": "sending", "locked_until": lease, "lease_token": token}, "$inc": {"attempts": 1}}
+        )
+        leased = await email_outbox_collection.find({"lease_token": token}, {"_id": 0}).sort(
+            "next_attempt_at", 1
+        ).to_list(EMAIL_BATCH_SIZE)
+        
+        # Reclaimed after their last attempt's lease ran out
+        expired = [email for email in leased if email['attempts'] > EMAIL_MAX_ATTEMPTS]
+        if expired:
+            for email in expired:
+                logger.error(f"Email {email['id']} to {email['to']} dead-lettered after {EMAIL_MAX_ATTEMPTS} attempts: lease expired")
+            await email_outbox_collection.update_many(
+                {"id": {"$in": [email['id'] for email in expired]}, "lease_token": token},
+                {
+                    "$set": {
+                        "status": "dead",
+                        "attempts": EMAIL_MAX_ATTEMPTS,
+                        "last_error": "Delivery did not finish within the lease",
+                        "locked_until": None,
+                        "purge_at": now + timedelta(hours=EMAIL_RETENTION_HOURS)
+                    },
+                    "$unset": {"body": ""}
+                }
+            )
+        return [email for email in leased if email['attempts'] <= EMAIL_MAX_ATTEMPTS]
+    
+    async def _deliver(self, emails: List[dict]):
+        from database import email_outbox_collection
+        
+        async with self._semaphore:
+            errors = await asyncio.to_thread(self.transport.send_batch, emails)
+        
+        now = datetime.utcnow()
+        # BSON date, as the TTL index requires
+        purge_at = now + timedelta(hours=EMAIL_RETENTION_HOURS)
+        for email, error in zip(emails, errors):
+            # Only while we still hold the lease; after it expires another worker owns the email
+            leased = {"id": email['id'], "lease_token": email['lease_token']}
+            if error is None:
+                # The body can hold a verification code; it is not kept once delivered
+                await email_outbox_collection.update_one(
+                    leased,
+                    {
+                        "$set": {"status": "sent", "sent_at": now.isoformat(), "locked_until": None, "purge_at": purge_at},
+                        "$unset": {"body": ""}
+                    }
+                )
+                continue
             
-            logger.info(f"[EMAIL MOCK] Would send email to {to_email}")
-            logger.info(f"Subject: {subject}")
-            logger.info(f"Body:\n{body}")
-            return True
-        else:
-            # For development: just log the email
-            logger.info("="*60)
-            logger.info(f"[EMAIL] To: {to_email}")
-            logger.info(f"[EMAIL] Subject: {subject}")
-            logger.info(f"[EMAIL] Body:\n{body}")
-            logger.info("="*60)
-            return True
+            # Counted when the email was claimed
+            attempts = email['attempts']
+            if attempts >= EMAIL_MAX_ATTEMPTS:
+                logger.error(f"Email {email['id']} to {email['to']} dead-lettered after {attempts} attempts: {error}")
+                # Dead mail is never sent, so its body (and any code in it) goes too
+                update = {
+                    "$set": {"status": "dead", "last_error": error, "locked_until": None, "purge_at": purge_at},
+                    "$unset": {"body": ""}
+                }
+            else:
+                retry_at = now + timedelta(seconds=backoff_seconds(attempts))
+                logger.warning(f"Email {email['id']} to {email['to']} failed (attempt {attempts}), retrying at {retry_at}: {error}")
+                update = {"$set": {
+                    "status": "pending",
+                    "last_error": error,
+                    "next_attempt_at": retry_at.isoformat(),
+                    "locked_until": None
+                }}
+            await email_outbox_collection.update_one(leased, update)
+    
+    async def drain_once(self) -> int:
+        """Claim one batch and deliver it in EMAIL_CONCURRENCY-bounded chunks; returns the batch size"""
+        batch = await self._claim_batch()
+        if batch:
+            chunk_size = max(1, -(-len(batch) // EMAIL_CONCURRENCY))
+            chunks = [batch[i:i + chunk_size] for i in range(0, len(batch), chunk_size)]
+            await asyncio.gather(*(self._deliver(chunk) for chunk in chunks))
+        return len(batch)
+    
+    async def _run(self):
+        wakeup = self.service.wakeup
+        while not self._stopping:
+            # Cleared before draining so mail queued mid-drain still wakes the next iteration
+            wakeup.clear()
+            try:
+                if await self.drain_once():
+                    continue
+            except Exception as e:
+                logger.error(f"Email outbox worker error: {e}")
+            
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=EMAIL_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+    
+    def start(self):
+        self.service.wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Finish the batch in progress, then stop"""
+        if self._task is None:
+            return
+        self._stopping = True
+        self.service.wakeup.set()
+        await self._task
+        self._task = None
 
 # Singleton instance
 email_service = EmailService()
+email_outbox_worker = EmailOutboxWorker(email_service)
@@ -0,0 +1,115 @@
+"""
+Streaming CSV / NDJSON exports
+Rows are encoded as the Mongo cursor yields them, so an export of any size holds
+one batch in memory and the first bytes reach the client immediately.
+"""
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from typing import AsyncIterator, List, Optional
+
+from fastapi import HTTPException
+from starlette.responses import StreamingResponse
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+EXPORT_BATCH_SIZE = 500
+
+# Column order of each export; also the Mongo projection
+PAYOUT_COLUMNS = [
+    "id", "provider_id", "account_name", "bank_code", "bank_account_number",
+    "amount", "transfer_reference", "admin_notes", "created_at", "completed_at"
+]
+TRANSACTION_COLUMNS = [
+    "id", "booking_id", "customer_id", "provider_id", "amount", "platform_fee", "provider_earnings",
+    "payment_reference", "payment_status", "escrow_status", "created_at"
+]
+BOOKING_COLUMNS = [
+    "id", "service_id", "customer_id", "provider_id", "status", "payment_status", "total_amount",
+    "agreed_price", "price_negotiated", "preferred_date", "preferred_time", "slot_start", "slot_end",
+    "service_location", "created_at", "updated_at"
+]
+USER_COLUMNS = [
+    "id", "email", "full_name", "user_type", "phone", "location", "is_verified", "email_verified",
+    "is_active", "profile_completed", "created_at"
+]
+
+
+def export_projection(columns: List[str]) -> dict:
+    return {"_id": 0, **{column: 1 for column in columns}}
+
+
+def _cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=str)
+    return value
+
+
+async def csv_rows(cursor, columns: List[str]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    async for doc in cursor:
+        writer.writerow([_cell(doc.get(column)) for column in columns])
+        # Flush roughly every batch instead of once per row
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+async def ndjson_rows(cursor, columns: List[str]) -> AsyncIterator[str]:
+    lines = []
+    async for doc in cursor:
+        lines.append(json.dumps({column: doc.get(column) for column in columns}, default=str))
+        if len(lines) >= EXPORT_BATCH_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+def date_range(field: str, date_from: Optional[str], date_to: Optional[str]) -> dict:
+    """
+    Filter on an ISO-string date field. date_to is inclusive of the whole day when it is a bare date.
+    Raises 400 on unparseable input.
+    """
+    condition = {}
+    try:
+        if date_from:
+            condition["$gte"] = datetime.fromisoformat(date_from).isoformat()
+        if date_to:
+            parsed = datetime.fromisoformat(date_to)
+            if len(date_to) == 10:
+                condition["$lt"] = (parsed + timedelta(days=1)).isoformat()
+            else:
+                condition["$lte"] = parsed.isoformat()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be ISO 8601, e.g. 2025-01-31")
+    return {field: condition} if condition else {}
+
+
+def check_format(export_format: str):
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+
+
+def export_cursor(collection, query: dict, columns: List[str], sort_field: str = "created_at"):
+    """Oldest first, so an export can be resumed from the last date it contains"""
+    return collection.find(query, export_projection(columns)).sort(sort_field, 1).batch_size(EXPORT_BATCH_SIZE)
+
+
+def export_response(cursor, columns: List[str], export_format: str, filename: str) -> StreamingResponse:
+    check_format(export_format)
+    rows = csv_rows(cursor, columns) if export_format == "csv" else ndjson_rows(cursor, columns)
+    return StreamingResponse(
+        rows,
+        media_type=EXPORT_FORMATS[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+    )
@@ -0,0 +1,98 @@
+"""
+Idempotency-Key support for create endpoints
+The first request with a key claims it by inserting into idempotency_keys (unique on
+key), runs the endpoint and stores the response. Retries with the same key replay the
+stored response; a retry that arrives while the first is still running gets a 409.
+At most one request per key does the write, however many arrive concurrently.
+
+A claim whose request died mid-way can be taken over once LOCK_TIMEOUT has passed.
+Keys expire through a TTL index on expires_at (BSON datetimes, as TTL indexes require).
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+IDEMPOTENCY_TTL = timedelta(hours=float(os.environ.get('IDEMPOTENCY_TTL_HOURS', 24)))
+# Longer than any create request takes; after it an unfinished claim is presumed dead
+LOCK_TIMEOUT = timedelta(seconds=30)
+MAX_KEY_LENGTH = 128
+
+IN_PROGRESS = "in_progress"
+DONE = "done"
+
+
+def fingerprint(payload) -> str:
+    """Hash of the request body, to catch a key reused for a different request"""
+    return hashlib.sha256(json.dumps(jsonable_encoder(payload), sort_keys=True).encode()).hexdigest()
+
+
+async def _claim(key: str, request_hash: str, now: datetime) -> Optional[dict]:
+    """None if we own the key now, otherwise the existing record"""
+    from database import idempotency_keys_collection
+
+    try:
+        await idempotency_keys_collection.insert_one({
+            "key": key,
+            "request_hash": request_hash,
+            "status": IN_PROGRESS,
+            "locked_until": now + LOCK_TIMEOUT,
+            "created_at": now,
+            "expires_at": now + IDEMPOTENCY_TTL,
+        })
+        return None
+    except DuplicateKeyError:
+        pass
+
+    # Take over a claim abandoned by a crashed request; only one retry can win this update
+    taken = await idempotency_keys_collection.find_one_and_update(
+        {"key": key, "request_hash": request_hash, "status": IN_PROGRESS, "locked_until": {"$lt": now}},
+        {"$set": {"locked_until": now + LOCK_TIMEOUT}},
+        return_document=ReturnDocument.AFTER
+    )
+    if taken:
+        return None
+    return await idempotency_keys_collection.find_one({"key": key}, {"_id": 0})
+
+
+async def run_once(scope: str, user_id: str, idempotency_key: Optional[str], payload,
+                   create: Callable[[], Awaitable]):
+    """
+    Run create() at most once per (scope, user_id, idempotency_key) and return its result
+    Without a key create() simply runs. Replays return the stored JSON of the first response.
+    """
+    if not idempotency_key:
+        return await create()
+    if len(idempotency_key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+
+    from database import idempotency_keys_collection
+
+    key = f"{scope}:{user_id}:{idempotency_key}"
+    request_hash = fingerprint(payload)
+    existing = await _claim(key, request_hash, datetime.utcnow())
+    if existing is not None:
+        if existing['request_hash'] != request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        if existing['status'] != DONE:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still being processed")
+        return existing['response']
+
+    try:
+        result = await create()
+    except BaseException:
+        # Failed requests are not recorded, so the client can retry with the same key
+        await idempotency_keys_collection.delete_one({"key": key, "status": IN_PROGRESS})
+        raise
+
+    await idempotency_keys_collection.update_one(
+        {"key": key},
+        {"$set": {"status": DONE, "response": jsonable_encoder(result)}, "$unset": {"locked_until": ""}}
+    )
+    return result
@@ -0,0 +1,262 @@
+"""
+Index registry for every collection queried by server.py
+Applied idempotently at app startup, or manually:
+    python indexes.py            # create missing indexes
+    python indexes.py --verify   # explain() every registered query shape, fail on COLLSCAN
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE, TEXT, IndexModel
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logger = logging.getLogger(__name__)
+
+# collection name -> index models. Names are explicit so re-running is a no-op.
+INDEXES = {
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        # list_providers
+        IndexModel([("user_type", ASCENDING), ("is_active", ASCENDING)], name="user_type_is_active"),
+        # get_all_users (filtered and unfiltered)
+        IndexModel([("user_type", ASCENDING), ("created_at", DESCENDING)], name="user_type_created_at"),
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+    ],
+    "provider_profiles": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "services": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # get_provider_detail, list_providers, update/delete_service ownership checks
+        IndexModel([("provider_id", ASCENDING), ("id", ASCENDING)], name="provider_id_id"),
+        IndexModel([("category", ASCENDING), ("provider_id", ASCENDING)], name="category_provider_id"),
+        # sort_by=rating / relevance in list_all_services
+        IndexModel([("provider_rating", DESCENDING), ("ranking_score", DESCENDING)], name="provider_rating_ranking_score"),
+        IndexModel([("category", ASCENDING), ("provider_rating", DESCENDING), ("ranking_score", DESCENDING)],
+                   name="category_provider_rating_ranking_score"),
+        IndexModel([("ranking_score", DESCENDING)], name="ranking_score"),
+        IndexModel([("category", ASCENDING), ("ranking_score", DESCENDING)], name="category_ranking_score"),
+        # search_services
+        IndexModel([("title", TEXT), ("description", TEXT)], name="title_description_text",
+                   weights={"title": 10, "description": 1}, default_language="english"),
+        IndexModel([("location_point", GEOSPHERE)], name="location_point_2dsphere"),
+    ],
+    "bookings": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("provider_id", ASCENDING), ("created_at", DESCENDING)], name="provider_id_created_at"),
+        IndexModel([("customer_id", ASCENDING), ("created_at", DESCENDING)], name="customer_id_created_at"),
+        # get_recent_activity, month_bookings in get_admin_stats
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+        # active / completed counts in get_admin_stats
+        IndexModel([("payment_status", ASCENDING), ("status", ASCENDING)], name="payment_status_status"),
+        # schedule conflicts and available providers (scheduling.overlap_query)
+        IndexModel([("provider_id", ASCENDING), ("status", ASCENDING), ("slot_start", ASCENDING), ("slot_end", ASCENDING)],
+                   name="provider_id_status_slot"),
+        # price negotiation (negotiation.py): the open offer, and any offer in the history
+        IndexModel([("negotiation.offer_id", ASCENDING)], name="negotiation_offer_id",
+                   partialFilterExpression={"negotiation.offer_id": {"$exists": True}}),
+        IndexModel([("offers.id", ASCENDING)], name="offers_id", sparse=True),
+    ],
+    "messages": [
+        IndexModel([("booking_id", ASCENDING), ("created_at", ASCENDING)], name="booking_id_created_at"),
+    ],
+    "reviews": [
+        IndexModel([("provider_id", ASCENDING), ("created_at", DESCENDING)], name="provider_id_created_at"),
+        IndexModel([("booking_id", ASCENDING)], name="booking_id"),
+    ],
+    "transactions": [
+        IndexModel([("provider_id", ASCENDING), ("created_at", DESCENDING)], name="provider_id_created_at"),
+        IndexModel([("customer_id", ASCENDING), ("created_at", DESCENDING)], name="customer_id_created_at"),
+        IndexModel([("payment_status", ASCENDING), ("created_at", DESCENDING)], name="payment_status_created_at"),
+        # admin transaction export
+        IndexModel([("created_at", ASCENDING)], name="created_at"),
+    ],
+    "notifications": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_id_created_at"),
+        IndexModel([("id", ASCENDING), ("user_id", ASCENDING)], name="id_user_id"),
+        # unread count on the dashboard
+        IndexModel([("user_id", ASCENDING), ("is_read", ASCENDING)], name="user_id_is_read"),
+    ],
+    "withdrawals": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("provider_id", ASCENDING), ("created_at", DESCENDING)], name="provider_id_created_at"),
+        IndexModel([("provider_id", ASCENDING), ("status", ASCENDING)], name="provider_id_status"),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)], name="status_created_at"),
+        # approved payout export
+        IndexModel([("status", ASCENDING), ("completed_at", ASCENDING)], name="status_completed_at"),
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+    ],
+    "email_outbox": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # EmailOutboxWorker claims: due pending mail, and expired leases
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt_at"),
+        IndexModel([("status", ASCENDING), ("locked_until", ASCENDING)], name="status_locked_until"),
+        # Reading back the batch a claim just leased
+        IndexModel([("lease_token", ASCENDING)], name="lease_token"),
+        # Set once an email is sent or dead; Mongo drops it after the retention period
+        IndexModel([("purge_at", ASCENDING)], name="purge_at_ttl", expireAfterSeconds=0),
+    ],
+    "verification_codes": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        # Mongo drops the document once both the code and the resend window are over
+        IndexModel([("purge_at", ASCENDING)], name="purge_at_ttl", expireAfterSeconds=0),
+    ],
+    "wallet_ledger": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # One entry per sequence number, and per payment / withdrawal event
+        IndexModel([("provider_id", ASCENDING), ("seq", ASCENDING)], name="provider_id_seq_unique", unique=True),
+        IndexModel([("kind", ASCENDING), ("reference", ASCENDING)], name="kind_reference_unique", unique=True),
+    ],
+    "ai_descriptions": [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "idempotency_keys": [
+        # One claim per key is what makes a create run at most once
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "schedule_locks": [
+        # One lock per provider: a second claim while it is held fails on this index
+        IndexModel([("provider_id", ASCENDING)], name="provider_id_unique", unique=True),
+        # Locks left by crashed requests
+        IndexModel([("locked_until", ASCENDING)], name="locked_until_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# (collection, filter, sort) for every endpoint query; used by --verify.
+# Values are placeholders, only the shape matters to the planner.
+QUERY_SHAPES = [
+    ("users", {"email": "x"}, None),
+    ("users", {"id": "x"}, None),
+    ("users", {"id": "x", "user_type": "provider"}, None),
+    ("users", {"user_type": "provider", "is_active": True}, None),
+    ("users", {"user_type": "customer"}, [("created_at", DESCENDING)]),
+    ("users", {}, [("created_at", DESCENDING)]),
+    ("provider_profiles", {"user_id": "x"}, None),
+    ("services", {"id": "x"}, None),
+    ("services", {"id": "x", "provider_id": "x"}, None),
+    ("services", {"provider_id": "x"}, None),
+    ("services", {"category": "x"}, None),
+    ("services", {"category": "x", "provider_id": "x"}, None),
+    ("services", {}, [("provider_rating", DESCENDING), ("ranking_score", DESCENDING)]),
+    ("services", {"category": "x"}, [("provider_rating", DESCENDING), ("ranking_score", DESCENDING)]),
+    ("services", {}, [("ranking_score", DESCENDING)]),
+    ("services", {"category": "x"}, [("ranking_score", DESCENDING)]),
+    ("services", {"$text": {"$search": "x"}, "category": "x"}, None),
+    ("services", {"location_point": {"$geoWithin": {"$centerSphere": [[3.38, 6.52], 0.01]}}}, None),
+    ("bookings", {"id": "x"}, None),
+    ("bookings", {"id": "x", "customer_id": "x"}, None),
+    ("bookings", {"provider_id": "x"}, [("created_at", DESCENDING)]),
+    ("bookings", {"customer_id": "x"}, [("created_at", DESCENDING)]),
+    ("bookings", {"provider_id": "x", "status": {"$in": ["pending", "accepted"]},
+                  "slot_start": {"$gte": "x", "$lt": "x"}, "slot_end": {"$gt": "x"}}, None),
+    ("bookings", {"provider_id": {"$in": ["x"]}, "status": {"$in": ["pending", "accepted"]},
+                  "slot_start": {"$gte": "x", "$lt": "x"}, "slot_end": {"$gt": "x"}}, None),
+    ("bookings", {}, [("created_at", DESCENDING)]),
+    ("bookings", {"created_at": {"$gte": "x"}}, None),
+    ("bookings", {"payment_status": "paid"}, None),
+    ("bookings", {"status": {"$in": ["pending", "accepted"]}, "payment_status": "pending"}, None),
+    ("messages", {"booking_id": "x"}, [("created_at", ASCENDING)]),
+    ("reviews", {"provider_id": "x"}, [("created_at", DESCENDING)]),
+    ("reviews", {"booking_id": "x"}, None),
+    ("transactions", {"provider_id": "x"}, [("created_at", DESCENDING)]),
+    ("transactions", {"customer_id": "x"}, [("created_at", DESCENDING)]),
+    ("transactions", {"payment_status": "success"}, None),
+    ("transactions", {"created_at": {"$gte": "x"}}, [("created_at", ASCENDING)]),
+    ("notifications", {"user_id": "x"}, [("created_at", DESCENDING)]),
+    ("notifications", {"id": "x", "user_id": "x"}, None),
+    ("notifications", {"user_id": "x", "is_read": False}, None),
+    ("withdrawals", {"id": "x"}, None),
+    ("withdrawals", {"provider_id": "x"}, [("created_at", DESCENDING)]),
+    ("withdrawals", {"provider_id": "x", "status": "pending"}, None),
+    ("withdrawals", {"status": "pending"}, [("created_at", DESCENDING)]),
+    ("withdrawals", {}, [("created_at", DESCENDING)]),
+    ("withdrawals", {"id": {"$in": ["x"]}}, None),
+    ("withdrawals", {"status": "approved", "completed_at": {"$gte": "x"}}, [("completed_at", ASCENDING)]),
+    ("bookings", {"id": "x", "$or": [{"customer_id": "x"}, {"provider_id": "x"}], "negotiation": None,
+                  "price_negotiated": {"$ne": True}, "payment_status": "pending"}, None),
+    ("bookings", {"negotiation.offer_id": "x", "negotiation.receiver_id": "x", "payment_status": "pending"}, None),
+    ("bookings", {"offers.id": "x"}, None),
+    ("email_outbox", {"status": "pending", "next_attempt_at": {"$lte": "x"}}, [("next_attempt_at", ASCENDING)]),
+    ("email_outbox", {"status": "sending", "locked_until": {"$lte": "x"}}, None),
+    ("email_outbox", {"lease_token": "x"}, [("next_attempt_at", ASCENDING)]),
+    ("verification_codes", {"email": "x", "code_hash": "x", "code_expires_at": {"$gt": "x"}}, None),
+    ("ai_descriptions", {"key": "x", "expires_at": {"$gt": "x"}}, None),
+    ("wallet_ledger", {"provider_id": "x"}, [("seq", DESCENDING)]),
+    ("wallet_ledger", {}, [("provider_id", ASCENDING), ("seq", ASCENDING)]),
+    ("wallet_ledger", {"kind": "x", "reference": "x"}, None),
+    ("idempotency_keys", {"key": "x"}, None),
+    ("idempotency_keys", {"key": "x", "request_hash": "x", "status": "in_progress", "locked_until": {"$lt": "x"}}, None),
+    ("schedule_locks", {"provider_id": "x", "locked_until": {"$lt": "x"}}, None),
+    ("schedule_locks", {"provider_id": "x", "token": "x"}, None),
+]
+
+
+async def ensure_indexes(db):
+    """Create every registered index. Safe to call repeatedly."""
+    for collection_name, models in INDEXES.items():
+        names = await db[collection_name].create_indexes(models)
+        logger.info(f"Indexes ensured on {collection_name}: {', '.join(names)}")
+
+
+def _find_stages(plan: dict):
+    """Yield every stage name in a winning plan tree"""
+    if "stage" in plan:
+        yield plan["stage"]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            yield from _find_stages(plan[key])
+    for child in plan.get("inputStages", []):
+        yield from _find_stages(child)
+
+
+async def find_collection_scans(db):
+    """Return the registered query shapes whose winning plan contains a COLLSCAN"""
+    offenders = []
+    for collection_name, query, sort in QUERY_SHAPES:
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explanation = await cursor.explain()
+        winning_plan = explanation["queryPlanner"]["winningPlan"]
+        if "COLLSCAN" in set(_find_stages(winning_plan)):
+            offenders.append((collection_name, query, sort))
+    return offenders
+
+
+async def main(verify: bool = False) -> int:
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+
+    try:
+        await ensure_indexes(db)
+        print("Indexes ensured.")
+
+        if verify:
+            offenders = await find_collection_scans(db)
+            for collection_name, query, sort in offenders:
+                print(f"COLLSCAN: {collection_name} filter={query} sort={sort}")
+            if offenders:
+                return 1
+            print(f"All {len(QUERY_SHAPES)} query shapes use an index.")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create QuickOne MongoDB indexes")
+    parser.add_argument("--verify", action="store_true", help="fail if any endpoint query does a COLLSCAN")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main(verify=args.verify)))
@@ -0,0 +1,82 @@
+"""
+Lazily loaded third-party integrations
+Heavy client stacks (the LLM SDKs, the Paystack HTTP client) are imported on first use
+instead of at worker boot, so cold starts only pay for what a request actually needs.
+    await integrations.aget("llm")      # emergentintegrations.llm.chat
+    await integrations.aget("paystack") # PaystackClient
+benchmarks/importtime.py checks that none of them are imported by `import server`.
+"""
+import asyncio
+import logging
+import threading
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+_factories: Dict[str, Callable[[], Any]] = {}
+_instances: Dict[str, Any] = {}
+_lock = threading.Lock()
+
+# Top-level modules that must only ever be imported through this registry
+LAZY_MODULES = ("emergentintegrations", "litellm", "openai", "google.genai", "google.generativeai", "PIL", "httpx")
+
+
+def provider(name: str):
+    """Register a zero-argument factory, called once on the first get(name)"""
+    def decorator(factory: Callable[[], Any]):
+        _factories[name] = factory
+        return factory
+    return decorator
+
+
+def get(name: str):
+    try:
+        return _instances[name]
+    except KeyError:
+        pass
+    with _lock:
+        if name not in _instances:
+            logger.info(f"Loading integration: {name}")
+            _instances[name] = _factories[name]()
+        return _instances[name]
+
+
+async def aget(name: str):
+    """get() for request handlers: the first, slow import runs off the event loop"""
+    if name in _instances:
+        return _instances[name]
+    return await asyncio.to_thread(get, name)
+
+
+def loaded() -> list:
+    return sorted(_instances)
+
+
+async def close_all():
+    """Release resources held by loaded integrations (app shutdown)"""
+    for name, instance in list(_instances.items()):
+        close = getattr(instance, "aclose", None)
+        if close:
+            try:
+                await close()
+            except Exception as e:
+                logger.warning(f"Failed to close integration {name}: {e}")
+    _instances.clear()
+
+
+@provider("llm")
+def _llm():
+    from emergentintegrations.llm import chat
+    return chat
+
+
+@provider("llm_stream")
+def _llm_stream():
+    import litellm
+    return litellm
+
+
+@provider("paystack")
+def _paystack():
+    from paystack import PaystackClient
+    return PaystackClient()
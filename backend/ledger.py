@@ -0,0 +1,391 @@
+"""
+Provider wallet ledger
+Every change to a provider's balance is an append-only ledger entry with a per-provider
+sequence number. provider_profiles.balance / total_earned / ledger_seq are a snapshot of
+the ledger, updated in the same transaction as the entry is written, so wallet reads stay
+a single document lookup.
+
+Entries are unique per (kind, reference): posting the same payment credit or withdrawal
+release twice is a no-op.
+
+Profiles that had a balance before the ledger existed get a seq 0 "opening" entry on their
+first posting.
+
+Transactions need a replica set or mongos. On a standalone server postings fall back to
+unsessioned writes, serialized per provider by a lease lock on the profile
+(provider_profiles.ledger_lock): a posting whose entry insert or `then` fails reverses
+its $inc before releasing the lock, and a lock left behind by a crashed posting is
+reconciled by the next one. The verifier below is the safety net.
+
+Verify every balance against its ledger with:
+    python ledger.py
+"""
+import asyncio
+import logging
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from collections import defaultdict
+from typing import NamedTuple, Optional
+
+from dotenv import load_dotenv
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+logger = logging.getLogger(__name__)
+
+# Entry kinds
+OPENING = "opening"
+PAYMENT = "payment"
+WITHDRAWAL_HOLD = "withdrawal_hold"
+WITHDRAWAL_RELEASE = "withdrawal_release"
+
+# Float amounts are compared to the kobo
+TOLERANCE = 0.005
+
+# Standalone servers: a posting holding the lock longer than the lease is presumed dead
+LOCK_LEASE = timedelta(seconds=30)
+LOCK_WAIT_SECONDS = 5.0
+LOCK_POLL_SECONDS = 0.02
+
+_SNAPSHOT_PROJECTION = {"_id": 0, "balance": 1, "total_earned": 1, "ledger_seq": 1}
+_transactions_supported: Optional[bool] = None
+
+
+class AlreadyPosted(Exception):
+    """An entry with the same (kind, reference) exists"""
+
+
+class ProfileNotFound(Exception):
+    pass
+
+
+class InsufficientFunds(Exception):
+    def __init__(self, balance: float):
+        super().__init__(f"Insufficient balance: {balance}")
+        self.balance = balance
+
+
+class LedgerBusy(Exception):
+    """Another posting held the provider's ledger lock for longer than LOCK_WAIT_SECONDS"""
+
+
+def _money(value) -> float:
+    return round(value or 0.0, 2)
+
+
+async def transactions_supported() -> bool:
+    global _transactions_supported
+    if _transactions_supported is None:
+        from database import client
+
+        hello = await client.admin.command("hello")
+        _transactions_supported = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+        if not _transactions_supported:
+            logger.warning("MongoDB is standalone: ledger postings run without transactions")
+    return _transactions_supported
+
+
+def _entry(provider_id: str, seq: int, kind: str, reference: str, amount: float, earned: float,
+           balance_after: float, earned_after: float, memo: Optional[str]) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "provider_id": provider_id,
+        "seq": seq,
+        "kind": kind,
+        "reference": reference,
+        "amount": _money(amount),
+        "earned": _money(earned),
+        "balance_after": _money(balance_after),
+        "earned_after": _money(earned_after),
+        "memo": memo,
+        "created_at": datetime.utcnow().isoformat(),
+    }
+
+
+class Posting(NamedTuple):
+    provider_id: str
+    kind: str
+    reference: str
+    amount: float
+    earned: float = 0.0
+    memo: Optional[str] = None
+
+
+def _entries_for_snapshot(provider_id: str, snapshot: dict, postings: list) -> list:
+    """Ledger entries for postings already applied to snapshot by one $inc"""
+    seq = snapshot['ledger_seq'] - len(postings)
+    balance = snapshot.get('balance', 0.0) - sum(p.amount for p in postings)
+    earned = snapshot.get('total_earned', 0.0) - sum(p.earned for p in postings)
+    entries = []
+    if seq == 0 and (_money(balance) or _money(earned)):
+        entries.append(_entry(provider_id, 0, OPENING, provider_id, balance, earned,
+                              balance, earned, "Balance before the ledger"))
+    for posting in postings:
+        seq += 1
+        balance += posting.amount
+        earned += posting.earned
+        entries.append(_entry(provider_id, seq, posting.kind, posting.reference, posting.amount, posting.earned,
+                              balance, earned, posting.memo))
+    return entries
+
+
+async def _post_once(provider_id: str, kind: str, reference: str, amount: float, earned: float,
+                     memo: Optional[str], require_funds: bool, then, session=None, lock_token: Optional[str] = None) -> dict:
+    from database import provider_profiles_collection, wallet_ledger_collection
+
+    query = {"user_id": provider_id}
+    if lock_token is not None:
+        query["ledger_lock.token"] = lock_token
+    if require_funds and amount < 0:
+        # The funds check is part of the update, so concurrent debits cannot overdraw
+        query["balance"] = {"$gte": -amount}
+    update = {"$inc": {"balance": amount, "total_earned": earned, "ledger_seq": 1}}
+    if lock_token is not None:
+        # Lets the next lock holder undo this $inc if we die before writing the entry
+        update["$set"] = {"ledger_lock.posting": {"amount": amount, "earned": earned}}
+
+    # Snapshot first: the $inc allocates the next sequence number atomically
+    snapshot = await provider_profiles_collection.find_one_and_update(
+        query,
+        update,
+        projection=_SNAPSHOT_PROJECTION,
+        return_document=ReturnDocument.AFTER,
+        session=session
+    )
+    if snapshot is None:
+        profile = await provider_profiles_collection.find_one({"user_id": provider_id}, {"_id": 0, "balance": 1},
+                                                              session=session)
+        if profile is None:
+            raise ProfileNotFound()
+        raise InsufficientFunds(profile.get('balance', 0.0))
+
+    entries = _entries_for_snapshot(provider_id, snapshot, [Posting(provider_id, kind, reference, amount, earned, memo)])
+    try:
+        await wallet_ledger_collection.insert_many(entries, session=session)
+        if then is not None:
+            await then(session)
+    except BaseException:
+        # A transaction rolls everything back by itself
+        if lock_token is not None:
+            await wallet_ledger_collection.delete_many({"id": {"$in": [entry['id'] for entry in entries]}})
+            await _reverse(provider_id, lock_token, amount, earned)
+        raise
+    return entries[-1]
+
+
+async def _reverse(provider_id: str, lock_token: str, amount: float, earned: float):
+    """Undo the snapshot $inc of a posting whose entry was not written; we hold the lock"""
+    from database import provider_profiles_collection
+
+    await provider_profiles_collection.update_one(
+        {"user_id": provider_id, "ledger_lock.token": lock_token},
+        {"$inc": {"balance": -amount, "total_earned": -earned, "ledger_seq": -1},
+         "$unset": {"ledger_lock.posting": ""}}
+    )
+
+
+async def _lock(provider_id: str) -> str:
+    """Take the provider's ledger lock (standalone servers only); returns its token"""
+    from database import provider_profiles_collection, wallet_ledger_collection
+
+    token = str(uuid.uuid4())
+    deadline = asyncio.get_running_loop().time() + LOCK_WAIT_SECONDS
+    while True:
+        now = datetime.utcnow()
+        before = await provider_profiles_collection.find_one_and_update(
+            {"user_id": provider_id, "$or": [{"ledger_lock": None}, {"ledger_lock.until": {"$lt": now}}]},
+            {"$set": {"ledger_lock": {"token": token, "until": now + LOCK_LEASE}}},
+            projection={"_id": 0, "user_id": 1, "ledger_lock": 1, "ledger_seq": 1},
+            return_document=ReturnDocument.BEFORE
+        )
+        if before is not None:
+            posting = (before.get('ledger_lock') or {}).get('posting')
+            # A crashed posting's $inc stays only if it got as far as writing its entry
+            if posting and not await wallet_ledger_collection.find_one(
+                {"provider_id": provider_id, "seq": before.get('ledger_seq')}, {"_id": 1}
+            ):
+                logger.warning(f"Reversing an unfinished ledger posting for {provider_id}: {posting}")
+                await _reverse(provider_id, token, posting['amount'], posting['earned'])
+            return token
+
+        if not await provider_profiles_collection.find_one({"user_id": provider_id}, {"_id": 1}):
+            raise ProfileNotFound()
+        if asyncio.get_running_loop().time() >= deadline:
+            raise LedgerBusy()
+        await asyncio.sleep(LOCK_POLL_SECONDS)
+
+
+async def _unlock(provider_id: str, lock_token: str):
+    from database import provider_profiles_collection
+
+    await provider_profiles_collection.update_one(
+        {"user_id": provider_id, "ledger_lock.token": lock_token},
+        {"$unset": {"ledger_lock": ""}}
+    )
+
+
+async def _post_locked(provider_id: str, kind: str, reference: str, amount: float, earned: float,
+                       memo: Optional[str], require_funds: bool, then) -> dict:
+    """_post_once without a transaction, holding the provider's ledger lock"""
+    from database import wallet_ledger_collection
+
+    if await wallet_ledger_collection.find_one({"kind": kind, "reference": reference}, {"_id": 1}):
+        raise AlreadyPosted()
+
+    lock_token = await _lock(provider_id)
+    try:
+        return await _post_once(provider_id, kind, reference, amount, earned, memo, require_funds, then,
+                                lock_token=lock_token)
+    finally:
+        await _unlock(provider_id, lock_token)
+
+
+async def post(provider_id: str, kind: str, reference: str, amount: float, earned: float = 0.0,
+               memo: Optional[str] = None, require_funds: bool = False, then=None) -> dict:
+    """
+    Append an entry and move the balance snapshot by amount (and total_earned by earned)
+    require_funds: reject a debit that would take the balance below zero (InsufficientFunds)
+    then: async callable(session) for writes that must commit together with the entry
+    Raises AlreadyPosted if (kind, reference) was posted before, ProfileNotFound without a profile.
+    Nothing is posted if then raises.
+    """
+    try:
+        if not await transactions_supported():
+            return await _post_locked(provider_id, kind, reference, amount, earned, memo, require_funds, then)
+
+        from database import client
+
+        async with await client.start_session() as session:
+            return await session.with_transaction(
+                lambda s: _post_once(provider_id, kind, reference, amount, earned, memo, require_funds, then, session=s)
+            )
+    except (DuplicateKeyError, BulkWriteError):
+        # insert_many reports the (kind, reference) unique index as a BulkWriteError;
+        # our own entry was rolled back or reversed, so any entry found is the earlier one
+        from database import wallet_ledger_collection
+
+        if await wallet_ledger_collection.find_one({"kind": kind, "reference": reference}, {"_id": 1}):
+            raise AlreadyPosted()
+        raise
+
+
+async def post_many(postings: list, session) -> list:
+    """
+    Apply many postings inside the caller's transaction: one snapshot $inc per provider
+    and one insert_many for all entries. Returns the new entries.
+    """
+    from database import provider_profiles_collection, wallet_ledger_collection
+
+    by_provider = defaultdict(list)
+    for posting in postings:
+        by_provider[posting.provider_id].append(posting)
+
+    entries = []
+    for provider_id, provider_postings in by_provider.items():
+        snapshot = await provider_profiles_collection.find_one_and_update(
+            {"user_id": provider_id},
+            {"$inc": {
+                "balance": sum(p.amount for p in provider_postings),
+                "total_earned": sum(p.earned for p in provider_postings),
+                "ledger_seq": len(provider_postings),
+            }},
+            projection=_SNAPSHOT_PROJECTION,
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        if snapshot is None:
+            raise ProfileNotFound()
+        entries.extend(_entries_for_snapshot(provider_id, snapshot, provider_postings))
+    if entries:
+        await wallet_ledger_collection.insert_many(entries, session=session)
+    return entries
+
+
+async def entries_for(provider_id: str, limit: int = 50, before_seq: Optional[int] = None) -> list:
+    from database import wallet_ledger_collection
+
+    query = {"provider_id": provider_id}
+    if before_seq is not None:
+        query["seq"] = {"$lt": before_seq}
+    return await wallet_ledger_collection.find(query, {"_id": 0}).sort("seq", -1).to_list(limit)
+
+
+async def verify(db) -> list:
+    """
+    Recompute every provider's balance from the ledger in one streaming pass
+    Returns a list of problem descriptions; empty means every snapshot matches.
+    """
+    problems = []
+
+    async def check_snapshot(provider_id, balance, earned, last_seq):
+        profile = await db.provider_profiles.find_one({"user_id": provider_id}, _SNAPSHOT_PROJECTION)
+        if profile is None:
+            problems.append(f"{provider_id}: ledger entries without a provider profile")
+            return
+        if abs((profile.get('balance') or 0.0) - balance) > TOLERANCE:
+            problems.append(f"{provider_id}: balance {profile.get('balance')} != ledger {balance:.2f}")
+        if abs((profile.get('total_earned') or 0.0) - earned) > TOLERANCE:
+            problems.append(f"{provider_id}: total_earned {profile.get('total_earned')} != ledger {earned:.2f}")
+        if (profile.get('ledger_seq') or 0) != last_seq:
+            problems.append(f"{provider_id}: ledger_seq {profile.get('ledger_seq')} != last entry {last_seq}")
+
+    seen = set()
+    current = None
+    balance = earned = 0.0
+    expected_seq = 0
+    async for entry in db.wallet_ledger.find({}, {"_id": 0}).sort([("provider_id", 1), ("seq", 1)]):
+        if entry['provider_id'] != current:
+            if current is not None:
+                await check_snapshot(current, balance, earned, expected_seq - 1)
+            current = entry['provider_id']
+            seen.add(current)
+            balance = earned = 0.0
+            expected_seq = 0 if entry['seq'] == 0 else 1
+
+        if entry['seq'] != expected_seq:
+            problems.append(f"{current}: expected seq {expected_seq}, found {entry['seq']}")
+        expected_seq = entry['seq'] + 1
+
+        balance += entry['amount']
+        earned += entry.get('earned', 0.0)
+        if abs(entry['balance_after'] - balance) > TOLERANCE or abs(entry['earned_after'] - earned) > TOLERANCE:
+            problems.append(f"{current} seq {entry['seq']}: snapshot in entry does not match running totals")
+            balance, earned = entry['balance_after'], entry['earned_after']
+        if balance < -TOLERANCE:
+            problems.append(f"{current} seq {entry['seq']}: balance went negative ({balance:.2f})")
+
+    if current is not None:
+        await check_snapshot(current, balance, earned, expected_seq - 1)
+
+    # Snapshots that moved without any ledger entry behind them
+    async for profile in db.provider_profiles.find({"ledger_seq": {"$gt": 0}}, {"_id": 0, "user_id": 1, "ledger_seq": 1}):
+        if profile['user_id'] not in seen:
+            problems.append(f"{profile['user_id']}: ledger_seq {profile['ledger_seq']} but no ledger entries")
+    return problems
+
+
+async def main() -> int:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        problems = await verify(db)
+        for problem in problems:
+            print(problem)
+        if problems:
+            return 1
+        print("All wallet balances match the ledger.")
+        return 0
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,256 @@
+"""
+Prometheus-style metrics
+Minimal in-process registry rendered in the text exposition format at GET /metrics.
+Metric updates can come from pymongo monitoring threads, so every metric is lock-protected.
+"""
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Tuple
+
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(label_names: Tuple[str, ...], label_values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            for label_values, value in self._values.items():
+                lines.append(f"{self.name}{_format_labels(self.label_names, label_values)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def __init__(self, *args, callback: Callable[[], Dict[Tuple[str, ...], float]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._callback = callback
+
+    def dec(self, *label_values, amount: float = 1.0):
+        self.inc(*label_values, amount=-amount)
+
+    def set(self, value: float, *label_values):
+        with self._lock:
+            self._values[label_values] = value
+
+    def render(self):
+        if self._callback is not None:
+            with self._lock:
+                self._values = dict(self._callback())
+        return super().render()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets=DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *label_values):
+        with self._lock:
+            state = self._values.get(label_values)
+            if state is None:
+                state = self._values[label_values] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            for label_values, state in self._values.items():
+                for i, bound in enumerate(self.buckets):
+                    labels = _format_labels(self.label_names, label_values, f'le="{bound}"')
+                    lines.append(f"{self.name}_bucket{labels} {state[i]}")
+                labels = _format_labels(self.label_names, label_values, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {state[-1]}")
+                labels = _format_labels(self.label_names, label_values)
+                lines.append(f"{self.name}_sum{labels} {state[-2]}")
+                lines.append(f"{self.name}_count{labels} {state[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+# HTTP
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+))
+http_request_duration_seconds = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route")
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"
+))
+
+# Outbound calls (Paystack, LLM)
+outbound_request_duration_seconds = registry.register(Histogram(
+    "outbound_request_duration_seconds", "Latency of calls to external services", ("service", "operation", "outcome")
+))
+
+# MongoDB connection pool
+mongo_pool_connections = registry.register(Gauge(
+    "mongo_pool_connections", "Open MongoDB connections per server", ("address",)
+))
+mongo_pool_checked_out = registry.register(Gauge(
+    "mongo_pool_checked_out", "MongoDB connections currently checked out per server", ("address",)
+))
+mongo_pool_checkout_failures_total = registry.register(Counter(
+    "mongo_pool_checkout_failures_total", "Failed MongoDB connection checkouts", ("address", "reason")
+))
+
+
+def register_websocket_gauge(manager):
+    """Expose ConnectionManager state; read at scrape time"""
+    registry.register(Gauge(
+        "websocket_connections", "Open chat WebSocket connections",
+        callback=lambda: {(): sum(len(c) for c in manager.active_connections.values())}
+    ))
+    registry.register(Gauge(
+        "websocket_rooms", "Bookings with at least one open chat WebSocket",
+        callback=lambda: {(): sum(1 for c in manager.active_connections.values() if c)}
+    ))
+
+
+@asynccontextmanager
+async def observe_outbound(service: str, operation: str):
+    """Time a call to an external service"""
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        outbound_request_duration_seconds.observe(time.perf_counter() - started, service, operation, outcome)
+
+
+def _address(event) -> str:
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Feeds pymongo connection pool events into the pool gauges"""
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        mongo_pool_connections.set(0, _address(event))
+        mongo_pool_checked_out.set(0, _address(event))
+
+    def connection_created(self, event):
+        mongo_pool_connections.inc(_address(event))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        mongo_pool_connections.dec(_address(event))
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        mongo_pool_checkout_failures_total.inc(_address(event), str(event.reason))
+
+    def connection_checked_out(self, event):
+        mongo_pool_checked_out.inc(_address(event))
+
+    def connection_checked_in(self, event):
+        mongo_pool_checked_out.dec(_address(event))
+
+
+pool_listener = PoolStatsListener()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route request counts and latency"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec()
+            # Use the route template, not the raw path, to keep label cardinality bounded
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            http_requests_total.inc(method, route_path, str(status_code))
+            http_request_duration_seconds.observe(time.perf_counter() - started, method, route_path)
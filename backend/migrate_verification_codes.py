@@ -0,0 +1,70 @@
+"""
+Migration script to move pending email verification codes off user documents
+Unexpired plaintext codes are hashed into the verification_codes collection,
+then the old fields are removed from every user.
+Run this once after deploying the verification_codes collection.
+"""
+import asyncio
+from motor.motor_asyncio import AsyncIOMotorClient
+import os
+from dotenv import load_dotenv
+from pathlib import Path
+from datetime import datetime
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+from verification import RESEND_WINDOW, hash_code
+
+LEGACY_FIELDS = ["email_verification_code", "code_expires_at", "code_resend_count", "last_code_sent_at"]
+
+async def migrate():
+    mongo_url = os.environ['MONGO_URL']
+    client = AsyncIOMotorClient(mongo_url)
+    db = client[os.environ['DB_NAME']]
+    
+    print("Starting migration...")
+    
+    now = datetime.utcnow()
+    moved = 0
+    async for user in db.users.find(
+        {"email_verified": {"$ne": True}, "email_verification_code": {"$nin": [None, ""]}},
+        {"_id": 0, "email": 1, "email_verification_code": 1, "code_expires_at": 1, "code_resend_count": 1, "last_code_sent_at": 1}
+    ):
+        code_expires_at = user.get('code_expires_at')
+        if isinstance(code_expires_at, str):
+            code_expires_at = datetime.fromisoformat(code_expires_at)
+        if not code_expires_at or code_expires_at <= now:
+            continue
+        
+        last_sent = user.get('last_code_sent_at') or now
+        if isinstance(last_sent, str):
+            last_sent = datetime.fromisoformat(last_sent)
+        
+        await db.verification_codes.update_one(
+            {"email": user['email']},
+            {"$setOnInsert": {
+                "code_hash": hash_code(user['email'], user['email_verification_code']),
+                "code_expires_at": code_expires_at,
+                "attempts": 0,
+                "last_sent_at": last_sent,
+                "resend_count": user.get('code_resend_count', 0),
+                "window_started_at": last_sent,
+                "purge_at": max(code_expires_at, last_sent + RESEND_WINDOW),
+            }},
+            upsert=True
+        )
+        moved += 1
+    print(f"Moved {moved} pending verification codes to verification_codes")
+    
+    users_result = await db.users.update_many(
+        {"$or": [{field: {"$exists": True}} for field in LEGACY_FIELDS]},
+        {"$unset": {field: "" for field in LEGACY_FIELDS}}
+    )
+    print(f"Removed verification fields from {users_result.modified_count} users")
+    
+    print("Migration completed!")
+    client.close()
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -28,10 +28,8 @@ class User(UserBase):
     is_active: bool = True
     email_verified: bool = False
     profile_completed: bool = False
-    email_verification_code: Optional[str] = None
-    code_expires_at: Optional[datetime] = None
-    code_resend_count: int = 0
-    last_code_sent_at: Optional[datetime] = None
+    completion: int = 0  # Bitmap of completed required fields, see completeness.py
+    completion_percentage: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
     
 class UserUpdate(BaseModel):
@@ -64,6 +62,7 @@ class ProviderProfile(ProviderProfileBase):
     average_rating: float = 0.0
     total_reviews: int = 0
     total_bookings: int = 0
+    ledger_seq: int = 0  # Last wallet ledger entry reflected in balance / total_earned
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class ProviderProfileUpdate(BaseModel):
@@ -131,6 +130,11 @@ class Booking(BookingBase):
     total_amount: float = 0.0
     agreed_price: Optional[float] = None
     price_negotiated: bool = False
+    # Interval the booking occupies in the provider's schedule, see scheduling.py
+    slot_start: Optional[datetime] = None
+    slot_end: Optional[datetime] = None
+    # Open price offer {offer_id, amount, sender_id, receiver_id}, see negotiation.py
+    negotiation: Optional[dict] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -210,6 +214,12 @@ class WithdrawalAction(BaseModel):
     admin_notes: Optional[str] = None
     transaction_reference: Optional[str] = None
 
+class WithdrawalBulkItem(WithdrawalAction):
+    id: str
+
+class WithdrawalBulkRequest(BaseModel):
+    items: List[WithdrawalBulkItem] = Field(..., min_length=1, max_length=500)
+
 # Email Verification Models
 class EmailVerificationRequest(BaseModel):
     email: EmailStr
@@ -0,0 +1,199 @@
+"""
+Price negotiation on the booking document
+The offer history is a capped, ordered array (bookings.offers, oldest first) and the
+open offer, if any, is bookings.negotiation = {offer_id, amount, sender_id, receiver_id}.
+
+    no open offer --offer--> open --accept--> agreed (price_negotiated, final)
+                              |  --decline--> no open offer
+                              |  --counter--> open (the other party's offer)
+
+Every transition is one conditional find_one_and_update with an aggregation pipeline:
+the filter is the precondition (who may act, which offer is open), so a stale or
+repeated accept/decline/counter matches nothing instead of racing the first one.
+User-supplied values enter the pipeline through $literal.
+
+Move offers from the old price_offers collection with:
+    python negotiation.py
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from pymongo import ReturnDocument
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# Offers kept per booking; older ones fall off the front of the array
+MAX_OFFERS = 50
+
+_OFFERS = {"$ifNull": ["$offers", []]}
+
+
+def _offer(offer_id: str, sender_id, receiver_id, amount: float, offer_type: str, message: Optional[str], now: str) -> dict:
+    return {
+        "id": offer_id,
+        "booking_id": "$id",
+        "sender_id": sender_id,
+        "receiver_id": receiver_id,
+        "offer_amount": {"$literal": amount},
+        "offer_type": offer_type,
+        "status": "pending",
+        "message": {"$literal": message},
+        "created_at": now,
+    }
+
+
+def _close_open_offer(status: str, offer_type: Optional[str] = None) -> dict:
+    """offers with the open one marked status"""
+    fields = {"status": status, **({"offer_type": offer_type} if offer_type else {})}
+    return {"$map": {"input": _OFFERS, "as": "o", "in": {"$cond": [
+        {"$eq": ["$$o.id", "$negotiation.offer_id"]}, {"$mergeObjects": ["$$o", fields]}, "$$o"
+    ]}}}
+
+
+def _append(offers: dict, offer: dict) -> dict:
+    return {"$slice": [{"$concatArrays": [offers, [offer]]}, -MAX_OFFERS]}
+
+
+async def _explain_offer_failure(booking_id: str, user_id: str):
+    from database import bookings_collection
+
+    booking = await bookings_collection.find_one(
+        {"id": booking_id},
+        {"_id": 0, "customer_id": 1, "provider_id": 1, "price_negotiated": 1, "payment_status": 1, "negotiation": 1}
+    )
+    if not booking:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    if user_id not in (booking['customer_id'], booking['provider_id']):
+        raise HTTPException(status_code=403, detail="Unauthorized")
+    if booking.get('price_negotiated') or booking.get('payment_status') != "pending":
+        raise HTTPException(status_code=409, detail="The price for this booking is already settled")
+    raise HTTPException(status_code=409, detail="An offer on this booking is still awaiting a response")
+
+
+async def make_offer(booking_id: str, user_id: str, amount: float, message: Optional[str]) -> dict:
+    """Open a negotiation with an initial offer; returns the new offer"""
+    from database import bookings_collection
+
+    offer_id = str(uuid.uuid4())
+    now = datetime.utcnow().isoformat()
+    other_party = {"$cond": [{"$eq": ["$customer_id", user_id]}, "$provider_id", "$customer_id"]}
+    booking = await bookings_collection.find_one_and_update(
+        {
+            "id": booking_id,
+            "$or": [{"customer_id": user_id}, {"provider_id": user_id}],
+            "negotiation": None,
+            "price_negotiated": {"$ne": True},
+            "payment_status": "pending",
+        },
+        [{"$set": {
+            "offers": _append(_OFFERS, _offer(offer_id, user_id, other_party, amount, "initial", message, now)),
+            "negotiation": {"offer_id": offer_id, "amount": {"$literal": amount},
+                            "sender_id": user_id, "receiver_id": other_party},
+            "updated_at": now,
+        }}],
+        # Just the offer we appended
+        projection={"_id": 0, "id": 1, "offers": {"$slice": -1}},
+        return_document=ReturnDocument.AFTER
+    )
+    if booking is None:
+        await _explain_offer_failure(booking_id, user_id)
+    return booking['offers'][-1]
+
+
+async def respond(offer_id: str, user_id: str, action: str, counter_amount: Optional[float] = None,
+                  message: Optional[str] = None) -> dict:
+    """
+    Accept, decline or counter the open offer offer_id as its receiver
+    Returns the parties and agreed_price of the booking after the transition.
+    """
+    from database import bookings_collection
+
+    now = datetime.utcnow().isoformat()
+    if action == "accept":
+        changes = {
+            "offers": _close_open_offer("accepted", "accepted"),
+            "agreed_price": "$negotiation.amount",
+            "total_amount": "$negotiation.amount",
+            "price_negotiated": True,
+            "negotiation": None,
+        }
+    elif action == "decline":
+        changes = {"offers": _close_open_offer("declined", "declined"), "negotiation": None}
+    else:
+        counter_id = str(uuid.uuid4())
+        changes = {
+            "offers": _append(
+                _close_open_offer("countered"),
+                _offer(counter_id, user_id, "$negotiation.sender_id", counter_amount, "counter", message, now)
+            ),
+            "negotiation": {"offer_id": counter_id, "amount": {"$literal": counter_amount},
+                            "sender_id": user_id, "receiver_id": "$negotiation.sender_id"},
+        }
+
+    # All expressions of one $set stage read the document as it was before the stage
+    booking = await bookings_collection.find_one_and_update(
+        {"negotiation.offer_id": offer_id, "negotiation.receiver_id": user_id, "payment_status": "pending"},
+        [{"$set": {**changes, "updated_at": now}}],
+        projection={"_id": 0, "customer_id": 1, "provider_id": 1, "agreed_price": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if booking is None:
+        offer = await bookings_collection.find_one(
+            {"offers.id": offer_id}, {"_id": 0, "offers": {"$elemMatch": {"id": offer_id}}}
+        )
+        if not offer:
+            raise HTTPException(status_code=404, detail="Offer not found")
+        if offer['offers'][0]['receiver_id'] != user_id:
+            raise HTTPException(status_code=403, detail="Only the receiver can respond to this offer")
+        raise HTTPException(status_code=409, detail="This offer has already been answered")
+    return booking
+
+
+async def migrate(db) -> int:
+    """Embed price_offers documents into their bookings; bookings that already have offers are skipped"""
+    moved = 0
+    booking_ids = await db.price_offers.distinct("booking_id")
+    for booking_id in booking_ids:
+        offers = await db.price_offers.find({"booking_id": booking_id}, {"_id": 0}).sort("created_at", 1).to_list(None)
+        booking = await db.bookings.find_one({"id": booking_id}, {"_id": 0, "price_negotiated": 1})
+        if not booking:
+            continue
+        offers = offers[-MAX_OFFERS:]
+        open_offer = offers[-1] if offers[-1].get('status') == "pending" and not booking.get('price_negotiated') else None
+        # Only the newest offer can stay open
+        for offer in offers[:-1]:
+            if offer.get('status') == "pending":
+                offer['status'] = "countered"
+        negotiation = {
+            "offer_id": open_offer['id'],
+            "amount": open_offer['offer_amount'],
+            "sender_id": open_offer['sender_id'],
+            "receiver_id": open_offer['receiver_id'],
+        } if open_offer else None
+        result = await db.bookings.update_one(
+            {"id": booking_id, "offers": {"$exists": False}},
+            {"$set": {"offers": offers, "negotiation": negotiation}}
+        )
+        moved += result.modified_count
+    return moved
+
+
+async def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    moved = await migrate(db)
+    print(f"Embedded price offers into {moved} bookings; the price_offers collection can be dropped")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,32 @@
+"""
+Paystack API client
+Loaded through integrations.aget("paystack"); one pooled httpx client per worker.
+"""
+import os
+
+import httpx
+
+from metrics import observe_outbound
+
+PAYSTACK_BASE_URL = "https://api.paystack.co"
+PAYSTACK_TIMEOUT = float(os.environ.get('PAYSTACK_TIMEOUT', 5))
+
+
+class PaystackClient:
+    def __init__(self, secret_key: str = None):
+        self.secret_key = secret_key or os.environ.get('PAYSTACK_SECRET_KEY')
+        self._client = httpx.AsyncClient(base_url=PAYSTACK_BASE_URL, timeout=PAYSTACK_TIMEOUT)
+
+    def _headers(self) -> dict:
+        return {"Authorization": f"Bearer {self.secret_key}"}
+
+    async def initialize_transaction(self, payload: dict) -> httpx.Response:
+        async with observe_outbound("paystack", "initialize"):
+            return await self._client.post("/transaction/initialize", headers=self._headers(), json=payload)
+
+    async def verify_transaction(self, reference: str) -> httpx.Response:
+        async with observe_outbound("paystack", "verify"):
+            return await self._client.get(f"/transaction/verify/{reference}", headers=self._headers())
+
+    async def aclose(self):
+        await self._client.aclose()
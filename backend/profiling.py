@@ -0,0 +1,154 @@
+"""
+On-demand request profiling
+When PROFILING_ENABLED=true, an admin can profile a single request by sending
+    X-Profile: store    (or ?__profile=store)  -> samples saved to PROFILE_DIR, id in X-Profile-Id
+    X-Profile: return   (or ?__profile=return) -> response body replaced by the samples
+Samples are in collapsed-stack format, ready for flamegraph.pl or speedscope.
+Requests without the flag only pay for a header lookup.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'false').lower() == 'true'
+PROFILE_DIR = Path(os.environ.get('PROFILE_DIR', '/tmp/quickone-profiles'))
+PROFILE_INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL_MS', 1))
+
+# Innermost frames of a thread parked with nothing to do
+_IDLE_FILES = ("threading.py", "queue.py", os.path.join("concurrent", "futures", "thread.py"))
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the event loop thread (and any busy worker thread) at a fixed interval"""
+
+    def __init__(self, loop_thread_id: int, interval: float):
+        self.loop_thread_id = loop_thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                if thread_id != self.loop_thread_id and frame.f_code.co_filename.endswith(_IDLE_FILES):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                root = "[event loop]" if thread_id == self.loop_thread_id else f"[{names.get(thread_id, thread_id)}]"
+                stack.append(root)
+                self.samples[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+
+async def _is_admin(scope) -> bool:
+    from auth import decode_token
+    from database import users_collection
+
+    headers = dict(scope.get("headers", []))
+    authorization = headers.get(b"authorization", b"").decode()
+    if not authorization.lower().startswith("bearer "):
+        return False
+    payload = decode_token(authorization[7:])
+    if payload is None:
+        return False
+    user = await users_collection.find_one({"id": payload.get("user_id")}, {"_id": 0, "user_type": 1})
+    return bool(user) and user.get("user_type") == "admin"
+
+
+def _requested_mode(scope):
+    for name, value in scope.get("headers", []):
+        if name == b"x-profile":
+            return value.decode().lower()
+    query_string = scope.get("query_string", b"")
+    if b"__profile" in query_string:
+        values = parse_qs(query_string.decode()).get("__profile")
+        if values:
+            return values[0].lower()
+    return None
+
+
+class ProfilingMiddleware:
+    """ASGI middleware wrapping flagged admin requests in a StackSampler"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not PROFILING_ENABLED or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = _requested_mode(scope)
+        if mode not in ("store", "return", "1", "true") or not await _is_admin(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = f"{int(time.time())}-{uuid.uuid4().hex[:8]}"
+        sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        async def discard(message):
+            pass
+
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, discard if mode == "return" else send_with_profile_id)
+        finally:
+            sampler.stop()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        output = sampler.collapsed()
+
+        if mode == "return":
+            body = output.encode()
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"text/plain; charset=utf-8"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"x-profile-id", profile_id.encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+        else:
+            PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+            (PROFILE_DIR / f"{profile_id}.collapsed").write_text(output)
+
+        logger.info(
+            f"[PROFILE] {profile_id} {scope.get('method')} {scope.get('path')} "
+            f"{elapsed_ms:.1f}ms, {sum(sampler.samples.values())} samples"
+        )
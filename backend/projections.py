@@ -0,0 +1,149 @@
+"""
+Summary projections for list endpoints
+List views only get the fields a browse card needs. Image fields are replaced
+by reference URLs served from /api/images/..., and long text is left out.
+Clients that need more pass fields=a,b,c (extra fields) or fields=all.
+"""
+from typing import Optional
+
+from fastapi import HTTPException
+
+# Computed in Mongo so the image payloads never leave the server
+_IMAGE_COUNT = {"$size": {"$ifNull": ["$images", []]}}
+_PORTFOLIO_COUNT = {"$size": {"$ifNull": ["$portfolio_images", []]}}
+# An empty string is no photo, as much as a missing or null field
+_HAS_PHOTO = {"$ne": [{"$ifNull": ["$profile_photo", ""]}, ""]}
+
+SERVICE_SUMMARY = {
+    "_id": 0,
+    "id": 1,
+    "provider_id": 1,
+    "title": 1,
+    "category": 1,
+    "price": 1,
+    "duration": 1,
+    "location": 1,
+    "latitude": 1,
+    "longitude": 1,
+    "created_at": 1,
+    "updated_at": 1,
+    "provider_rating": 1,
+    "ranking_score": 1,
+    "image_count": _IMAGE_COUNT,
+}
+SERVICE_FIELDS = {"description", "images"}
+
+USER_SUMMARY = {
+    "_id": 0,
+    "id": 1,
+    "full_name": 1,
+    "user_type": 1,
+    "location": 1,
+    "latitude": 1,
+    "longitude": 1,
+    "created_at": 1,
+    "has_photo": _HAS_PHOTO,
+}
+# Public provider cards
+PROVIDER_USER_FIELDS = {"phone", "profile_photo"}
+
+# Admin user list; still never returns password or verification state
+ADMIN_USER_SUMMARY = {
+    **USER_SUMMARY,
+    "email": 1,
+    "phone": 1,
+    "is_verified": 1,
+    "is_active": 1,
+    "email_verified": 1,
+    "profile_completed": 1,
+}
+ADMIN_USER_FIELDS = {"profile_photo"}
+# fields=all for user documents
+USER_EXCLUDED = {
+    "_id": 0,
+    "password": 0,
+    # Legacy verification fields; migrate_verification_codes.py removes them
+    "email_verification_code": 0,
+    "code_expires_at": 0,
+    "code_resend_count": 0,
+    "last_code_sent_at": 0,
+}
+
+PROFILE_SUMMARY = {
+    "_id": 0,
+    "user_id": 1,
+    "bio": 1,
+    "service_categories": 1,
+    "pricing_type": 1,
+    "hourly_rate": 1,
+    "fixed_price": 1,
+    "years_experience": 1,
+    "is_available": 1,
+    "average_rating": 1,
+    "total_reviews": 1,
+    "total_bookings": 1,
+    "portfolio_count": _PORTFOLIO_COUNT,
+}
+# Wallet and bank details are never exposed through the public provider list
+PROFILE_FIELDS = {"portfolio_images"}
+# Booking documents; the offer history is served by /bookings/{id}/offers
+BOOKING_EXCLUDED = {"_id": 0, "offers": 0}
+
+PROFILE_EXCLUDED = {
+    "_id": 0,
+    "balance": 0,
+    "total_earned": 0,
+    "ledger_seq": 0,
+    "ledger_lock": 0,
+    "bank_account_number": 0,
+    "bank_code": 0,
+    "account_name": 0,
+}
+
+
+def parse_fields(fields: Optional[str], allowed: set):
+    """Parse a fields= value. Returns None for the summary, "all", or a set of extra fields"""
+    if not fields:
+        return None
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    if "all" in requested:
+        return "all"
+    unknown = requested - allowed
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}. Allowed: all, {', '.join(sorted(allowed))}"
+        )
+    return requested
+
+
+def build_projection(summary: dict, selected, full: Optional[dict] = None) -> dict:
+    """Mongo projection for a parse_fields() result"""
+    if selected == "all":
+        return dict(full or {"_id": 0})
+    projection = dict(summary)
+    for field in selected or ():
+        projection[field] = 1
+    return projection
+
+
+def service_image_url(service_id: str, index: int = 0) -> str:
+    return f"/api/images/services/{service_id}/{index}"
+
+
+def user_photo_url(user_id: str) -> str:
+    return f"/api/images/users/{user_id}/photo"
+
+
+def with_service_refs(service: dict) -> dict:
+    """Swap the computed image_count for a thumbnail reference"""
+    if "image_count" in service:
+        service["thumbnail_url"] = service_image_url(service["id"]) if service["image_count"] else None
+    return service
+
+
+def with_user_refs(user: dict) -> dict:
+    """Swap the computed has_photo flag for a photo reference"""
+    if "has_photo" in user:
+        user["profile_photo_url"] = user_photo_url(user["id"]) if user.pop("has_photo") else None
+    return user
@@ -0,0 +1,107 @@
+"""
+Service ranking
+Provider signals (rating, bookings, availability) are denormalized onto every service
+document so /services can sort by rating or relevance straight from an index.
+Refreshed whenever a provider's rating, booking count or availability changes.
+
+Backfill existing data with:
+    python ranking.py
+"""
+import asyncio
+import math
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+# Weights of the static part of the score (sum to 1)
+RATING_WEIGHT = 0.5
+BOOKINGS_WEIGHT = 0.3
+AVAILABILITY_WEIGHT = 0.2
+# Bookings count saturates here; beyond it more bookings add nothing
+BOOKINGS_CAP = 200
+# Share of the relevance score given to distance when the caller sends a location
+DISTANCE_WEIGHT = 0.4
+# Distance at which the distance component halves, in km
+DISTANCE_HALF_KM = 10.0
+
+
+def static_score(average_rating: float, total_bookings: int, is_available: bool) -> float:
+    """Location-independent ranking score in [0, 1]"""
+    rating_part = min(max(average_rating or 0.0, 0.0), 5.0) / 5.0
+    bookings_part = math.log1p(min(total_bookings or 0, BOOKINGS_CAP)) / math.log1p(BOOKINGS_CAP)
+    availability_part = 1.0 if is_available else 0.0
+    return round(
+        RATING_WEIGHT * rating_part + BOOKINGS_WEIGHT * bookings_part + AVAILABILITY_WEIGHT * availability_part,
+        6
+    )
+
+
+def relevance_score(ranking_score: float, distance_km) -> float:
+    """Blend the stored static score with distance from the caller"""
+    if distance_km is None:
+        return (1 - DISTANCE_WEIGHT) * (ranking_score or 0.0)
+    proximity = DISTANCE_HALF_KM / (DISTANCE_HALF_KM + distance_km)
+    return (1 - DISTANCE_WEIGHT) * (ranking_score or 0.0) + DISTANCE_WEIGHT * proximity
+
+
+def ranking_fields(profile: dict) -> dict:
+    """Denormalized fields stored on each of the provider's services"""
+    profile = profile or {}
+    average_rating = profile.get('average_rating', 0.0) or 0.0
+    total_bookings = profile.get('total_bookings', 0) or 0
+    is_available = profile.get('is_available', True)
+    return {
+        "provider_rating": average_rating,
+        "provider_bookings": total_bookings,
+        "provider_available": is_available,
+        "ranking_score": static_score(average_rating, total_bookings, is_available),
+    }
+
+
+_PROFILE_RANKING_PROJECTION = {"_id": 0, "average_rating": 1, "total_bookings": 1, "is_available": 1}
+
+
+async def get_ranking_fields(provider_id: str) -> dict:
+    from database import provider_profiles_collection
+    profile = await provider_profiles_collection.find_one({"user_id": provider_id}, _PROFILE_RANKING_PROJECTION)
+    return ranking_fields(profile)
+
+
+async def refresh_provider_ranking(provider_id: str):
+    """Re-denormalize a provider's ranking signals onto all of their services"""
+    from database import services_collection
+    from cache import invalidate_services
+
+    fields = await get_ranking_fields(provider_id)
+    await services_collection.update_many({"provider_id": provider_id}, {"$set": fields})
+    invalidate_services(provider_id=provider_id)
+
+
+async def backfill(db):
+    """Recompute ranking fields for every provider with services"""
+    updated = 0
+    async for profile in db.provider_profiles.find({}, {**_PROFILE_RANKING_PROJECTION, "user_id": 1}):
+        result = await db.services.update_many(
+            {"provider_id": profile['user_id']},
+            {"$set": ranking_fields(profile)}
+        )
+        updated += result.modified_count
+    return updated
+
+
+async def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    updated = await backfill(db)
+    print(f"Updated ranking fields on {updated} services")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
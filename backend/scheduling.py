@@ -0,0 +1,179 @@
+"""
+Booking time slots
+Every booking stores the interval it occupies as slot_start / slot_end (ISO strings,
+the provider's local time), derived from preferred_date / preferred_time and the
+service duration. Active bookings of one provider may not overlap.
+
+Slots are capped at MAX_SLOT_MINUTES, so every booking that can overlap [start, end)
+starts within [start - MAX_SLOT_MINUTES, end): conflict checks are one bounded range
+scan of the (provider_id, status, slot_start) index instead of a pass over the
+provider's bookings.
+
+A booking is inserted by reserve(), which runs the conflict check and the insert while
+holding a per-provider lease in schedule_locks (unique on provider_id), so two requests
+for overlapping slots cannot both pass the check. A request that overruns its lease
+re-checks after the insert and backs out if another booking got in meanwhile.
+
+Backfill slots of existing bookings with:
+    python scheduling.py
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+from dotenv import load_dotenv
+from pymongo.errors import DuplicateKeyError
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+DEFAULT_SLOT_MINUTES = 60
+MAX_SLOT_MINUTES = 12 * 60
+# Bookings that hold their slot; completed and cancelled ones free it
+ACTIVE_STATUSES = ["pending", "accepted"]
+
+SLOT_PROJECTION = {"_id": 0, "id": 1, "slot_start": 1, "slot_end": 1}
+
+# Far longer than a conflict check and an insert; after it a held lock is presumed dead
+LOCK_LEASE = timedelta(seconds=10)
+LOCK_WAIT_SECONDS = 3.0
+LOCK_POLL_SECONDS = 0.02
+
+
+class ScheduleBusy(Exception):
+    """Another booking of the provider held the schedule lock for longer than LOCK_WAIT_SECONDS"""
+
+
+def slot_minutes(duration: Optional[int]) -> int:
+    return min(max(duration or DEFAULT_SLOT_MINUTES, 1), MAX_SLOT_MINUTES)
+
+
+def slot_at(start: datetime, duration: Optional[int] = None) -> Tuple[datetime, datetime]:
+    """(start, end) normalized to whole minutes, so stored ISO strings compare correctly"""
+    start = start.replace(second=0, microsecond=0, tzinfo=None)
+    return start, start + timedelta(minutes=slot_minutes(duration))
+
+
+def booking_slot(preferred_date: str, preferred_time: str, duration: Optional[int] = None) -> Optional[Tuple[datetime, datetime]]:
+    """(start, end) for a YYYY-MM-DD date and HH:MM time, or None if they do not parse"""
+    try:
+        start = datetime.fromisoformat(f"{preferred_date.strip()}T{preferred_time.strip()}")
+    except (AttributeError, ValueError):
+        return None
+    return slot_at(start, duration)
+
+
+def overlap_query(start: datetime, end: datetime) -> dict:
+    """Active bookings overlapping [start, end); combine with a provider_id condition"""
+    return {
+        "status": {"$in": ACTIVE_STATUSES},
+        "slot_start": {"$gte": (start - timedelta(minutes=MAX_SLOT_MINUTES)).isoformat(), "$lt": end.isoformat()},
+        "slot_end": {"$gt": start.isoformat()},
+    }
+
+
+async def find_conflict(provider_id: str, start: datetime, end: datetime) -> Optional[dict]:
+    """An active booking of the provider overlapping [start, end), if any"""
+    from database import bookings_collection
+
+    return await bookings_collection.find_one({"provider_id": provider_id, **overlap_query(start, end)}, SLOT_PROJECTION)
+
+
+async def _lock(provider_id: str) -> str:
+    """Take the provider's schedule lock; returns its token"""
+    from database import schedule_locks_collection
+
+    token = str(uuid.uuid4())
+    deadline = asyncio.get_running_loop().time() + LOCK_WAIT_SECONDS
+    while True:
+        now = datetime.utcnow()
+        try:
+            # Creates the lock or takes over an expired one; while it is held the upsert
+            # collides with the unique provider_id index
+            await schedule_locks_collection.update_one(
+                {"provider_id": provider_id, "locked_until": {"$lt": now}},
+                {"$set": {"token": token, "locked_until": now + LOCK_LEASE}},
+                upsert=True
+            )
+            return token
+        except DuplicateKeyError:
+            pass
+        if asyncio.get_running_loop().time() >= deadline:
+            raise ScheduleBusy()
+        await asyncio.sleep(LOCK_POLL_SECONDS)
+
+
+async def reserve(booking: dict) -> bool:
+    """
+    Insert booking unless its provider has an active booking overlapping its slot
+    Returns False, without inserting, when the slot is taken. Raises ScheduleBusy.
+    """
+    from database import bookings_collection, schedule_locks_collection
+
+    provider_id = booking['provider_id']
+    start, end = datetime.fromisoformat(booking['slot_start']), datetime.fromisoformat(booking['slot_end'])
+    token = await _lock(provider_id)
+    try:
+        if await find_conflict(provider_id, start, end):
+            return False
+        await bookings_collection.insert_one(booking)
+    finally:
+        released = await schedule_locks_collection.delete_one({"provider_id": provider_id, "token": token})
+
+    if released.deleted_count == 0 and await bookings_collection.find_one(
+        {"provider_id": provider_id, "id": {"$ne": booking['id']}, **overlap_query(start, end)}, {"_id": 1}
+    ):
+        # Our lease ran out before the insert, so the lock did not keep this one out
+        await bookings_collection.delete_one({"id": booking['id']})
+        return False
+    return True
+
+
+async def busy_providers(provider_ids: Iterable[str], start: datetime, end: datetime) -> set:
+    """The providers among provider_ids with an active booking overlapping [start, end)"""
+    from database import bookings_collection
+
+    return set(await bookings_collection.distinct(
+        "provider_id",
+        {"provider_id": {"$in": list(provider_ids)}, **overlap_query(start, end)}
+    ))
+
+
+async def backfill(db) -> int:
+    """Derive slot_start / slot_end for bookings that predate them; unparseable ones are left without a slot"""
+    durations = {}
+    updated = 0
+    async for booking in db.bookings.find(
+        {"slot_start": {"$exists": False}},
+        {"_id": 0, "id": 1, "service_id": 1, "preferred_date": 1, "preferred_time": 1}
+    ):
+        service_id = booking.get('service_id')
+        if service_id not in durations:
+            service = await db.services.find_one({"id": service_id}, {"_id": 0, "duration": 1})
+            durations[service_id] = service.get('duration') if service else None
+        slot = booking_slot(booking.get('preferred_date'), booking.get('preferred_time'), durations[service_id])
+        if slot is None:
+            continue
+        result = await db.bookings.update_one(
+            {"id": booking['id']},
+            {"$set": {"slot_start": slot[0].isoformat(), "slot_end": slot[1].isoformat()}}
+        )
+        updated += result.modified_count
+    return updated
+
+
+async def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    updated = await backfill(db)
+    print(f"Added time slots to {updated} bookings")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,92 @@
+"""
+Service search
+Keyword search runs on a Mongo text index over services.title/description, which Mongo
+keeps current on every insert/update/delete. Geo filtering uses location_point, a GeoJSON
+copy of the coordinates list_all_services would use (provider first, then the service's own),
+so $text and $geoWithin combine in a single paginated query.
+
+Backfill existing data with:
+    python search.py
+"""
+import asyncio
+import os
+from pathlib import Path
+from typing import Optional
+
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+
+EARTH_RADIUS_KM = 6378.1
+MAX_PAGE_SIZE = 100
+
+
+def location_point(latitude: Optional[float], longitude: Optional[float]) -> Optional[dict]:
+    if not latitude or not longitude:
+        return None
+    return {"type": "Point", "coordinates": [longitude, latitude]}
+
+
+def service_location_point(provider: Optional[dict], service: dict) -> Optional[dict]:
+    """Same precedence as the distance calculation in list_all_services"""
+    provider = provider or {}
+    return location_point(
+        provider.get('latitude') or service.get('latitude'),
+        provider.get('longitude') or service.get('longitude'),
+    )
+
+
+# Pipeline update falling back to each service's own coordinates
+_OWN_POINT_PIPELINE = [{"$set": {"location_point": {"$cond": [
+    {"$and": [{"$ifNull": ["$latitude", False]}, {"$ifNull": ["$longitude", False]}]},
+    {"type": "Point", "coordinates": ["$longitude", "$latitude"]},
+    None
+]}}}]
+
+
+async def refresh_provider_location(services_collection, provider_id: str, latitude, longitude):
+    """Re-point a provider's services after their coordinates change"""
+    point = location_point(latitude, longitude)
+    if point:
+        await services_collection.update_many({"provider_id": provider_id}, {"$set": {"location_point": point}})
+    else:
+        await services_collection.update_many({"provider_id": provider_id}, _OWN_POINT_PIPELINE)
+
+
+def build_search_filter(q: str, category: Optional[str], latitude, longitude, max_distance) -> dict:
+    query = {"$text": {"$search": q}}
+    if category:
+        query['category'] = category
+    if latitude is not None and longitude is not None and max_distance is not None:
+        query['location_point'] = {"$geoWithin": {
+            "$centerSphere": [[longitude, latitude], max_distance / EARTH_RADIUS_KM]
+        }}
+    return query
+
+
+async def backfill(db):
+    """Set location_point on every service"""
+    updated = 0
+    async for provider in db.users.find({"user_type": "provider"}, {"_id": 0, "id": 1, "latitude": 1, "longitude": 1}):
+        point = location_point(provider.get('latitude'), provider.get('longitude'))
+        if point:
+            result = await db.services.update_many({"provider_id": provider['id']}, {"$set": {"location_point": point}})
+        else:
+            result = await db.services.update_many({"provider_id": provider['id']}, _OWN_POINT_PIPELINE)
+        updated += result.modified_count
+    return updated
+
+
+async def main():
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    updated = await backfill(db)
+    print(f"Updated location_point on {updated} services")
+    client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,14 +1,15 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, WebSocket, WebSocketDisconnect, status, UploadFile, File
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Header, WebSocket, WebSocketDisconnect, status, UploadFile, File, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import PlainTextResponse, RedirectResponse, StreamingResponse
 import os
 import logging
 from pathlib import Path
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
 import base64
-import httpx
+from pymongo import UpdateOne
 
 from models import (
     User, UserCreate, UserLogin, UserUpdate, Token,
@@ -17,7 +18,7 @@ from models import (
     Message, MessageCreate,
     Review, ReviewCreate,
     ProviderProfile, ProviderProfileUpdate,
-    Transaction, Withdrawal, WithdrawalRequest, WithdrawalAction,
+    Transaction, Withdrawal, WithdrawalRequest, WithdrawalAction, WithdrawalBulkRequest,
     EmailVerificationRequest, EmailVerificationCode,
     PriceOffer, PriceOfferCreate, PriceOfferResponse,
     ServiceDescriptionRequest, ServiceDescriptionResponse
@@ -29,13 +30,39 @@ from auth import (
 from database import (
     users_collection, services_collection, bookings_collection,
     messages_collection, reviews_collection, transactions_collection,
-    provider_profiles_collection, notifications_collection, withdrawals_collection,
-    price_offers_collection
+    provider_profiles_collection, notifications_collection, withdrawals_collection
 )
 from categories import get_categories
-from emergentintegrations.llm.chat import LlmChat, UserMessage
-from email_service import email_service
-import random
+from autocomplete import autocomplete
+from search import MAX_PAGE_SIZE, build_search_filter, service_location_point, refresh_provider_location
+from ranking import get_ranking_fields, refresh_provider_ranking, relevance_score
+from cache import (
+    browse_cache, dashboard_cache, make_key, round_coord,
+    invalidate_services, invalidate_providers, invalidate_dashboard
+)
+from projections import (
+    SERVICE_SUMMARY, SERVICE_FIELDS, USER_SUMMARY, PROVIDER_USER_FIELDS,
+    ADMIN_USER_SUMMARY, ADMIN_USER_FIELDS, USER_EXCLUDED, BOOKING_EXCLUDED,
+    PROFILE_SUMMARY, PROFILE_FIELDS, PROFILE_EXCLUDED,
+    parse_fields, build_projection, with_service_refs, with_user_refs
+)
+from ai_descriptions import generate_description, stream_description
+import integrations
+import ledger
+import completeness
+import scheduling
+import idempotency
+import negotiation
+from concurrency import fan_out
+from exports import (
+    BOOKING_COLUMNS, PAYOUT_COLUMNS, TRANSACTION_COLUMNS, USER_COLUMNS,
+    check_format, date_range, export_cursor, export_response
+)
+from email_service import email_service, email_outbox_worker
+from verification import ResendLimitExceeded, check_code, issue_code, resend_code
+from db_monitoring import DbStatsMiddleware
+from profiling import ProfilingMiddleware
+from metrics import MetricsMiddleware, register_websocket_gauge, registry as metrics_registry
 import math
 
 ROOT_DIR = Path(__file__).parent
@@ -68,6 +95,7 @@ class ConnectionManager:
                     pass
 
 manager = ConnectionManager()
+register_websocket_gauge(manager)
 
 # ============ HELPER FUNCTIONS ============
 
@@ -95,6 +123,11 @@ def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> fl
     distance = R * c
     return round(distance, 2)
 
+async def get_provider_categories(user_id: str) -> list:
+    """Service categories of a provider, used to scope cache invalidation"""
+    profile = await provider_profiles_collection.find_one({"user_id": user_id}, {"_id": 0, "service_categories": 1})
+    return profile.get('service_categories', []) if profile else []
+
 # ============ AUTH ENDPOINTS ============
 
 @api_router.post("/auth/register", response_model=Token)
@@ -104,10 +137,6 @@ async def register(user_data: UserCreate):
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    # Generate verification code
-    verification_code = ''.join([str(random.randint(0, 9)) for _ in range(6)])
-    code_expires_at = datetime.utcnow() + timedelta(minutes=10)
-    
     # Create user
     user_dict = user_data.model_dump()
     user_dict['password'] = get_password_hash(user_data.password)
@@ -115,11 +144,9 @@ async def register(user_data: UserCreate):
     
     doc = user_obj.model_dump()
     doc['password'] = user_dict['password']
-    doc['email_verification_code'] = verification_code
-    doc['code_expires_at'] = code_expires_at.isoformat()
-    doc['code_resend_count'] = 0
-    doc['last_code_sent_at'] = datetime.utcnow().isoformat()
     doc['created_at'] = doc['created_at'].isoformat()
+    # A new provider profile is empty, so only the user's own fields count yet
+    doc.update(completeness.completion_fields(completeness.user_bits(doc), user_obj.user_type))
     
     await users_collection.insert_one(doc)
     
@@ -131,6 +158,7 @@ async def register(user_data: UserCreate):
         await provider_profiles_collection.insert_one(profile_doc)
     
     # Send verification code via email
+    verification_code = await issue_code(user_obj.email)
     try:
         await email_service.send_verification_code(
             user_obj.email,
@@ -166,7 +194,7 @@ async def login(credentials: UserLogin):
 @api_router.post("/auth/verify-email")
 async def verify_email(verification: EmailVerificationCode):
     """Verify email with 6-digit code"""
-    user = await users_collection.find_one({"email": verification.email})
+    user = await users_collection.find_one({"email": verification.email}, {"_id": 0, "email_verified": 1})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -174,26 +202,19 @@ async def verify_email(verification: EmailVerificationCode):
     if user.get('email_verified', False):
         return {"message": "Email already verified", "verified": True}
     
-    # Check if code matches
-    if user.get('email_verification_code') != verification.code:
+    # Consume the code; matching and expiry are checked in one atomic delete
+    failure = await check_code(verification.email, verification.code)
+    if failure == "expired":
+        raise HTTPException(status_code=400, detail="Verification code expired. Please request a new code")
+    if failure:
         raise HTTPException(status_code=400, detail="Invalid verification code")
     
-    # Check if code expired
-    code_expires_at = user.get('code_expires_at')
-    if code_expires_at:
-        if isinstance(code_expires_at, str):
-            code_expires_at = datetime.fromisoformat(code_expires_at)
-        if datetime.utcnow() > code_expires_at:
-            raise HTTPException(status_code=400, detail="Verification code expired. Please request a new code")
-    
     # Mark email as verified
     await users_collection.update_one(
         {"email": verification.email},
         {"$set": {
             "email_verified": True,
-            "is_verified": True,
-            "email_verification_code": None,
-            "code_expires_at": None
+            "is_verified": True
         }}
     )
     
@@ -202,7 +223,7 @@ async def verify_email(verification: EmailVerificationCode):
 @api_router.post("/auth/resend-verification-code")
 async def resend_verification_code(request: EmailVerificationRequest):
     """Resend verification code (max 3 times per hour)"""
-    user = await users_collection.find_one({"email": request.email})
+    user = await users_collection.find_one({"email": request.email}, {"_id": 0, "email_verified": 1, "full_name": 1})
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -210,34 +231,11 @@ async def resend_verification_code(request: EmailVerificationRequest):
     if user.get('email_verified', False):
         raise HTTPException(status_code=400, detail="Email already verified")
     
-    # Check resend limit
-    last_sent = user.get('last_code_sent_at')
-    resend_count = user.get('code_resend_count', 0)
-    
-    if last_sent:
-        if isinstance(last_sent, str):
-            last_sent = datetime.fromisoformat(last_sent)
-        
-        # Reset count if more than 1 hour has passed
-        if (datetime.utcnow() - last_sent).total_seconds() > 3600:
-            resend_count = 0
-        elif resend_count >= 3:
-            raise HTTPException(status_code=429, detail="Too many resend attempts. Please try again in an hour")
-    
-    # Generate new code
-    verification_code = ''.join([str(random.randint(0, 9)) for _ in range(6)])
-    code_expires_at = datetime.utcnow() + timedelta(minutes=10)
-    
-    # Update user with new code
-    await users_collection.update_one(
-        {"email": request.email},
-        {"$set": {
-            "email_verification_code": verification_code,
-            "code_expires_at": code_expires_at.isoformat(),
-            "last_code_sent_at": datetime.utcnow().isoformat(),
-            "code_resend_count": resend_count + 1
-        }}
-    )
+    # Generate new code; the resend limit is enforced atomically in the same update
+    try:
+        verification_code, resends_remaining = await resend_code(request.email)
+    except ResendLimitExceeded:
+        raise HTTPException(status_code=429, detail="Too many resend attempts. Please try again in an hour")
     
     # Send email
     try:
@@ -250,70 +248,16 @@ async def resend_verification_code(request: EmailVerificationRequest):
         logging.error(f"Failed to send verification email: {e}")
         raise HTTPException(status_code=500, detail="Failed to send verification email")
     
-    return {"message": "Verification code sent", "resends_remaining": 3 - (resend_count + 1)}
+    return {"message": "Verification code sent", "resends_remaining": resends_remaining}
 
 @api_router.get("/auth/profile-status")
 async def get_profile_status(user_id: str = Depends(get_current_user_id)):
-    """Get profile completion status"""
-    user = await users_collection.find_one({"id": user_id}, {"_id": 0, "password": 0})
+    """Get profile completion status, maintained by the profile writes"""
+    user = await users_collection.find_one({"id": user_id}, completeness.STATUS_PROJECTION)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
-    # Calculate completion percentage
-    required_fields = {
-        "profile_photo": user.get("profile_photo"),
-        "full_name": user.get("full_name"),
-        "phone": user.get("phone"),
-        "location": user.get("location")
-    }
-    
-    completed_fields = sum(1 for v in required_fields.values() if v)
-    total_required = len(required_fields)
-    
-    # Additional requirements for providers
-    if user.get("user_type") == "provider":
-        profile = await provider_profiles_collection.find_one({"user_id": user_id}, {"_id": 0})
-        if profile:
-            # Check service categories
-            has_categories = profile.get("service_categories") and len(profile.get("service_categories", [])) > 0
-            # Check portfolio (min 3 photos)
-            portfolio_count = len(profile.get("portfolio_images", []))
-            has_portfolio = portfolio_count >= 3
-            # Check experience level
-            has_experience = profile.get("years_experience") is not None
-            
-            if has_categories:
-                completed_fields += 1
-            if has_portfolio:
-                completed_fields += 1
-            if has_experience:
-                completed_fields += 1
-            
-            total_required += 3  # 3 additional required fields for providers
-            
-            required_fields.update({
-                "service_categories": has_categories,
-                "portfolio": has_portfolio,
-                "experience_level": has_experience
-            })
-    
-    completion_percentage = int((completed_fields / total_required) * 100) if total_required > 0 else 0
-    is_complete = completion_percentage == 100
-    
-    # Update profile_completed field if status changed
-    if user.get("profile_completed") != is_complete:
-        await users_collection.update_one(
-            {"id": user_id},
-            {"$set": {"profile_completed": is_complete}}
-        )
-    
-    return {
-        "profile_completed": is_complete,
-        "completion_percentage": completion_percentage,
-        "user_type": user.get("user_type"),
-        "required_fields": required_fields,
-        "missing_fields": [k for k, v in required_fields.items() if not v]
-    }
+    return completeness.profile_status(user.get("completion") or 0, user["user_type"])
 
 @api_router.post("/auth/complete-profile")
 async def mark_profile_complete(user_id: str = Depends(get_current_user_id)):
@@ -354,6 +298,17 @@ async def update_profile(update_data: UserUpdate, user_id: str = Depends(get_cur
     if isinstance(user.get('created_at'), str):
         user['created_at'] = datetime.fromisoformat(user['created_at'])
     
+    if update_dict and user.get('user_type') == "provider":
+        invalidate_providers(await get_provider_categories(user_id))
+        if 'full_name' in update_dict and user.get('is_active', True):
+            autocomplete.index.set_provider(user_id, user['full_name'])
+        if 'latitude' in update_dict or 'longitude' in update_dict:
+            await refresh_provider_location(services_collection, user_id, user.get('latitude'), user.get('longitude'))
+            invalidate_services(provider_id=user_id, geo_only=True)
+    if update_dict:
+        user.update(await completeness.record(user_id, completeness.user_bits(user), completeness.USER_MASK) or {})
+        invalidate_dashboard(user_id)
+    
     return User(**user)
 
 # ============ CATEGORIES ============
@@ -362,6 +317,11 @@ async def update_profile(update_data: UserUpdate, user_id: str = Depends(get_cur
 async def list_categories():
     return get_categories()
 
+@api_router.get("/autocomplete")
+async def autocomplete_suggestions(q: str, limit: int = 10):
+    """Type-ahead suggestions from service titles, categories and provider names (in-memory)"""
+    return autocomplete.index.suggest(q, limit)
+
 # ============ PROVIDER PROFILE ENDPOINTS ============
 
 @api_router.get("/provider/profile", response_model=ProviderProfile)
@@ -380,12 +340,20 @@ async def update_provider_profile(update_data: ProviderProfileUpdate, user_id: s
     update_dict = {k: v for k, v in update_data.model_dump().items() if v is not None}
     
     if update_dict:
+        # Categories before the update, so listings the provider leaves are invalidated too
+        old_categories = await get_provider_categories(user_id)
         await provider_profiles_collection.update_one(
             {"user_id": user_id},
             {"$set": update_dict}
         )
+        invalidate_providers(set(old_categories) | set(update_dict.get('service_categories', [])))
+        if 'is_available' in update_dict:
+            await refresh_provider_ranking(user_id)
     
     profile = await provider_profiles_collection.find_one({"user_id": user_id}, {"_id": 0})
+    if update_dict:
+        await completeness.record(user_id, completeness.profile_bits(profile), completeness.PROVIDER_MASK)
+        invalidate_dashboard(user_id)
     if isinstance(profile.get('created_at'), str):
         profile['created_at'] = datetime.fromisoformat(profile['created_at'])
     
@@ -400,8 +368,15 @@ async def create_service(service_data: ServiceCreate, user_id: str = Depends(get
     doc = service_obj.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
     doc['updated_at'] = doc['updated_at'].isoformat()
+    doc.update(await get_ranking_fields(user_id))
+    provider = await users_collection.find_one({"id": user_id}, {"_id": 0, "latitude": 1, "longitude": 1})
+    doc['location_point'] = service_location_point(provider, doc)
     
     await services_collection.insert_one(doc)
+    
+    invalidate_services([service_obj.category], user_id)
+    invalidate_providers(await get_provider_categories(user_id))
+    autocomplete.index.set_service(service_obj.id, service_obj.title, service_obj.category, 1.0 + doc['provider_bookings'])
     return service_obj
 
 @api_router.get("/services")
@@ -411,20 +386,60 @@ async def list_all_services(
     latitude: Optional[float] = None,
     longitude: Optional[float] = None,
     max_distance: Optional[float] = None,  # in kilometers
-    sort_by: Optional[str] = "distance"  # distance, price, rating
+    sort_by: Optional[str] = "distance",  # distance, price, rating, relevance
+    fields: Optional[str] = None  # extra fields beyond the summary, or "all"
 ):
     """
     List services with optional location-based filtering
     If latitude/longitude provided, returns services with distance calculated
     max_distance filters services within specified km radius
+    Returns summaries (thumbnail_url instead of images, no description) unless fields is given
+    Results are cached per normalized query and invalidated by service/profile writes
     """
+    selected = parse_fields(fields, SERVICE_FIELDS)
+    latitude, longitude = round_coord(latitude), round_coord(longitude)
+    if latitude is None or longitude is None:
+        latitude = longitude = max_distance = None
+    
+    key = make_key(
+        "services",
+        category=category or None,
+        provider_id=provider_id or None,
+        latitude=latitude,
+        longitude=longitude,
+        max_distance=max_distance,
+        sort_by=sort_by if sort_by != "distance" or latitude is not None else None,
+        fields=selected if selected in (None, "all") else tuple(sorted(selected))
+    )
+    return await browse_cache.get_or_compute(
+        key,
+        lambda: compute_services(category, provider_id, latitude, longitude, max_distance, sort_by, selected)
+    )
+
+async def compute_services(category, provider_id, latitude, longitude, max_distance, sort_by, selected):
     query = {}
     if category:
         query['category'] = category
     if provider_id:
         query['provider_id'] = provider_id
     
-    services = await services_collection.find(query, {"_id": 0}).to_list(1000)
+    cursor = services_collection.find(query, build_projection(SERVICE_SUMMARY, selected))
+    # Rating and relevance order come from the denormalized ranking fields, served by an index
+    if sort_by == "rating":
+        cursor = cursor.sort([("provider_rating", -1), ("ranking_score", -1)])
+    elif sort_by == "relevance":
+        cursor = cursor.sort("ranking_score", -1)
+    services = await cursor.to_list(1000)
+    
+    # Provider coordinates, fetched once for all listed services
+    provider_locations = {}
+    if latitude is not None and longitude is not None:
+        provider_ids = list({s['provider_id'] for s in services})
+        async for provider in users_collection.find(
+            {"id": {"$in": provider_ids}},
+            {"_id": 0, "id": 1, "latitude": 1, "longitude": 1}
+        ):
+            provider_locations[provider['id']] = provider
     
     # Process services
     for service in services:
@@ -432,11 +447,12 @@ async def list_all_services(
             service['created_at'] = datetime.fromisoformat(service['created_at'])
         if isinstance(service.get('updated_at'), str):
             service['updated_at'] = datetime.fromisoformat(service['updated_at'])
+        with_service_refs(service)
         
         # Calculate distance if user location provided
         if latitude is not None and longitude is not None:
             # Get provider location (fallback to service location if available)
-            provider = await users_collection.find_one({"id": service['provider_id']}, {"_id": 0})
+            provider = provider_locations.get(service['provider_id'])
             if provider:
                 provider_lat = provider.get('latitude') or service.get('latitude')
                 provider_lon = provider.get('longitude') or service.get('longitude')
@@ -461,9 +477,72 @@ async def list_all_services(
         services.sort(key=lambda x: (x['distance_km'] is None, x['distance_km'] if x['distance_km'] is not None else float('inf')))
     elif sort_by == "price":
         services.sort(key=lambda x: x['price'])
+    elif sort_by == "relevance" and latitude is not None:
+        # Blend the stored score with distance; without a location Mongo order is final
+        for service in services:
+            service['relevance'] = round(relevance_score(service.get('ranking_score'), service['distance_km']), 4)
+        services.sort(key=lambda x: x['relevance'], reverse=True)
     
     return services
 
+@api_router.get("/services/search")
+async def search_services(
+    q: str,
+    category: Optional[str] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    max_distance: Optional[float] = None,  # in kilometers
+    sort_by: Optional[str] = "relevance",  # relevance, price
+    page: int = 1,
+    page_size: int = 20
+):
+    """
+    Keyword search over service titles and descriptions
+    Combines with category and location filters; results are paginated summaries
+    """
+    q = q.strip()
+    if not q:
+        raise HTTPException(status_code=400, detail="Search query is required")
+    page = max(page, 1)
+    page_size = min(max(page_size, 1), MAX_PAGE_SIZE)
+    
+    query = build_search_filter(q, category, latitude, longitude, max_distance)
+    projection = {**SERVICE_SUMMARY, "score": {"$meta": "textScore"}}
+    sort = [("price", 1)] if sort_by == "price" else [("score", {"$meta": "textScore"})]
+    
+    total = await services_collection.count_documents(query)
+    services = await services_collection.find(query, projection).sort(sort).skip((page - 1) * page_size).limit(page_size).to_list(page_size)
+    
+    provider_locations = {}
+    if latitude is not None and longitude is not None:
+        provider_ids = list({s['provider_id'] for s in services})
+        async for provider in users_collection.find(
+            {"id": {"$in": provider_ids}},
+            {"_id": 0, "id": 1, "latitude": 1, "longitude": 1}
+        ):
+            provider_locations[provider['id']] = provider
+    
+    for service in services:
+        if isinstance(service.get('created_at'), str):
+            service['created_at'] = datetime.fromisoformat(service['created_at'])
+        if isinstance(service.get('updated_at'), str):
+            service['updated_at'] = datetime.fromisoformat(service['updated_at'])
+        with_service_refs(service)
+        
+        service['distance_km'] = None
+        if latitude is not None and longitude is not None:
+            point = service_location_point(provider_locations.get(service['provider_id']), service)
+            if point:
+                point_lon, point_lat = point['coordinates']
+                service['distance_km'] = calculate_distance(latitude, longitude, point_lat, point_lon)
+    
+    return {
+        "results": services,
+        "total": total,
+        "page": page,
+        "page_size": page_size
+    }
+
 @api_router.get("/services/{service_id}", response_model=Service)
 async def get_service(service_id: str):
     service = await services_collection.find_one({"id": service_id}, {"_id": 0})
@@ -490,20 +569,29 @@ async def update_service(service_id: str, update_data: ServiceUpdate, user_id: s
         {"id": service_id},
         {"$set": update_dict}
     )
+    invalidate_services({service['category'], update_dict.get('category', service['category'])}, user_id)
     
     service = await services_collection.find_one({"id": service_id}, {"_id": 0})
     if isinstance(service.get('created_at'), str):
         service['created_at'] = datetime.fromisoformat(service['created_at'])
     if isinstance(service.get('updated_at'), str):
         service['updated_at'] = datetime.fromisoformat(service['updated_at'])
+    autocomplete.index.set_service(service_id, service['title'], service['category'])
     
     return Service(**service)
 
 @api_router.delete("/services/{service_id}")
 async def delete_service(service_id: str, user_id: str = Depends(get_current_user_id)):
-    result = await services_collection.delete_one({"id": service_id, "provider_id": user_id})
-    if result.deleted_count == 0:
+    deleted = await services_collection.find_one_and_delete(
+        {"id": service_id, "provider_id": user_id},
+        projection={"_id": 0, "category": 1}
+    )
+    if not deleted:
         raise HTTPException(status_code=404, detail="Service not found or unauthorized")
+    
+    invalidate_services([deleted.get('category')], user_id)
+    invalidate_providers(await get_provider_categories(user_id))
+    autocomplete.index.remove_service(service_id)
     return {"message": "Service deleted successfully"}
 
 # ============ PROVIDERS BROWSE ENDPOINT ============
@@ -513,17 +601,45 @@ async def list_providers(
     category: Optional[str] = None, 
     latitude: Optional[float] = None, 
     longitude: Optional[float] = None,
-    max_distance: Optional[float] = None  # in kilometers
+    max_distance: Optional[float] = None,  # in kilometers
+    fields: Optional[str] = None  # extra user/profile fields beyond the summary, or "all"
 ):
-    """List providers with optional location filtering and distance calculation"""
+    """
+    List providers with optional location filtering and distance calculation
+    Results are cached per normalized query and invalidated by profile/service writes
+    """
+    selected = parse_fields(fields, PROVIDER_USER_FIELDS | PROFILE_FIELDS)
+    latitude, longitude = round_coord(latitude), round_coord(longitude)
+    if latitude is None or longitude is None:
+        latitude = longitude = max_distance = None
+    
+    key = make_key(
+        "providers",
+        category=category or None,
+        latitude=latitude,
+        longitude=longitude,
+        max_distance=max_distance,
+        fields=selected if selected in (None, "all") else tuple(sorted(selected))
+    )
+    return await browse_cache.get_or_compute(
+        key,
+        lambda: compute_providers(category, latitude, longitude, max_distance, selected)
+    )
+
+async def compute_providers(category, latitude, longitude, max_distance, selected):
+    user_fields = selected if selected in (None, "all") else selected & PROVIDER_USER_FIELDS
+    profile_fields = selected if selected in (None, "all") else selected & PROFILE_FIELDS
+    user_projection = build_projection(USER_SUMMARY, user_fields, USER_EXCLUDED)
+    profile_projection = build_projection(PROFILE_SUMMARY, profile_fields, PROFILE_EXCLUDED)
+    
     # Get all provider users
     query = {"user_type": "provider", "is_active": True}
-    providers = await users_collection.find(query, {"_id": 0, "password": 0}).to_list(1000)
+    providers = await users_collection.find(query, user_projection).to_list(1000)
     
     result = []
     for provider in providers:
         # Get provider profile
-        profile = await provider_profiles_collection.find_one({"user_id": provider['id']}, {"_id": 0})
+        profile = await provider_profiles_collection.find_one({"user_id": provider['id']}, profile_projection)
         if not profile:
             continue
             
@@ -544,16 +660,16 @@ async def list_providers(
             if distance_km > max_distance:
                 continue
         
-        # Get provider services
-        services = await services_collection.find({"provider_id": provider['id']}, {"_id": 0}).to_list(100)
+        # Count provider services
+        services_count = await services_collection.count_documents({"provider_id": provider['id']})
         
         if isinstance(provider.get('created_at'), str):
             provider['created_at'] = datetime.fromisoformat(provider['created_at'])
         
         provider_data = {
-            "user": User(**provider),
+            "user": with_user_refs(provider),
             "profile": profile,
-            "services_count": len(services),
+            "services_count": services_count,
             "distance_km": distance_km
         }
         
@@ -565,16 +681,46 @@ async def list_providers(
     
     return result
 
+@api_router.get("/providers/available")
+async def list_available_providers(
+    start: str,
+    duration: int = scheduling.DEFAULT_SLOT_MINUTES,  # in minutes
+    category: Optional[str] = None,
+    latitude: Optional[float] = None,
+    longitude: Optional[float] = None,
+    max_distance: Optional[float] = None  # in kilometers
+):
+    """
+    Providers from /providers (same filters) who are available and have no active
+    booking overlapping [start, start + duration)
+    """
+    try:
+        slot = scheduling.slot_at(datetime.fromisoformat(start), duration)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start must be an ISO date and time, e.g. 2025-01-31T14:00")
+    
+    providers = await list_providers(category, latitude, longitude, max_distance, fields=None)
+    providers = [p for p in providers if p['profile'].get('is_available', True)]
+    busy = await scheduling.busy_providers([p['user']['id'] for p in providers], *slot)
+    return [p for p in providers if p['user']['id'] not in busy]
+
 @api_router.get("/providers/{provider_id}")
 async def get_provider_detail(provider_id: str):
-    user = await users_collection.find_one({"id": provider_id, "user_type": "provider"}, {"_id": 0, "password": 0})
+    # All four reads are independent; run them together
+    reads = await fan_out(
+        {
+            "user": users_collection.find_one({"id": provider_id, "user_type": "provider"}, {"_id": 0, "password": 0}),
+            "profile": provider_profiles_collection.find_one({"user_id": provider_id}, {"_id": 0}),
+            "services": services_collection.find({"provider_id": provider_id}, {"_id": 0}).to_list(100),
+            "reviews": reviews_collection.find({"provider_id": provider_id}, {"_id": 0}).sort("created_at", -1).limit(10).to_list(10),
+        },
+        defaults={"services": [], "reviews": []},
+        required=["user", "profile"]
+    )
+    user, profile, services, reviews = reads["user"], reads["profile"], reads["services"], reads["reviews"]
     if not user:
         raise HTTPException(status_code=404, detail="Provider not found")
     
-    profile = await provider_profiles_collection.find_one({"user_id": provider_id}, {"_id": 0})
-    services = await services_collection.find({"provider_id": provider_id}, {"_id": 0}).to_list(100)
-    reviews = await reviews_collection.find({"provider_id": provider_id}, {"_id": 0}).sort("created_at", -1).limit(10).to_list(10)
-    
     if isinstance(user.get('created_at'), str):
         user['created_at'] = datetime.fromisoformat(user['created_at'])
     
@@ -588,29 +734,57 @@ async def get_provider_detail(provider_id: str):
         if isinstance(review.get('created_at'), str):
             review['created_at'] = datetime.fromisoformat(review['created_at'])
     
-    return {
+    detail = {
         "user": User(**user),
         "profile": profile,
         "services": [Service(**s) for s in services],
         "reviews": [Review(**r) for r in reviews]
     }
+    if reads.failed:
+        detail["unavailable"] = reads.failed
+    return detail
 
 # ============ BOOKING ENDPOINTS ============
 
 @api_router.post("/bookings", response_model=Booking)
-async def create_booking(booking_data: BookingCreate, user_id: str = Depends(get_current_user_id)):
+async def create_booking(
+    booking_data: BookingCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=idempotency.MAX_KEY_LENGTH),
+    user_id: str = Depends(get_current_user_id)
+):
+    """Retries with the same Idempotency-Key replay the first response instead of booking twice"""
+    return await idempotency.run_once(
+        "create_booking", user_id, idempotency_key, booking_data,
+        lambda: insert_booking(booking_data, user_id)
+    )
+
+async def insert_booking(booking_data: BookingCreate, user_id: str) -> Booking:
     # Get service to calculate total amount
     service = await services_collection.find_one({"id": booking_data.service_id})
     if not service:
         raise HTTPException(status_code=404, detail="Service not found")
     
-    booking_obj = Booking(**booking_data.model_dump(), customer_id=user_id, total_amount=service['price'])
+    slot = scheduling.booking_slot(booking_data.preferred_date, booking_data.preferred_time, service.get('duration'))
+    if slot is None:
+        raise HTTPException(status_code=400, detail="preferred_date must be YYYY-MM-DD and preferred_time HH:MM")
+    
+    booking_obj = Booking(
+        **booking_data.model_dump(), customer_id=user_id, total_amount=service['price'],
+        slot_start=slot[0], slot_end=slot[1]
+    )
     
     doc = booking_obj.model_dump()
+    doc['slot_start'] = doc['slot_start'].isoformat()
+    doc['slot_end'] = doc['slot_end'].isoformat()
     doc['created_at'] = doc['created_at'].isoformat()
     doc['updated_at'] = doc['updated_at'].isoformat()
     
-    await bookings_collection.insert_one(doc)
+    try:
+        reserved = await scheduling.reserve(doc)
+    except scheduling.ScheduleBusy:
+        raise HTTPException(status_code=409, detail="Another booking for this provider is in progress, please retry")
+    if not reserved:
+        raise HTTPException(status_code=409, detail="The provider is already booked at that time")
     
     # Create notification
     notification = {
@@ -622,30 +796,48 @@ async def create_booking(booking_data: BookingCreate, user_id: str = Depends(get
         "created_at": datetime.utcnow().isoformat()
     }
     await notifications_collection.insert_one(notification)
+    invalidate_dashboard(user_id, booking_data.provider_id)
     
     return booking_obj
 
+def to_bookings(bookings: list) -> List[Booking]:
+    for booking in bookings:
+        if isinstance(booking.get('created_at'), str):
+            booking['created_at'] = datetime.fromisoformat(booking['created_at'])
+        if isinstance(booking.get('updated_at'), str):
+            booking['updated_at'] = datetime.fromisoformat(booking['updated_at'])
+    
+    return [Booking(**b) for b in bookings]
+
 @api_router.get("/bookings", response_model=List[Booking])
 async def list_bookings(user_id: str = Depends(get_current_user_id)):
     # Get user to determine if provider or customer
     user = await users_collection.find_one({"id": user_id})
     
     if user['user_type'] == "provider":
-        bookings = await bookings_collection.find({"provider_id": user_id}, {"_id": 0}).sort("created_at", -1).to_list(1000)
+        bookings = await bookings_collection.find({"provider_id": user_id}, BOOKING_EXCLUDED).sort("created_at", -1).to_list(1000)
     else:
-        bookings = await bookings_collection.find({"customer_id": user_id}, {"_id": 0}).sort("created_at", -1).to_list(1000)
+        bookings = await bookings_collection.find({"customer_id": user_id}, BOOKING_EXCLUDED).sort("created_at", -1).to_list(1000)
     
-    for booking in bookings:
-        if isinstance(booking.get('created_at'), str):
-            booking['created_at'] = datetime.fromisoformat(booking['created_at'])
-        if isinstance(booking.get('updated_at'), str):
-            booking['updated_at'] = datetime.fromisoformat(booking['updated_at'])
-    
-    return [Booking(**b) for b in bookings]
+    return to_bookings(bookings)
+
+@api_router.get("/bookings/export")
+async def export_bookings(
+    format: str = "csv",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    user_id: str = Depends(get_current_user_id)
+):
+    """The caller's bookings in the date range, streamed without the 1000-row cap"""
+    check_format(format)
+    user = await users_collection.find_one({"id": user_id}, {"_id": 0, "user_type": 1})
+    owner_field = "provider_id" if user['user_type'] == "provider" else "customer_id"
+    query = {owner_field: user_id, **date_range("created_at", date_from, date_to)}
+    return export_response(export_cursor(bookings_collection, query, BOOKING_COLUMNS), BOOKING_COLUMNS, format, "bookings")
 
 @api_router.get("/bookings/{booking_id}", response_model=Booking)
 async def get_booking(booking_id: str, user_id: str = Depends(get_current_user_id)):
-    booking = await bookings_collection.find_one({"id": booking_id}, {"_id": 0})
+    booking = await bookings_collection.find_one({"id": booking_id}, BOOKING_EXCLUDED)
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
     
@@ -663,41 +855,34 @@ async def get_booking(booking_id: str, user_id: str = Depends(get_current_user_i
 # ============ PRICE NEGOTIATION ENDPOINTS ============
 
 @api_router.post("/bookings/{booking_id}/offer-price", response_model=PriceOffer)
-async def create_price_offer(booking_id: str, offer_data: PriceOfferCreate, user_id: str = Depends(get_current_user_id)):
-    """Create a price offer for a booking"""
-    booking = await bookings_collection.find_one({"id": booking_id})
-    if not booking:
-        raise HTTPException(status_code=404, detail="Booking not found")
-    
-    # Check authorization (customer or provider can offer)
-    if booking['customer_id'] != user_id and booking['provider_id'] != user_id:
-        raise HTTPException(status_code=403, detail="Unauthorized")
-    
-    # Determine sender and receiver
-    is_customer = booking['customer_id'] == user_id
-    sender_id = user_id
-    receiver_id = booking['provider_id'] if is_customer else booking['customer_id']
-    
-    # Create price offer
-    price_offer = PriceOffer(
-        booking_id=booking_id,
-        sender_id=sender_id,
-        receiver_id=receiver_id,
-        offer_amount=offer_data.offer_amount,
-        offer_type="initial",
-        message=offer_data.message
+async def create_price_offer(
+    booking_id: str,
+    offer_data: PriceOfferCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=idempotency.MAX_KEY_LENGTH),
+    user_id: str = Depends(get_current_user_id)
+):
+    """Create a price offer for a booking; retries with the same Idempotency-Key replay the first response"""
+    return await idempotency.run_once(
+        "create_price_offer", user_id, idempotency_key, {"booking_id": booking_id, "offer": offer_data},
+        lambda: insert_price_offer(booking_id, offer_data, user_id)
     )
+
+async def insert_price_offer(booking_id: str, offer_data: PriceOfferCreate, user_id: str) -> PriceOffer:
+    # Only one offer can be open per booking; the transition checks that atomically
+    offer = await negotiation.make_offer(booking_id, user_id, offer_data.offer_amount, offer_data.message)
     
-    doc = price_offer.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    await price_offers_collection.insert_one(doc)
+    if isinstance(offer.get('created_at'), str):
+        offer['created_at'] = datetime.fromisoformat(offer['created_at'])
     
-    return price_offer
+    return PriceOffer(**offer)
 
 @api_router.get("/bookings/{booking_id}/offers", response_model=List[PriceOffer])
 async def get_price_offers(booking_id: str, user_id: str = Depends(get_current_user_id)):
-    """Get all price offers for a booking"""
-    booking = await bookings_collection.find_one({"id": booking_id})
+    """Get all price offers for a booking, oldest first"""
+    booking = await bookings_collection.find_one(
+        {"id": booking_id},
+        {"_id": 0, "customer_id": 1, "provider_id": 1, "offers": 1}
+    )
     if not booking:
         raise HTTPException(status_code=404, detail="Booking not found")
     
@@ -705,12 +890,8 @@ async def get_price_offers(booking_id: str, user_id: str = Depends(get_current_u
     if booking['customer_id'] != user_id and booking['provider_id'] != user_id:
         raise HTTPException(status_code=403, detail="Unauthorized")
     
-    offers = await price_offers_collection.find(
-        {"booking_id": booking_id},
-        {"_id": 0}
-    ).sort("created_at", 1).to_list(100)
-    
-    # Convert datetime strings
+    # Stored in order, so no sort
+    offers = booking.get('offers', [])
     for offer in offers:
         if isinstance(offer.get('created_at'), str):
             offer['created_at'] = datetime.fromisoformat(offer['created_at'])
@@ -719,68 +900,18 @@ async def get_price_offers(booking_id: str, user_id: str = Depends(get_current_u
 
 @api_router.put("/offers/{offer_id}/respond")
 async def respond_to_offer(offer_id: str, response: PriceOfferResponse, user_id: str = Depends(get_current_user_id)):
-    """Accept, decline, or counter a price offer"""
-    offer = await price_offers_collection.find_one({"id": offer_id})
-    if not offer:
-        raise HTTPException(status_code=404, detail="Offer not found")
+    """Accept, decline, or counter the open price offer, as one conditional update of the booking"""
+    if response.action == "counter" and not response.counter_amount:
+        raise HTTPException(status_code=400, detail="Counter amount required")
     
-    # Check authorization (must be receiver)
-    if offer['receiver_id'] != user_id:
-        raise HTTPException(status_code=403, detail="Only the receiver can respond to this offer")
+    booking = await negotiation.respond(offer_id, user_id, response.action, response.counter_amount, response.message)
+    invalidate_dashboard(booking['customer_id'], booking['provider_id'])
     
     if response.action == "accept":
-        # Mark offer as accepted
-        await price_offers_collection.update_one(
-            {"id": offer_id},
-            {"$set": {"status": "accepted", "offer_type": "accepted"}}
-        )
-        
-        # Update booking with agreed price
-        await bookings_collection.update_one(
-            {"id": offer['booking_id']},
-            {"$set": {
-                "agreed_price": offer['offer_amount'],
-                "total_amount": offer['offer_amount'],
-                "price_negotiated": True
-            }}
-        )
-        
-        return {"message": "Offer accepted", "agreed_price": offer['offer_amount']}
-    
-    elif response.action == "decline":
-        # Mark offer as declined
-        await price_offers_collection.update_one(
-            {"id": offer_id},
-            {"$set": {"status": "declined", "offer_type": "declined"}}
-        )
-        
+        return {"message": "Offer accepted", "agreed_price": booking['agreed_price']}
+    if response.action == "decline":
         return {"message": "Offer declined"}
-    
-    elif response.action == "counter":
-        if not response.counter_amount:
-            raise HTTPException(status_code=400, detail="Counter amount required")
-        
-        # Mark original offer as countered
-        await price_offers_collection.update_one(
-            {"id": offer_id},
-            {"$set": {"status": "countered"}}
-        )
-        
-        # Create counter offer
-        counter_offer = PriceOffer(
-            booking_id=offer['booking_id'],
-            sender_id=user_id,
-            receiver_id=offer['sender_id'],
-            offer_amount=response.counter_amount,
-            offer_type="counter",
-            message=response.message
-        )
-        
-        doc = counter_offer.model_dump()
-        doc['created_at'] = doc['created_at'].isoformat()
-        await price_offers_collection.insert_one(doc)
-        
-        return {"message": "Counter offer sent", "counter_amount": response.counter_amount}
+    return {"message": "Counter offer sent", "counter_amount": response.counter_amount}
 
 @api_router.put("/bookings/{booking_id}/status", response_model=Booking)
 async def update_booking_status(booking_id: str, status_update: BookingStatusUpdate, user_id: str = Depends(get_current_user_id)):
@@ -819,8 +950,10 @@ async def update_booking_status(booking_id: str, status_update: BookingStatusUpd
             {"user_id": booking['provider_id']},
             {"$inc": {"total_bookings": 1}}
         )
+        await refresh_provider_ranking(booking['provider_id'])
+    invalidate_dashboard(booking['customer_id'], booking['provider_id'])
     
-    booking = await bookings_collection.find_one({"id": booking_id}, {"_id": 0})
+    booking = await bookings_collection.find_one({"id": booking_id}, BOOKING_EXCLUDED)
     if isinstance(booking.get('created_at'), str):
         booking['created_at'] = datetime.fromisoformat(booking['created_at'])
     if isinstance(booking.get('updated_at'), str):
@@ -907,6 +1040,8 @@ async def create_review(review_data: ReviewCreate, user_id: str = Depends(get_cu
         {"user_id": review_data.provider_id},
         {"$set": {"average_rating": avg_rating, "total_reviews": len(reviews)}}
     )
+    invalidate_providers(await get_provider_categories(review_data.provider_id))
+    await refresh_provider_ranking(review_data.provider_id)
     
     return review_obj
 
@@ -936,34 +1071,29 @@ async def mark_notification_read(notification_id: str, user_id: str = Depends(ge
         {"id": notification_id, "user_id": user_id},
         {"$set": {"is_read": True}}
     )
+    invalidate_dashboard(user_id)
     return {"message": "Notification marked as read"}
 
 # ============ AI SERVICE DESCRIPTION GENERATOR ============
 
 @api_router.post("/ai/generate-description", response_model=ServiceDescriptionResponse)
 async def generate_service_description(request: ServiceDescriptionRequest):
-    try:
-        api_key = os.environ.get('EMERGENT_LLM_KEY')
-        
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=f"service-desc-{datetime.utcnow().timestamp()}",
-            system_message="You are a professional service description writer. Create compelling, professional service descriptions that highlight key benefits and attract customers. Keep it concise (2-3 sentences, max 150 words)."
-        ).with_model("openai", "gpt-4o-mini")
-        
-        prompt = f"Create a professional service description for: {request.title} in category {request.category}."
-        if request.additional_info:
-            prompt += f" Additional info: {request.additional_info}"
-        
-        user_message = UserMessage(text=prompt)
-        response = await chat.send_message(user_message)
-        
-        return ServiceDescriptionResponse(description=response)
-    except Exception as e:
-        logging.error(f"AI description generation failed: {e}")
-        return ServiceDescriptionResponse(
-            description=f"Professional {request.category} service - {request.title}. Contact us for more details."
-        )
+    description = await generate_description(request.title, request.category, request.additional_info)
+    return ServiceDescriptionResponse(description=description)
+
+@api_router.post("/ai/generate-description/stream")
+async def stream_service_description(request: ServiceDescriptionRequest):
+    """Same as /ai/generate-description, sent as Server-Sent Events: delta events, then done"""
+    async def events():
+        async for event, data in stream_description(request.title, request.category, request.additional_info):
+            yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    
+    # A client disconnect cancels events(), which closes the upstream LLM stream
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 # ============ PAYMENT ENDPOINTS (Paystack) ============
 
@@ -985,112 +1115,95 @@ async def initialize_payment(booking_id: str, user_id: str = Depends(get_current
     user = await users_collection.find_one({"id": user_id})
     
     # Initialize Paystack payment
-    paystack_secret = os.environ.get('PAYSTACK_SECRET_KEY')
-    
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://api.paystack.co/transaction/initialize",
-                headers={
-                    "Authorization": f"Bearer {paystack_secret}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "email": user['email'],
-                    "amount": int(booking['total_amount'] * 100),  # Paystack uses kobo (cents)
-                    "reference": f"ref_{booking_id}",
-                    "callback_url": f"{os.environ.get('CORS_ORIGINS', 'http://localhost:3000')}/payment/callback",
-                    "metadata": {
-                        "booking_id": booking_id,
-                        "customer_name": user['full_name']
-                    }
+        paystack = await integrations.aget("paystack")
+        response = await paystack.initialize_transaction({
+            "email": user['email'],
+            "amount": int(booking['total_amount'] * 100),  # Paystack uses kobo (cents)
+            "reference": f"ref_{booking_id}",
+            "callback_url": f"{os.environ.get('CORS_ORIGINS', 'http://localhost:3000')}/payment/callback",
+            "metadata": {
+                "booking_id": booking_id,
+                "customer_name": user['full_name']
+            }
+        })
+        
+        if response.status_code == 200:
+            data = response.json()
+            if data['status']:
+                return {
+                    "authorization_url": data['data']['authorization_url'],
+                    "reference": data['data']['reference'],
+                    "access_code": data['data']['access_code']
                 }
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data['status']:
-                    return {
-                        "authorization_url": data['data']['authorization_url'],
-                        "reference": data['data']['reference'],
-                        "access_code": data['data']['access_code']
-                    }
-            
-            raise HTTPException(status_code=400, detail="Payment initialization failed")
-            
+        
+        raise HTTPException(status_code=400, detail="Payment initialization failed")
+        
     except Exception as e:
         logging.error(f"Paystack initialization error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.post("/payments/verify/{reference}")
 async def verify_payment(reference: str, user_id: str = Depends(get_current_user_id)):
-    paystack_secret = os.environ.get('PAYSTACK_SECRET_KEY')
-    
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"https://api.paystack.co/transaction/verify/{reference}",
-                headers={
-                    "Authorization": f"Bearer {paystack_secret}"
-                }
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data['status'] and data['data']['status'] == 'success':
-                    # Extract booking_id from reference
-                    booking_id = reference.replace("ref_", "")
-                    
-                    # Get booking details
-                    booking = await bookings_collection.find_one({"id": booking_id})
-                    if not booking:
-                        raise HTTPException(status_code=404, detail="Booking not found")
-                    
-                    # Calculate fees (10% platform fee, 90% provider earnings)
-                    total_amount = booking['total_amount']
-                    platform_fee = total_amount * 0.10
-                    provider_earnings = total_amount - platform_fee
-                    
-                    # Update booking payment status
-                    await bookings_collection.update_one(
-                        {"id": booking_id},
-                        {"$set": {"payment_status": "paid"}}
-                    )
-                    
-                    # Create transaction record with escrow status
-                    transaction = Transaction(
-                        booking_id=booking_id,
-                        customer_id=booking['customer_id'],
-                        provider_id=booking['provider_id'],
-                        amount=total_amount,
-                        platform_fee=platform_fee,
-                        provider_earnings=provider_earnings,
-                        payment_reference=reference,
-                        payment_status="success",
-                        escrow_status="released"  # Money is split immediately
-                    )
-                    
-                    doc = transaction.model_dump()
-                    doc['created_at'] = doc['created_at'].isoformat()
-                    await transactions_collection.insert_one(doc)
-                    
-                    # Update provider wallet balance
-                    await provider_profiles_collection.update_one(
-                        {"user_id": booking['provider_id']},
-                        {
-                            "$inc": {
-                                "balance": provider_earnings,
-                                "total_earned": provider_earnings
-                            }
-                        }
+        paystack = await integrations.aget("paystack")
+        response = await paystack.verify_transaction(reference)
+        
+        if response.status_code == 200:
+            data = response.json()
+            if data['status'] and data['data']['status'] == 'success':
+                # Extract booking_id from reference
+                booking_id = reference.replace("ref_", "")
+                
+                # Get booking details
+                booking = await bookings_collection.find_one({"id": booking_id})
+                if not booking:
+                    raise HTTPException(status_code=404, detail="Booking not found")
+                
+                # Calculate fees (10% platform fee, 90% provider earnings)
+                total_amount = booking['total_amount']
+                platform_fee = total_amount * 0.10
+                provider_earnings = total_amount - platform_fee
+                
+                # Update booking payment status
+                await bookings_collection.update_one(
+                    {"id": booking_id},
+                    {"$set": {"payment_status": "paid"}}
+                )
+                
+                # Create transaction record with escrow status
+                transaction = Transaction(
+                    booking_id=booking_id,
+                    customer_id=booking['customer_id'],
+                    provider_id=booking['provider_id'],
+                    amount=total_amount,
+                    platform_fee=platform_fee,
+                    provider_earnings=provider_earnings,
+                    payment_reference=reference,
+                    payment_status="success",
+                    escrow_status="released"  # Money is split immediately
+                )
+                
+                doc = transaction.model_dump()
+                doc['created_at'] = doc['created_at'].isoformat()
+                await transactions_collection.insert_one(doc)
+                
+                # Credit the provider wallet through the ledger; a repeated verify is a no-op
+                try:
+                    await ledger.post(
+                        booking['provider_id'], ledger.PAYMENT, reference, provider_earnings,
+                        earned=provider_earnings, memo=f"Booking {booking_id}"
                     )
-                    
-                    return {"status": "success", "message": "Payment verified and funds distributed", "data": data['data']}
-                else:
-                    return {"status": "failed", "message": "Payment verification failed"}
-            
-            raise HTTPException(status_code=400, detail="Verification failed")
-            
+                except ledger.AlreadyPosted:
+                    pass
+                invalidate_dashboard(booking['customer_id'], booking['provider_id'])
+                
+                return {"status": "success", "message": "Payment verified and funds distributed", "data": data['data']}
+            else:
+                return {"status": "failed", "message": "Payment verification failed"}
+        
+        raise HTTPException(status_code=400, detail="Verification failed")
+        
     except Exception as e:
         logging.error(f"Paystack verification error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1112,29 +1225,55 @@ async def get_transactions(user_id: str = Depends(get_current_user_id)):
     
     return transactions
 
+@api_router.get("/transactions/export")
+async def export_transactions(
+    format: str = "csv",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    user_id: str = Depends(get_current_user_id)
+):
+    """The caller's transactions in the date range, streamed without the 100-row cap"""
+    check_format(format)
+    user = await users_collection.find_one({"id": user_id}, {"_id": 0, "user_type": 1})
+    owner_field = "provider_id" if user['user_type'] == "provider" else "customer_id"
+    query = {owner_field: user_id, **date_range("created_at", date_from, date_to)}
+    return export_response(export_cursor(transactions_collection, query, TRANSACTION_COLUMNS), TRANSACTION_COLUMNS, format, "transactions")
+
 # ============ WITHDRAWAL ENDPOINTS ============
 
 @api_router.post("/withdrawals/request", response_model=Withdrawal)
-async def request_withdrawal(withdrawal_req: WithdrawalRequest, user_id: str = Depends(get_current_user_id)):
-    """Provider requests withdrawal of their wallet balance"""
+async def request_withdrawal(
+    withdrawal_req: WithdrawalRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=idempotency.MAX_KEY_LENGTH),
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Provider requests withdrawal of their wallet balance
+    Retries with the same Idempotency-Key replay the first response instead of holding the amount twice.
+    """
+    return await idempotency.run_once(
+        "request_withdrawal", user_id, idempotency_key, withdrawal_req,
+        lambda: insert_withdrawal(withdrawal_req, user_id)
+    )
+
+async def insert_withdrawal(withdrawal_req: WithdrawalRequest, user_id: str) -> Withdrawal:
     # Check if user is a provider
-    user = await users_collection.find_one({"id": user_id})
+    user = await users_collection.find_one({"id": user_id}, {"_id": 0, "user_type": 1})
     if not user or user['user_type'] != "provider":
         raise HTTPException(status_code=403, detail="Only providers can request withdrawals")
     
-    # Get provider profile
-    profile = await provider_profiles_collection.find_one({"user_id": user_id})
-    if not profile:
-        raise HTTPException(status_code=404, detail="Provider profile not found")
-    
-    # Check balance
-    if profile['balance'] < withdrawal_req.amount:
-        raise HTTPException(status_code=400, detail=f"Insufficient balance. Available: ₦{profile['balance']}")
-    
     # Check minimum withdrawal amount
     if withdrawal_req.amount < 5000:
         raise HTTPException(status_code=400, detail="Minimum withdrawal amount is ₦5,000")
     
+    # Get provider profile
+    profile = await provider_profiles_collection.find_one(
+        {"user_id": user_id},
+        {"_id": 0, "bank_account_number": 1, "bank_code": 1, "account_name": 1}
+    )
+    if not profile:
+        raise HTTPException(status_code=404, detail="Provider profile not found")
+    
     # Validate bank details
     if not profile.get('bank_account_number') or not profile.get('bank_code') or not profile.get('account_name'):
         raise HTTPException(status_code=400, detail="Please update your bank details in your profile first")
@@ -1148,17 +1287,22 @@ async def request_withdrawal(withdrawal_req: WithdrawalRequest, user_id: str = D
         account_name=profile['account_name'],
         status="pending"
     )
-    
-    # Deduct from balance (hold in escrow until admin approves)
-    await provider_profiles_collection.update_one(
-        {"user_id": user_id},
-        {"$inc": {"balance": -withdrawal_req.amount}}
-    )
-    
-    # Save withdrawal request
     doc = withdrawal.model_dump()
     doc['created_at'] = doc['created_at'].isoformat()
-    await withdrawals_collection.insert_one(doc)
+    
+    async def save_withdrawal(session):
+        await withdrawals_collection.insert_one(doc, session=session)
+    
+    # Reserve the amount (hold in escrow until admin approves) and save the request together.
+    # The balance check is the update filter, so parallel requests cannot overdraw.
+    try:
+        await ledger.post(
+            user_id, ledger.WITHDRAWAL_HOLD, withdrawal.id, -withdrawal_req.amount,
+            memo="Withdrawal request", require_funds=True, then=save_withdrawal
+        )
+    except ledger.InsufficientFunds as e:
+        raise HTTPException(status_code=400, detail=f"Insufficient balance. Available: ₦{e.balance}")
+    invalidate_dashboard(user_id)
     
     return withdrawal
 
@@ -1209,6 +1353,92 @@ async def get_provider_wallet(user_id: str = Depends(get_current_user_id)):
         "account_name": profile.get('account_name')
     }
 
+@api_router.get("/provider/wallet/ledger")
+async def get_provider_wallet_ledger(
+    limit: int = 50,
+    before_seq: Optional[int] = None,
+    user_id: str = Depends(get_current_user_id)
+):
+    """Wallet history, newest first; pass the last seq as before_seq for the next page"""
+    user = await users_collection.find_one({"id": user_id}, {"_id": 0, "user_type": 1})
+    if not user or user['user_type'] != "provider":
+        raise HTTPException(status_code=403, detail="Only providers can view wallet")
+    
+    return await ledger.entries_for(user_id, limit=min(max(limit, 1), 200), before_seq=before_seq)
+
+# ============ DASHBOARD ============
+
+@api_router.get("/dashboard")
+async def get_dashboard(user_id: str = Depends(get_current_user_id)):
+    """
+    Everything the provider / customer dashboard shows, in one request
+    One user lookup, then the role's reads run concurrently. Cached per user for
+    DASHBOARD_CACHE_TTL seconds and dropped on the user's own booking, payment and profile writes.
+    """
+    dashboard = await dashboard_cache.get_or_compute(
+        make_key("dashboard", user_id=user_id),
+        lambda: compute_dashboard(user_id)
+    )
+    if "unavailable" in dashboard:
+        # Serve a partial dashboard once, never from the cache
+        invalidate_dashboard(user_id)
+    return dashboard
+
+async def compute_dashboard(user_id: str) -> dict:
+    user = await users_collection.find_one({"id": user_id}, {"_id": 0, "password": 0})
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    is_provider = user['user_type'] == "provider"
+    party = "provider_id" if is_provider else "customer_id"
+    reads = {
+        "bookings": bookings_collection.find({party: user_id}, BOOKING_EXCLUDED).sort("created_at", -1).to_list(1000),
+        "notifications": notifications_collection.find({"user_id": user_id}, {"_id": 0}).sort("created_at", -1).limit(50).to_list(50),
+        "unread_notifications": notifications_collection.count_documents({"user_id": user_id, "is_read": False}),
+    }
+    if is_provider:
+        reads.update({
+            "profile": provider_profiles_collection.find_one({"user_id": user_id}, {"_id": 0}),
+            "transactions": transactions_collection.find({"provider_id": user_id}, {"_id": 0}).sort("created_at", -1).to_list(100),
+            "pending_withdrawals": withdrawals_collection.count_documents({"provider_id": user_id, "status": "pending"}),
+        })
+    reads = await fan_out(
+        reads,
+        defaults={"notifications": [], "unread_notifications": 0, "transactions": [], "pending_withdrawals": 0},
+        required=["bookings", "profile"]
+    )
+    
+    dashboard = {
+        "user_type": user['user_type'],
+        "bookings": to_bookings(reads["bookings"]),
+        "notifications": reads["notifications"],
+        "unread_notifications": reads["unread_notifications"],
+    }
+    profile = reads.get("profile")
+    if is_provider:
+        if not profile:
+            raise HTTPException(status_code=404, detail="Provider profile not found")
+        if isinstance(profile.get('created_at'), str):
+            profile['created_at'] = datetime.fromisoformat(profile['created_at'])
+        dashboard.update({
+            # Same shape as /provider/profile
+            "profile": ProviderProfile(**profile),
+            "transactions": reads["transactions"],
+            # Same shape as /provider/wallet
+            "wallet": {
+                "balance": profile.get('balance', 0.0),
+                "total_earned": profile.get('total_earned', 0.0),
+                "pending_withdrawals": reads["pending_withdrawals"],
+                "bank_account_number": profile.get('bank_account_number'),
+                "bank_code": profile.get('bank_code'),
+                "account_name": profile.get('account_name')
+            },
+        })
+    dashboard["profile_status"] = completeness.profile_status(user.get("completion") or 0, user['user_type'])
+    if reads.failed:
+        dashboard["unavailable"] = reads.failed
+    return dashboard
+
 # ============ IMAGE UPLOAD ENDPOINTS ============
 
 @api_router.post("/upload/image")
@@ -1240,50 +1470,110 @@ async def upload_image(file: UploadFile = File(...), user_id: str = Depends(get_
         logging.error(f"Image upload failed: {e}")
         raise HTTPException(status_code=500, detail="Image upload failed")
 
+# ============ IMAGE ENDPOINTS ============
+
+def image_response(image: Optional[str]) -> Response:
+    """Serve a stored image (base64 data URL or external URL) as a cacheable response"""
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    if image.startswith(("http://", "https://")):
+        return RedirectResponse(image)
+    
+    if not image.startswith("data:") or ";base64," not in image:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    header, encoded = image.split(",", 1)
+    content_type = header[len("data:"):].split(";")[0] or "application/octet-stream"
+    return Response(
+        content=base64.b64decode(encoded),
+        media_type=content_type,
+        headers={"Cache-Control": "public, max-age=86400"}
+    )
+
+@api_router.get("/images/services/{service_id}/{index}")
+async def get_service_image(service_id: str, index: int):
+    """Single service image, referenced by thumbnail_url in service summaries"""
+    if index < 0:
+        raise HTTPException(status_code=404, detail="Image not found")
+    service = await services_collection.find_one(
+        {"id": service_id},
+        {"_id": 0, "id": 1, "images": {"$slice": [index, 1]}}
+    )
+    if not service:
+        raise HTTPException(status_code=404, detail="Service not found")
+    images = service.get('images') or []
+    return image_response(images[0] if images else None)
+
+@api_router.get("/images/users/{user_id}/photo")
+async def get_user_photo(user_id: str):
+    """Profile photo, referenced by profile_photo_url in user summaries"""
+    user = await users_collection.find_one({"id": user_id}, {"_id": 0, "profile_photo": 1})
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return image_response(user.get('profile_photo'))
+
 # ============ ADMIN ENDPOINTS ============
 
 @api_router.get("/admin/stats")
 async def get_admin_stats(admin_user: dict = Depends(get_admin_user)):
     """Get dashboard statistics for admin"""
     try:
+        from datetime import timezone
+        now = datetime.now(timezone.utc)
+        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        
+        # Every count and list below is independent; a failing one is reported instead of failing the page
+        reads = await fan_out(
+            {
+                "total_users": users_collection.count_documents({}),
+                "customers": users_collection.count_documents({"user_type": "customer"}),
+                "providers": users_collection.count_documents({"user_type": "provider"}),
+                "total_bookings": bookings_collection.count_documents({}),
+                "active_bookings": bookings_collection.count_documents({
+                    "status": {"$in": ["pending", "accepted", "completed", "customer_confirmed"]},
+                    "payment_status": "pending"
+                }),
+                "completed_bookings": bookings_collection.count_documents({"payment_status": "paid"}),
+                "transactions": transactions_collection.find({"payment_status": "success"}, {"_id": 0}).to_list(1000),
+                "month_bookings": bookings_collection.count_documents({
+                    "created_at": {"$gte": month_start.isoformat()}
+                }),
+                "pending_withdrawals_count": withdrawals_collection.count_documents({"status": "pending"}),
+                "pending_withdrawals_list": withdrawals_collection.find({"status": "pending"}, {"_id": 0}).to_list(100),
+                "profiles": provider_profiles_collection.find({}, {"_id": 0, "average_rating": 1}).to_list(1000),
+            },
+            defaults={"transactions": [], "pending_withdrawals_list": [], "profiles": []}
+        )
+        
         # Count users
-        total_users = await users_collection.count_documents({})
-        customers = await users_collection.count_documents({"user_type": "customer"})
-        providers = await users_collection.count_documents({"user_type": "provider"})
+        total_users = reads["total_users"]
+        customers = reads["customers"]
+        providers = reads["providers"]
         
         # Count bookings
-        total_bookings = await bookings_collection.count_documents({})
-        active_bookings = await bookings_collection.count_documents({
-            "status": {"$in": ["pending", "accepted", "completed", "customer_confirmed"]},
-            "payment_status": "pending"
-        })
-        completed_bookings = await bookings_collection.count_documents({"payment_status": "paid"})
+        total_bookings = reads["total_bookings"]
+        active_bookings = reads["active_bookings"]
+        completed_bookings = reads["completed_bookings"]
         
         # Calculate revenue
-        transactions = await transactions_collection.find({"payment_status": "success"}, {"_id": 0}).to_list(1000)
+        transactions = reads["transactions"]
         total_revenue = sum(t.get('amount', 0) for t in transactions)
         platform_earnings = sum(t.get('platform_fee', 0) for t in transactions)
         
         # Get this month's data
-        from datetime import timezone
-        now = datetime.now(timezone.utc)
-        month_start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        month_bookings = await bookings_collection.count_documents({
-            "created_at": {"$gte": month_start.isoformat()}
-        })
+        month_bookings = reads["month_bookings"]
         
         month_transactions = [t for t in transactions if datetime.fromisoformat(t['created_at']) >= month_start]
         month_revenue = sum(t.get('amount', 0) for t in month_transactions)
         month_earnings = sum(t.get('platform_fee', 0) for t in month_transactions)
         
         # Withdrawal stats
-        pending_withdrawals_count = await withdrawals_collection.count_documents({"status": "pending"})
-        pending_withdrawals_list = await withdrawals_collection.find({"status": "pending"}, {"_id": 0}).to_list(100)
-        pending_withdrawals_amount = sum(w.get('amount', 0) for w in pending_withdrawals_list)
+        pending_withdrawals_count = reads["pending_withdrawals_count"]
+        pending_withdrawals_amount = sum(w.get('amount', 0) for w in reads["pending_withdrawals_list"])
         
         # Average rating
-        profiles = await provider_profiles_collection.find({}, {"_id": 0, "average_rating": 1}).to_list(1000)
+        profiles = reads["profiles"]
         avg_rating = sum(p.get('average_rating', 0) for p in profiles) / len(profiles) if profiles else 0
         
         return {
@@ -1311,7 +1601,9 @@ async def get_admin_stats(admin_user: dict = Depends(get_admin_user)):
             },
             "ratings": {
                 "average": round(avg_rating, 1)
-            }
+            },
+            # Stats that could not be loaded this time (shown as null / 0)
+            "unavailable": reads.failed
         }
     except Exception as e:
         logging.error(f"Admin stats error: {e}")
@@ -1346,6 +1638,77 @@ async def get_all_withdrawals(status: Optional[str] = None, admin_user: dict = D
         logging.error(f"Get withdrawals error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def withdrawal_update(action_data: WithdrawalAction) -> dict:
+    """$set applied to a pending withdrawal by an admin approve / reject"""
+    if action_data.action == "approve":
+        update_data = {
+            "status": "approved",
+            "admin_notes": action_data.admin_notes or "Approved by admin",
+            "completed_at": datetime.utcnow().isoformat()
+        }
+        if action_data.transaction_reference:
+            update_data["transfer_reference"] = action_data.transaction_reference
+        return update_data
+    return {
+        "status": "failed",
+        "admin_notes": action_data.admin_notes or "Rejected by admin",
+        "completed_at": datetime.utcnow().isoformat()
+    }
+
+async def apply_withdrawal_action(withdrawal_id: str, action_data: WithdrawalAction) -> dict:
+    """Approve or reject one pending withdrawal; the status change is conditional on it still being pending"""
+    withdrawal = await withdrawals_collection.find_one({"id": withdrawal_id}, {"_id": 0, "provider_id": 1, "amount": 1, "status": 1})
+    if not withdrawal:
+        raise HTTPException(status_code=404, detail="Withdrawal not found")
+    
+    if withdrawal['status'] != 'pending':
+        raise HTTPException(status_code=400, detail="Can only update pending withdrawals")
+    
+    not_pending = HTTPException(status_code=400, detail="Can only update pending withdrawals")
+    
+    async def set_status(session=None):
+        result = await withdrawals_collection.update_one(
+            {"id": withdrawal_id, "status": "pending"},
+            {"$set": withdrawal_update(action_data)},
+            session=session
+        )
+        if result.matched_count == 0:
+            raise not_pending
+    
+    if action_data.action == "approve":
+        await set_status()
+        invalidate_dashboard(withdrawal['provider_id'])
+        return {"message": "Withdrawal approved successfully", "withdrawal_id": withdrawal_id}
+    
+    async def release(then=None):
+        await ledger.post(
+            withdrawal['provider_id'], ledger.WITHDRAWAL_RELEASE, withdrawal_id, withdrawal['amount'],
+            memo=action_data.admin_notes or "Rejected by admin", then=then
+        )
+    
+    if await ledger.transactions_supported():
+        # Return amount to provider balance, together with the status change
+        try:
+            await release(then=set_status)
+        except ledger.AlreadyPosted:
+            raise not_pending
+    else:
+        # Without a transaction the status flip goes first: only the request that moved the
+        # withdrawal out of pending returns the amount
+        await set_status()
+        try:
+            await release()
+        except ledger.AlreadyPosted:
+            pass
+        except BaseException:
+            await withdrawals_collection.update_one(
+                {"id": withdrawal_id, "status": "failed"},
+                {"$set": {"status": "pending", "admin_notes": None, "completed_at": None}}
+            )
+            raise
+    invalidate_dashboard(withdrawal['provider_id'])
+    return {"message": "Withdrawal rejected and amount returned to provider", "withdrawal_id": withdrawal_id}
+
 @api_router.put("/admin/withdrawals/{withdrawal_id}")
 async def update_withdrawal_status(
     withdrawal_id: str,
@@ -1354,76 +1717,172 @@ async def update_withdrawal_status(
 ):
     """Approve or reject a withdrawal request"""
     try:
-        withdrawal = await withdrawals_collection.find_one({"id": withdrawal_id})
+        return await apply_withdrawal_action(withdrawal_id, action_data)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Update withdrawal error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+class ConcurrentWithdrawalUpdate(Exception):
+    pass
+
+async def bulk_apply_withdrawal_actions(items, session) -> list:
+    """One transaction: read the batch, release rejected amounts, bulk_write every status change"""
+    ids = [item.id for item in items]
+    withdrawals = {
+        w['id']: w async for w in withdrawals_collection.find(
+            {"id": {"$in": ids}}, {"_id": 0, "id": 1, "provider_id": 1, "amount": 1, "status": 1}, session=session
+        )
+    }
+    
+    results, operations, releases, seen = [], [], [], set()
+    for item in items:
+        withdrawal = withdrawals.get(item.id)
+        if item.id in seen:
+            results.append({"id": item.id, "action": item.action, "ok": False, "error": "Duplicate id in batch"})
+            continue
+        seen.add(item.id)
         if not withdrawal:
-            raise HTTPException(status_code=404, detail="Withdrawal not found")
-        
+            results.append({"id": item.id, "action": item.action, "ok": False, "error": "Withdrawal not found"})
+            continue
         if withdrawal['status'] != 'pending':
-            raise HTTPException(status_code=400, detail="Can only update pending withdrawals")
-        
-        if action_data.action == "approve":
-            # Update withdrawal status
-            update_data = {
-                "status": "approved",
-                "admin_notes": action_data.admin_notes or "Approved by admin",
-                "completed_at": datetime.utcnow().isoformat()
-            }
-            
-            if action_data.transaction_reference:
-                update_data["transfer_reference"] = action_data.transaction_reference
-            
-            await withdrawals_collection.update_one(
-                {"id": withdrawal_id},
-                {"$set": update_data}
-            )
-            
-            return {"message": "Withdrawal approved successfully", "withdrawal_id": withdrawal_id}
+            results.append({"id": item.id, "action": item.action, "ok": False, "error": "Can only update pending withdrawals"})
+            continue
         
-        elif action_data.action == "reject":
-            # Return amount to provider balance
-            await provider_profiles_collection.update_one(
-                {"user_id": withdrawal['provider_id']},
-                {"$inc": {"balance": withdrawal['amount']}}
-            )
-            
-            # Update withdrawal status
-            await withdrawals_collection.update_one(
-                {"id": withdrawal_id},
-                {"$set": {
-                    "status": "failed",
-                    "admin_notes": action_data.admin_notes or "Rejected by admin",
-                    "completed_at": datetime.utcnow().isoformat()
-                }}
-            )
+        update_data = withdrawal_update(item)
+        operations.append(UpdateOne({"id": item.id, "status": "pending"}, {"$set": update_data}))
+        if item.action == "reject":
+            releases.append(ledger.Posting(
+                withdrawal['provider_id'], ledger.WITHDRAWAL_RELEASE, item.id, withdrawal['amount'],
+                memo=update_data['admin_notes']
+            ))
+        results.append({"id": item.id, "action": item.action, "ok": True, "status": update_data['status']})
+    
+    if releases:
+        await ledger.post_many(releases, session)
+    if operations:
+        result = await withdrawals_collection.bulk_write(operations, ordered=False, session=session)
+        if result.matched_count != len(operations):
+            # Another admin changed one of them after our read; abort and re-read
+            raise ConcurrentWithdrawalUpdate()
+    return results
+
+@api_router.post("/admin/withdrawals/bulk")
+async def bulk_update_withdrawals(request: WithdrawalBulkRequest, admin_user: dict = Depends(get_admin_user)):
+    """Approve / reject many withdrawals in one call; returns a result per item"""
+    try:
+        if await ledger.transactions_supported():
+            from database import client
             
-            return {"message": "Withdrawal rejected and amount returned to provider", "withdrawal_id": withdrawal_id}
+            for _ in range(3):
+                try:
+                    async with await client.start_session() as session:
+                        results = await session.with_transaction(
+                            lambda s: bulk_apply_withdrawal_actions(request.items, s)
+                        )
+                    break
+                except ConcurrentWithdrawalUpdate:
+                    continue
+            else:
+                raise HTTPException(status_code=409, detail="Withdrawals changed during the batch, please retry")
+        else:
+            # No transactions on a standalone server: apply item by item
+            results = []
+            for item in request.items:
+                try:
+                    response = await apply_withdrawal_action(item.id, item)
+                    results.append({"id": item.id, "action": item.action, "ok": True,
+                                    "status": "approved" if item.action == "approve" else "failed",
+                                    "message": response["message"]})
+                except HTTPException as e:
+                    results.append({"id": item.id, "action": item.action, "ok": False, "error": e.detail})
         
+        succeeded = sum(1 for r in results if r["ok"])
+        if succeeded:
+            # Provider ids are not in the results; a batch is rare enough to drop every dashboard
+            dashboard_cache.clear()
+        return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"Update withdrawal error: {e}")
+        logging.error(f"Bulk withdrawal update error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/admin/withdrawals/export")
+async def export_approved_payouts(
+    format: str = "csv",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    admin_user: dict = Depends(get_admin_user)
+):
+    """Approved payouts streamed straight from the cursor, filtered on completed_at"""
+    query = {"status": "approved", **date_range("completed_at", date_from, date_to)}
+    cursor = export_cursor(withdrawals_collection, query, PAYOUT_COLUMNS, sort_field="completed_at")
+    return export_response(cursor, PAYOUT_COLUMNS, format, "approved-payouts")
+
+@api_router.get("/admin/transactions/export")
+async def admin_export_transactions(
+    format: str = "csv",
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    admin_user: dict = Depends(get_admin_user)
+):
+    """Every transaction in the date range, uncapped"""
+    query = date_range("created_at", date_from, date_to)
+    return export_response(export_cursor(transactions_collection, query, TRANSACTION_COLUMNS), TRANSACTION_COLUMNS, format, "transactions")
+
+@api_router.get("/admin/bookings/export")
+async def admin_export_bookings(
+    format: str = "csv",
+    status: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    admin_user: dict = Depends(get_admin_user)
+):
+    """Every booking in the date range, uncapped"""
+    query = date_range("created_at", date_from, date_to)
+    if status:
+        query["status"] = status
+    return export_response(export_cursor(bookings_collection, query, BOOKING_COLUMNS), BOOKING_COLUMNS, format, "bookings")
+
 @api_router.get("/admin/users")
-async def get_all_users(user_type: Optional[str] = None, admin_user: dict = Depends(get_admin_user)):
+async def get_all_users(user_type: Optional[str] = None, fields: Optional[str] = None, admin_user: dict = Depends(get_admin_user)):
     """Get all users with optional type filter"""
+    selected = parse_fields(fields, ADMIN_USER_FIELDS)
     try:
         query = {}
         if user_type and user_type != "all":
             query["user_type"] = user_type
         
-        users = await users_collection.find(query, {"_id": 0, "password": 0}).sort("created_at", -1).to_list(1000)
+        projection = build_projection(ADMIN_USER_SUMMARY, selected, USER_EXCLUDED)
+        users = await users_collection.find(query, projection).sort("created_at", -1).to_list(1000)
         
         # Convert datetime strings
         for user in users:
             if isinstance(user.get('created_at'), str):
                 user['created_at'] = datetime.fromisoformat(user['created_at'])
+            with_user_refs(user)
         
         return users
     except Exception as e:
         logging.error(f"Get users error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/admin/users/export")
+async def admin_export_users(
+    format: str = "csv",
+    user_type: Optional[str] = None,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    admin_user: dict = Depends(get_admin_user)
+):
+    """Every user registered in the date range, uncapped; never includes passwords"""
+    query = date_range("created_at", date_from, date_to)
+    if user_type and user_type != "all":
+        query["user_type"] = user_type
+    return export_response(export_cursor(users_collection, query, USER_COLUMNS), USER_COLUMNS, format, "users")
+
 @api_router.put("/admin/users/{user_id}/verify")
 async def admin_verify_user(user_id: str, admin_user: dict = Depends(get_admin_user)):
     """Admin manually verify a user's email"""
@@ -1459,6 +1918,12 @@ async def admin_toggle_user_active(user_id: str, admin_user: dict = Depends(get_
             {"id": user_id},
             {"$set": {"is_active": new_status}}
         )
+        if user.get('user_type') == "provider":
+            invalidate_providers(await get_provider_categories(user_id))
+            if new_status:
+                autocomplete.index.set_provider(user_id, user.get('full_name', ''))
+            else:
+                autocomplete.index.remove_provider(user_id)
         
         status_text = "activated" if new_status else "suspended"
         return {"message": f"User {status_text} successfully", "is_active": new_status}
@@ -1483,10 +1948,20 @@ async def admin_get_user_details(user_id: str, admin_user: dict = Depends(get_ad
         # Get user statistics
         if user["user_type"] == "provider":
             # Get provider stats
-            services_count = await services_collection.count_documents({"provider_id": user_id})
-            bookings_count = await bookings_collection.count_documents({"provider_id": user_id})
-            reviews = await reviews_collection.find({"provider_id": user_id}).to_list(1000)
+            reads = await fan_out(
+                {
+                    "services_count": services_collection.count_documents({"provider_id": user_id}),
+                    "bookings_count": bookings_collection.count_documents({"provider_id": user_id}),
+                    "reviews": reviews_collection.find({"provider_id": user_id}, {"_id": 0, "rating": 1}).to_list(1000),
+                },
+                defaults={"reviews": []}
+            )
+            services_count = reads["services_count"]
+            bookings_count = reads["bookings_count"]
+            reviews = reads["reviews"]
             avg_rating = sum([r["rating"] for r in reviews]) / len(reviews) if reviews else 0
+            if reads.failed:
+                user["unavailable"] = reads.failed
             
             user["stats"] = {
                 "services_count": services_count,
@@ -1517,7 +1992,7 @@ async def get_recent_activity(limit: int = 20, admin_user: dict = Depends(get_ad
         activities = []
         
         # Recent bookings
-        recent_bookings = await bookings_collection.find({}, {"_id": 0}).sort("created_at", -1).limit(limit).to_list(limit)
+        recent_bookings = await bookings_collection.find({}, BOOKING_EXCLUDED).sort("created_at", -1).limit(limit).to_list(limit)
         for booking in recent_bookings:
             customer = await users_collection.find_one({"id": booking['customer_id']}, {"_id": 0, "full_name": 1})
             provider = await users_collection.find_one({"id": booking['provider_id']}, {"_id": 0, "full_name": 1})
@@ -1559,6 +2034,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-request DB call counts and slow-query log
+app.add_middleware(DbStatsMiddleware)
+
+# Per-route request counts and latency histograms
+app.add_middleware(MetricsMiddleware)
+
+# Opt-in, admin-only per-request profiling (PROFILING_ENABLED=true)
+app.add_middleware(ProfilingMiddleware)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
 # Logging
 logging.basicConfig(
     level=logging.INFO,
@@ -1566,6 +2054,33 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def ensure_db_indexes():
+    if os.environ.get('ENSURE_INDEXES_ON_STARTUP', 'true').lower() == 'true':
+        from database import db
+        from indexes import ensure_indexes
+        await ensure_indexes(db)
+
+@app.on_event("startup")
+async def start_autocomplete():
+    await autocomplete.start()
+
+@app.on_event("shutdown")
+async def stop_autocomplete():
+    await autocomplete.stop()
+
+@app.on_event("startup")
+async def start_email_outbox_worker():
+    email_outbox_worker.start()
+
+@app.on_event("shutdown")
+async def stop_email_outbox_worker():
+    await email_outbox_worker.stop()
+
+@app.on_event("shutdown")
+async def close_integrations():
+    await integrations.close_all()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     from database import client
@@ -0,0 +1,5 @@
+"""
+Regression tests for the QuickOne backend
+Run from backend/ with `python -m pytest`. Collections are mongomock_motor in-memory
+databases (see conftest.py), so no mongod is needed.
+"""
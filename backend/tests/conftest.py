@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+# database.py reads these at import; the client it builds is never used by the tests
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'quickone_test')
+
+import database  # noqa: E402
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """A fresh in-memory database behind every database.<name>_collection"""
+    mock_db = AsyncMongoMockClient()['quickone_test']
+    for attr in dir(database):
+        if not attr.endswith('_collection'):
+            continue
+        real, mock = getattr(database, attr), mock_db[attr[:-len('_collection')]]
+        # Also modules that did `from database import ...`, like server
+        for module in list(sys.modules.values()):
+            if getattr(module, attr, None) is real:
+                monkeypatch.setattr(module, attr, mock)
+    monkeypatch.setattr(database, 'db', mock_db)
+    return mock_db
@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+
+import ai_descriptions
+
+
+@pytest.fixture
+def one_slot(monkeypatch):
+    semaphore = asyncio.Semaphore(1)
+    monkeypatch.setattr(ai_descriptions, "_llm_semaphore", semaphore)
+    return semaphore
+
+
+async def hold_slot(entered: asyncio.Event, leave: asyncio.Event):
+    async with ai_descriptions._llm_slot():
+        entered.set()
+        await leave.wait()
+
+
+async def test_timed_out_wait_does_not_keep_a_slot(one_slot):
+    entered, leave = asyncio.Event(), asyncio.Event()
+    holder = asyncio.create_task(hold_slot(entered, leave))
+    await entered.wait()
+
+    with pytest.raises(asyncio.TimeoutError):
+        async with ai_descriptions._llm_slot(0.01):
+            pass
+
+    leave.set()
+    await holder
+    await asyncio.sleep(0)
+    assert not one_slot.locked()
+
+
+async def test_cancelled_wait_does_not_keep_a_slot(one_slot):
+    entered, leave = asyncio.Event(), asyncio.Event()
+    holder = asyncio.create_task(hold_slot(entered, leave))
+    await entered.wait()
+    waiter = asyncio.create_task(hold_slot(asyncio.Event(), asyncio.Event()))
+    await asyncio.sleep(0)
+
+    # The slot frees up in the same iteration the waiter is cancelled
+    leave.set()
+    await holder
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    await asyncio.sleep(0)
+    assert not one_slot.locked()
+
+
+def test_emergent_keys_stream_through_the_emergent_proxy(monkeypatch):
+    monkeypatch.setattr(ai_descriptions, "LLM_API_BASE", None)
+    assert ai_descriptions.stream_api_base("sk-emergent-0123") == ai_descriptions.EMERGENT_LLM_PROXY
+    assert ai_descriptions.stream_api_base("sk-proj-0123") is None
+
+    monkeypatch.setattr(ai_descriptions, "LLM_API_BASE", "http://localhost:4000")
+    assert ai_descriptions.stream_api_base("sk-emergent-0123") == "http://localhost:4000"
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from cache import ResponseCache, make_key
+
+KEY = make_key("services", category="plumbing")
+
+
+class SlowCompute:
+    def __init__(self, value="fresh"):
+        self.value = value
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if isinstance(self.value, Exception):
+            raise self.value
+        return self.value
+
+
+async def test_cancelled_leader_does_not_cancel_waiters():
+    cache = ResponseCache()
+    compute = SlowCompute()
+    leader = asyncio.create_task(cache.get_or_compute(KEY, compute))
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(cache.get_or_compute(KEY, compute))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    await asyncio.sleep(0)
+    compute.release.set()
+
+    assert await waiter == "fresh"
+    assert leader.cancelled()
+    assert compute.calls == 1
+    assert cache.get(KEY) == "fresh"
+
+
+async def test_concurrent_misses_compute_once():
+    cache = ResponseCache()
+    compute = SlowCompute()
+    callers = [asyncio.create_task(cache.get_or_compute(KEY, compute)) for _ in range(5)]
+    await asyncio.sleep(0)
+    compute.release.set()
+
+    assert await asyncio.gather(*callers) == ["fresh"] * 5
+    assert compute.calls == 1
+    assert (cache.misses, cache.hits) == (1, 4)
+
+
+async def test_failure_reaches_every_waiter_and_is_not_cached():
+    cache = ResponseCache()
+    compute = SlowCompute(RuntimeError("db down"))
+    callers = [asyncio.create_task(cache.get_or_compute(KEY, compute)) for _ in range(2)]
+    await asyncio.sleep(0)
+    compute.release.set()
+
+    for caller in callers:
+        with pytest.raises(RuntimeError):
+            await caller
+    assert cache.get(KEY) is None
+
+
+async def test_result_invalidated_mid_compute_is_not_stored():
+    cache = ResponseCache()
+    compute = SlowCompute()
+    caller = asyncio.create_task(cache.get_or_compute(KEY, compute))
+    await asyncio.sleep(0)
+    cache.invalidate("services", lambda params: params["category"] == "plumbing")
+    compute.release.set()
+
+    assert await caller == "fresh"
+    assert cache.get(KEY) is None
@@ -0,0 +1,96 @@
+from datetime import datetime, timedelta
+
+import email_service
+from email_service import EmailOutboxWorker, EmailService
+
+
+class RecordingTransport:
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+
+    def send_batch(self, emails):
+        self.sent.extend(emails)
+        return [self.error] * len(emails)
+
+
+async def queue(count: int = 1):
+    for i in range(count):
+        await EmailService().send_verification_code(f"user{i}@example.com", "483920")
+
+
+async def expire_leases(db):
+    expired = (datetime.utcnow() - timedelta(seconds=1)).isoformat()
+    await db.email_outbox.update_many({"status": "sending"}, {"$set": {"locked_until": expired}})
+
+
+async def test_claim_leases_a_batch_once(db, monkeypatch):
+    monkeypatch.setattr(email_service, "EMAIL_BATCH_SIZE", 3)
+    await queue(5)
+    worker = EmailOutboxWorker(EmailService(), transport=RecordingTransport())
+
+    first, second, third = await worker._claim_batch(), await worker._claim_batch(), await worker._claim_batch()
+
+    assert (len(first), len(second), third) == (3, 2, [])
+    assert len({email['id'] for email in first + second}) == 5
+    assert {email['attempts'] for email in first + second} == {1}
+    assert len({email['lease_token'] for email in first}) == 1
+
+
+async def test_sent_email_drops_its_body_and_gets_a_purge_date(db):
+    await queue()
+    transport = RecordingTransport()
+
+    assert await EmailOutboxWorker(EmailService(), transport=transport).drain_once() == 1
+
+    assert "483920" in transport.sent[0]['body']
+    stored = await db.email_outbox.find_one({}, {"_id": 0})
+    assert (stored['status'], stored['attempts']) == ("sent", 1)
+    assert 'body' not in stored
+    assert isinstance(stored['purge_at'], datetime)
+
+
+async def test_failure_on_the_last_attempt_is_dead_lettered_without_its_body(db, monkeypatch):
+    monkeypatch.setattr(email_service, "EMAIL_MAX_ATTEMPTS", 2)
+    await queue()
+    worker = EmailOutboxWorker(EmailService(), transport=RecordingTransport(error="550 mailbox unavailable"))
+
+    await worker.drain_once()
+    stored = await db.email_outbox.find_one({}, {"_id": 0})
+    assert (stored['status'], stored['attempts']) == ("pending", 1)
+    assert 'body' in stored and 'purge_at' not in stored
+
+    await db.email_outbox.update_one({}, {"$set": {"next_attempt_at": datetime.utcnow().isoformat()}})
+    await worker.drain_once()
+    stored = await db.email_outbox.find_one({}, {"_id": 0})
+    assert (stored['status'], stored['attempts']) == ("dead", 2)
+    assert 'body' not in stored
+    assert isinstance(stored['purge_at'], datetime)
+
+
+async def test_expired_lease_counts_as_an_attempt(db, monkeypatch):
+    monkeypatch.setattr(email_service, "EMAIL_MAX_ATTEMPTS", 2)
+    await queue()
+    worker = EmailOutboxWorker(EmailService(), transport=RecordingTransport())
+
+    # Each delivery hangs the worker until its lease runs out
+    for attempt in (1, 2):
+        assert [email['attempts'] for email in await worker._claim_batch()] == [attempt]
+        await expire_leases(db)
+
+    assert await worker._claim_batch() == []
+    stored = await db.email_outbox.find_one({}, {"_id": 0})
+    assert (stored['status'], stored['attempts']) == ("dead", 2)
+    assert 'body' not in stored
+
+
+async def test_worker_that_lost_its_lease_does_not_overwrite_the_new_one(db):
+    await queue()
+    slow = EmailOutboxWorker(EmailService(), transport=RecordingTransport(error="timed out"))
+    stale_batch = await slow._claim_batch()
+    await expire_leases(db)
+    await EmailOutboxWorker(EmailService(), transport=RecordingTransport()).drain_once()
+
+    await slow._deliver(stale_batch)
+
+    assert (await db.email_outbox.find_one({}, {"_id": 0}))['status'] == "sent"
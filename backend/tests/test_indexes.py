@@ -0,0 +1,47 @@
+import os
+
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import PyMongoError
+
+import database
+from indexes import INDEXES, QUERY_SHAPES, ensure_indexes, find_collection_scans
+
+# Scratch database on the MONGO_URL server, dropped after the test
+EXPLAIN_DB = "quickone_index_explain_test"
+
+
+def _leading_fields(collection: str) -> set:
+    return {next(iter(model.document['key'])) for model in INDEXES[collection]}
+
+
+def test_every_collection_is_registered():
+    collections = {attr[:-len('_collection')] for attr in dir(database) if attr.endswith('_collection')}
+    assert collections <= INDEXES.keys()
+
+
+def test_every_query_shape_can_use_an_index():
+    for collection, query, sort in QUERY_SHAPES:
+        if "$text" in query:
+            assert any("text" in model.document['key'].values() for model in INDEXES[collection])
+            continue
+        fields = set(query) | {field for field, _ in sort or []}
+        assert fields & _leading_fields(collection), (collection, query, sort)
+
+
+async def test_no_query_shape_collection_scans_on_a_real_mongod():
+    # explain() needs the real planner; mongomock has none
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'], serverSelectionTimeoutMS=1000)
+    try:
+        await client.admin.command("ping")
+    except PyMongoError:
+        client.close()
+        pytest.skip("no mongod reachable at MONGO_URL")
+
+    db = client[EXPLAIN_DB]
+    try:
+        await ensure_indexes(db)
+        assert await find_collection_scans(db) == []
+    finally:
+        await client.drop_database(EXPLAIN_DB)
+        client.close()
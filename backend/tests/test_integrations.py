@@ -0,0 +1,28 @@
+import argparse
+import asyncio
+
+import integrations
+from benchmarks import importtime
+
+
+def test_server_boot_is_within_budget_and_imports_no_lazy_integration():
+    # The CLI check: fails on a lazy integration imported at boot, or when the best of
+    # three `import server` runs exceeds IMPORT_BUDGET_MS
+    args = argparse.Namespace(target="server", budget_ms=importtime.DEFAULT_BUDGET_MS, top=10, runs=3, out=None)
+    assert importtime.main(args) == 0
+
+
+async def test_factory_runs_once_under_concurrent_first_use(monkeypatch):
+    monkeypatch.setattr(integrations, "_factories", {})
+    monkeypatch.setattr(integrations, "_instances", {})
+    calls = []
+
+    @integrations.provider("sdk")
+    def load_sdk():
+        calls.append(1)
+        return object()
+
+    first, second = await asyncio.gather(integrations.aget("sdk"), integrations.aget("sdk"))
+    assert first is second
+    assert calls == [1]
+    assert integrations.loaded() == ["sdk"]
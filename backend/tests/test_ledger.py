@@ -0,0 +1,100 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+import ledger
+from indexes import INDEXES
+
+PROVIDER = "provider-1"
+
+
+@pytest.fixture
+async def profile(db, monkeypatch):
+    # mongomock is a standalone server: postings take the unsessioned, locked path
+    monkeypatch.setattr(ledger, "_transactions_supported", False)
+    await db.wallet_ledger.create_indexes(INDEXES["wallet_ledger"])
+    await db.provider_profiles.insert_one({"user_id": PROVIDER, "balance": 0.0, "total_earned": 0.0})
+    return db
+
+
+async def snapshot(db):
+    return await db.provider_profiles.find_one({"user_id": PROVIDER}, {"_id": 0})
+
+
+async def test_duplicate_that_slips_past_the_precheck_is_reversed(profile, monkeypatch):
+    await ledger.post(PROVIDER, ledger.PAYMENT, "payment-1", 100.0, earned=100.0)
+
+    # A concurrent duplicate ran its pre-check before the first request wrote the entry
+    find_one = database.wallet_ledger_collection.find_one
+    checks = []
+
+    async def precheck_misses(*args, **kwargs):
+        checks.append(args)
+        return None if len(checks) == 1 else await find_one(*args, **kwargs)
+    monkeypatch.setattr(database.wallet_ledger_collection, "find_one", precheck_misses)
+
+    with pytest.raises(ledger.AlreadyPosted):
+        await ledger.post(PROVIDER, ledger.PAYMENT, "payment-1", 100.0, earned=100.0)
+
+    profile_doc = await snapshot(profile)
+    assert (profile_doc['balance'], profile_doc['total_earned'], profile_doc['ledger_seq']) == (100.0, 100.0, 1)
+    assert 'ledger_lock' not in profile_doc
+    assert await ledger.verify(profile) == []
+
+
+async def test_concurrent_duplicates_credit_once(profile):
+    results = await asyncio.gather(
+        *(ledger.post(PROVIDER, ledger.PAYMENT, "payment-1", 100.0, earned=100.0) for _ in range(3)),
+        return_exceptions=True
+    )
+
+    assert sum(isinstance(result, dict) for result in results) == 1
+    assert sum(isinstance(result, ledger.AlreadyPosted) for result in results) == 2
+    assert (await snapshot(profile))['balance'] == 100.0
+    assert await ledger.verify(profile) == []
+
+
+async def test_failing_then_leaves_nothing_posted(profile):
+    async def then(session):
+        raise RuntimeError("status flip failed")
+
+    with pytest.raises(RuntimeError):
+        await ledger.post(PROVIDER, ledger.PAYMENT, "payment-1", 100.0, earned=100.0, then=then)
+
+    profile_doc = await snapshot(profile)
+    assert (profile_doc['balance'], profile_doc['total_earned'], profile_doc['ledger_seq']) == (0.0, 0.0, 0)
+    assert await profile.wallet_ledger.count_documents({}) == 0
+    # The same reference can be posted once the failure is fixed
+    await ledger.post(PROVIDER, ledger.PAYMENT, "payment-1", 100.0, earned=100.0)
+    assert await ledger.verify(profile) == []
+
+
+async def test_debit_without_funds_moves_nothing(profile):
+    with pytest.raises(ledger.InsufficientFunds):
+        await ledger.post(PROVIDER, ledger.WITHDRAWAL_HOLD, "withdrawal-1", -50.0, require_funds=True)
+
+    profile_doc = await snapshot(profile)
+    assert (profile_doc['balance'], profile_doc.get('ledger_seq', 0)) == (0.0, 0)
+    assert 'ledger_lock' not in profile_doc
+
+
+async def test_crashed_posting_is_reversed_by_the_next_one(profile):
+    # A posting died after its $inc, before writing its entry, and its lease ran out
+    await profile.provider_profiles.update_one({"user_id": PROVIDER}, {"$set": {
+        "balance": 40.0, "total_earned": 40.0, "ledger_seq": 1,
+        "ledger_lock": {"token": "dead", "until": datetime.utcnow() - timedelta(seconds=1),
+                        "posting": {"amount": 40.0, "earned": 40.0}},
+    }})
+
+    await ledger.post(PROVIDER, ledger.PAYMENT, "payment-2", 10.0, earned=10.0)
+
+    profile_doc = await snapshot(profile)
+    assert (profile_doc['balance'], profile_doc['ledger_seq']) == (10.0, 1)
+    assert await ledger.verify(profile) == []
+
+
+async def test_unknown_provider(profile):
+    with pytest.raises(ledger.ProfileNotFound):
+        await ledger.post("nobody", ledger.PAYMENT, "payment-1", 10.0)
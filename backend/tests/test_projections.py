@@ -0,0 +1,18 @@
+from projections import USER_SUMMARY, user_photo_url, with_user_refs
+
+
+async def test_photo_reference_only_for_users_with_a_photo(db):
+    await db.users.insert_many([
+        {"id": "with-photo", "profile_photo": "data:image/jpeg;base64,/9j/4AAQ"},
+        {"id": "empty-string", "profile_photo": ""},
+        {"id": "null", "profile_photo": None},
+        {"id": "missing"},
+    ])
+
+    # The same expression find() evaluates in USER_SUMMARY
+    users = await db.users.aggregate([
+        {"$project": {"_id": 0, "id": 1, "has_photo": USER_SUMMARY["has_photo"]}}
+    ]).to_list(None)
+
+    urls = {user["id"]: with_user_refs(user)["profile_photo_url"] for user in users}
+    assert urls == {"with-photo": user_photo_url("with-photo"), "empty-string": None, "null": None, "missing": None}
@@ -0,0 +1,91 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+import scheduling
+from indexes import INDEXES
+
+PROVIDER = "provider-1"
+
+
+@pytest.fixture
+async def schedule(db, monkeypatch):
+    await db.schedule_locks.create_indexes(INDEXES["schedule_locks"])
+    find_conflict = scheduling.find_conflict
+
+    # Yield to the other requests between the conflict check and the insert, as a real
+    # round trip to Mongo would
+    async def slow_find_conflict(*args):
+        conflict = await find_conflict(*args)
+        for _ in range(5):
+            await asyncio.sleep(0)
+        return conflict
+    monkeypatch.setattr(scheduling, "find_conflict", slow_find_conflict)
+    return db
+
+
+def booking(start: str, minutes: int = 60, status: str = "pending") -> dict:
+    slot_start, slot_end = scheduling.slot_at(datetime.fromisoformat(start), minutes)
+    return {"id": str(uuid.uuid4()), "provider_id": PROVIDER, "status": status,
+            "slot_start": slot_start.isoformat(), "slot_end": slot_end.isoformat()}
+
+
+async def test_concurrent_overlapping_bookings_admit_one(schedule):
+    results = await asyncio.gather(
+        scheduling.reserve(booking("2026-11-02T10:00")),
+        scheduling.reserve(booking("2026-11-02T10:30")),
+        scheduling.reserve(booking("2026-11-02T09:15", 90)),
+    )
+
+    assert sorted(results) == [False, False, True]
+    assert await schedule.bookings.count_documents({"provider_id": PROVIDER}) == 1
+    assert await schedule.schedule_locks.count_documents({}) == 0
+
+
+async def test_adjacent_and_inactive_bookings_do_not_conflict(schedule):
+    await schedule.bookings.insert_one(booking("2026-11-02T10:00", status="cancelled"))
+
+    results = await asyncio.gather(
+        scheduling.reserve(booking("2026-11-02T10:00")),
+        scheduling.reserve(booking("2026-11-02T11:00")),
+    )
+
+    assert results == [True, True]
+
+
+async def test_held_lock_makes_the_request_busy(schedule, monkeypatch):
+    monkeypatch.setattr(scheduling, "LOCK_WAIT_SECONDS", 0.05)
+    await schedule.schedule_locks.insert_one(
+        {"provider_id": PROVIDER, "token": "other", "locked_until": datetime.utcnow() + timedelta(seconds=10)}
+    )
+
+    with pytest.raises(scheduling.ScheduleBusy):
+        await scheduling.reserve(booking("2026-11-02T10:00"))
+    assert await schedule.bookings.count_documents({}) == 0
+
+
+async def test_expired_lock_is_taken_over(schedule):
+    await schedule.schedule_locks.insert_one(
+        {"provider_id": PROVIDER, "token": "crashed", "locked_until": datetime.utcnow() - timedelta(seconds=1)}
+    )
+
+    assert await scheduling.reserve(booking("2026-11-02T10:00"))
+
+
+async def test_request_that_overran_its_lease_backs_out(schedule, monkeypatch):
+    competing = booking("2026-11-02T10:00")
+    find_conflict = scheduling.find_conflict
+
+    # While we were stalled our lease expired and another request booked the slot
+    async def stalled_find_conflict(*args):
+        conflict = await find_conflict(*args)
+        await schedule.schedule_locks.update_one({"provider_id": PROVIDER}, {"$set": {"token": "other"}})
+        await schedule.bookings.insert_one(dict(competing))
+        return conflict
+    monkeypatch.setattr(scheduling, "find_conflict", stalled_find_conflict)
+
+    ours = booking("2026-11-02T10:30")
+    assert await scheduling.reserve(ours) is False
+    assert [b['id'] async for b in schedule.bookings.find({}, {"_id": 0, "id": 1})] == [competing['id']]
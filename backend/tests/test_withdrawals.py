@@ -0,0 +1,78 @@
+import pytest
+from fastapi import HTTPException
+
+import ledger
+import server
+from indexes import INDEXES
+from models import WithdrawalAction, WithdrawalRequest
+
+PROVIDER = "provider-1"
+WITHDRAWAL = "withdrawal-1"
+
+
+@pytest.fixture
+async def pending(db, monkeypatch):
+    # Standalone server: no transaction ties the release to the status change
+    monkeypatch.setattr(ledger, "_transactions_supported", False)
+    await db.wallet_ledger.create_indexes(INDEXES["wallet_ledger"])
+    await db.idempotency_keys.create_indexes(INDEXES["idempotency_keys"])
+    await db.users.insert_one({"id": PROVIDER, "user_type": "provider"})
+    await db.provider_profiles.insert_one({
+        "user_id": PROVIDER, "balance": 0.0, "total_earned": 50.0,
+        "bank_account_number": "0123456789", "bank_code": "058", "account_name": "Ada Obi",
+    })
+    await db.withdrawals.insert_one({"id": WITHDRAWAL, "provider_id": PROVIDER, "amount": 50.0, "status": "pending"})
+    return db
+
+
+async def balance(db):
+    return (await db.provider_profiles.find_one({"user_id": PROVIDER}))['balance']
+
+
+async def test_reject_returns_the_amount(pending):
+    await server.apply_withdrawal_action(WITHDRAWAL, WithdrawalAction(action="reject"))
+
+    assert await balance(pending) == 50.0
+    assert (await pending.withdrawals.find_one({"id": WITHDRAWAL}))['status'] == "failed"
+
+
+async def test_reject_losing_to_an_approve_returns_nothing(pending, monkeypatch):
+    # The reject read the withdrawal while it was pending; an approve landed right after
+    stale = await pending.withdrawals.find_one({"id": WITHDRAWAL}, {"_id": 0})
+    await server.apply_withdrawal_action(WITHDRAWAL, WithdrawalAction(action="approve"))
+
+    async def stale_read(*args, **kwargs):
+        return stale
+    monkeypatch.setattr(server.withdrawals_collection, "find_one", stale_read)
+
+    with pytest.raises(HTTPException) as error:
+        await server.apply_withdrawal_action(WITHDRAWAL, WithdrawalAction(action="reject"))
+
+    assert error.value.status_code == 400
+    assert await balance(pending) == 0.0
+    assert await pending.wallet_ledger.count_documents({}) == 0
+
+
+async def test_failed_release_puts_the_withdrawal_back(pending):
+    await pending.provider_profiles.delete_many({})
+
+    with pytest.raises(ledger.ProfileNotFound):
+        await server.apply_withdrawal_action(WITHDRAWAL, WithdrawalAction(action="reject"))
+
+    assert (await pending.withdrawals.find_one({"id": WITHDRAWAL}))['status'] == "pending"
+
+
+async def test_request_retried_with_the_same_key_holds_once(pending):
+    await pending.provider_profiles.update_one({"user_id": PROVIDER}, {"$set": {"balance": 20000.0}})
+    request = WithdrawalRequest(amount=8000)
+
+    first = await server.request_withdrawal(request, idempotency_key="key-1", user_id=PROVIDER)
+    replay = await server.request_withdrawal(request, idempotency_key="key-1", user_id=PROVIDER)
+
+    assert replay['id'] == first.id
+    assert await balance(pending) == 12000.0
+    assert await pending.withdrawals.count_documents({"provider_id": PROVIDER, "amount": 8000.0}) == 1
+
+    with pytest.raises(HTTPException) as error:
+        await server.request_withdrawal(WithdrawalRequest(amount=9000), idempotency_key="key-1", user_id=PROVIDER)
+    assert error.value.status_code == 422
@@ -0,0 +1,136 @@
+"""
+Email verification codes
+Kept in their own collection instead of on the user document:
+- codes are stored as HMAC-SHA256 hashes, never in plaintext
+- one document per email; a TTL index on purge_at removes it once both the code
+  and the resend window have expired
+- expiry and resend throttling are evaluated by Mongo in the update filter, so
+  concurrent resends cannot exceed the limit
+Dates here are BSON datetimes (not ISO strings) because TTL indexes require them.
+"""
+import hashlib
+import hmac
+import secrets
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from auth import JWT_SECRET
+
+CODE_TTL = timedelta(minutes=10)
+RESEND_WINDOW = timedelta(hours=1)
+MAX_RESENDS = 3
+MAX_VERIFY_ATTEMPTS = 5
+
+class ResendLimitExceeded(Exception):
+    pass
+
+
+def generate_code() -> str:
+    return f"{secrets.randbelow(10**6):06d}"
+
+
+def hash_code(email: str, code: str) -> str:
+    # Keyed so a leaked collection cannot be brute-forced over the 10^6 code space
+    return hmac.new(JWT_SECRET.encode(), f"{email.lower()}:{code}".encode(), hashlib.sha256).hexdigest()
+
+
+def _code_fields(email: str, code: str, now: datetime) -> dict:
+    return {
+        "code_hash": hash_code(email, code),
+        "code_expires_at": now + CODE_TTL,
+        "attempts": 0,
+        "last_sent_at": now,
+    }
+
+
+async def issue_code(email: str) -> str:
+    """Start a fresh resend window with a new code (used at registration)"""
+    from database import verification_codes_collection
+
+    code = generate_code()
+    now = datetime.utcnow()
+    await verification_codes_collection.update_one(
+        {"email": email},
+        {"$set": {
+            **_code_fields(email, code, now),
+            "resend_count": 0,
+            "window_started_at": now,
+            "purge_at": now + max(CODE_TTL, RESEND_WINDOW),
+        }},
+        upsert=True
+    )
+    return code
+
+
+async def resend_code(email: str):
+    """
+    Replace the code, counting against MAX_RESENDS per RESEND_WINDOW
+    Returns (code, resends_remaining); raises ResendLimitExceeded when throttled
+    """
+    from database import verification_codes_collection
+
+    code = generate_code()
+    now = datetime.utcnow()
+    window_cutoff = now - RESEND_WINDOW
+
+    # Within the current window: one atomic conditional increment
+    doc = await verification_codes_collection.find_one_and_update(
+        {"email": email, "window_started_at": {"$gt": window_cutoff}, "resend_count": {"$lt": MAX_RESENDS}},
+        {
+            "$inc": {"resend_count": 1},
+            "$set": _code_fields(email, code, now),
+            "$max": {"purge_at": now + CODE_TTL},
+        },
+        projection={"_id": 0, "resend_count": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if doc:
+        return code, MAX_RESENDS - doc['resend_count']
+
+    # No document, or its window is over: start a new window. If an active window
+    # exists it is at the limit, the filter misses, and the upsert hits the unique email index.
+    try:
+        await verification_codes_collection.update_one(
+            {"email": email, "window_started_at": {"$lte": window_cutoff}},
+            {"$set": {
+                **_code_fields(email, code, now),
+                "resend_count": 1,
+                "window_started_at": now,
+                "purge_at": now + max(CODE_TTL, RESEND_WINDOW),
+            }},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        raise ResendLimitExceeded()
+    return code, MAX_RESENDS - 1
+
+
+async def check_code(email: str, code: str) -> Optional[str]:
+    """
+    Consume a valid code. Returns None on success, otherwise "expired" or "invalid"
+    """
+    from database import verification_codes_collection
+
+    now = datetime.utcnow()
+    code_hash = hash_code(email, code)
+    doc = await verification_codes_collection.find_one_and_delete({
+        "email": email,
+        "code_hash": code_hash,
+        "code_expires_at": {"$gt": now},
+        "attempts": {"$lt": MAX_VERIFY_ATTEMPTS},
+    })
+    if doc:
+        return None
+
+    # Failure path only: count the attempt and tell expired apart from wrong
+    doc = await verification_codes_collection.find_one_and_update(
+        {"email": email},
+        {"$inc": {"attempts": 1}},
+        projection={"_id": 0, "code_hash": 1, "code_expires_at": 1}
+    )
+    if doc and hmac.compare_digest(doc['code_hash'], code_hash) and doc['code_expires_at'] <= now:
+        return "expired"
+    return "invalid"
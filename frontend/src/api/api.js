@@ -3,6 +3,9 @@ import axios from 'axios';
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Resolve image references (thumbnail_url, profile_photo_url) returned by list endpoints
+export const imageUrl = (path) => (path ? `${BACKEND_URL}${path}` : null);
+
 // Create axios instance
 const api = axios.create({
   baseURL: API
@@ -35,6 +38,8 @@ export const providerAPI = {
   getProfile: () => api.get('/provider/profile'),
   updateProfile: (data) => api.put('/provider/profile', data),
   getAll: (params) => api.get('/providers', { params }),
+  // Providers free for a time slot: params.start (ISO date-time), params.duration in minutes
+  getAvailable: (params) => api.get('/providers/available', { params }),
   getDetail: (id) => api.get(`/providers/${id}`),
   getWallet: () => api.get('/provider/wallet')
 };
@@ -46,17 +51,72 @@ export const servicesAPI = {
   getOne: (id) => api.get(`/services/${id}`),
   update: (id, data) => api.put(`/services/${id}`, data),
   delete: (id) => api.delete(`/services/${id}`),
-  generateDescription: (data) => api.post('/ai/generate-description', data)
+  generateDescription: (data) => api.post('/ai/generate-description', data),
+  // Server-Sent Events over POST: calls onDelta(text) per token, resolves with the final description
+  streamDescription: async (data, onDelta, signal) => {
+    const token = localStorage.getItem('token');
+    const response = await fetch(`${API}/ai/generate-description/stream`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        Accept: 'text/event-stream',
+        ...(token ? { Authorization: `Bearer ${token}` } : {})
+      },
+      body: JSON.stringify(data),
+      signal
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`Description stream failed: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const frame = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        const event = (frame.match(/^event: (.*)$/m) || [])[1];
+        const payload = (frame.match(/^data: (.*)$/m) || [])[1];
+        if (!payload) continue;
+        const parsed = JSON.parse(payload);
+        if (event === 'delta') {
+          onDelta(parsed.text);
+        } else if (event === 'done') {
+          reader.cancel();
+          return parsed.description;
+        }
+      }
+    }
+    throw new Error('Description stream ended early');
+  }
 };
 
+// A fresh Idempotency-Key; keep it while retrying the same request
+export const newIdempotencyKey = () => (
+  window.crypto?.randomUUID
+    ? window.crypto.randomUUID()
+    : `${Date.now()}-${Math.random().toString(36).slice(2)}`
+);
+
+const idempotencyHeaders = (idempotencyKey) => (
+  idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {}
+);
+
 // Bookings API
 export const bookingsAPI = {
-  create: (data) => api.post('/bookings', data),
+  create: (data, idempotencyKey) => api.post('/bookings', data, { headers: idempotencyHeaders(idempotencyKey) }),
   getAll: () => api.get('/bookings'),
   getOne: (id) => api.get(`/bookings/${id}`),
   updateStatus: (id, status) => api.put(`/bookings/${id}/status`, { status }),
   // Bargaining endpoints
-  makeOffer: (bookingId, data) => api.post(`/bookings/${bookingId}/offer-price`, data),
+  makeOffer: (bookingId, data, idempotencyKey) => api.post(`/bookings/${bookingId}/offer-price`, data, {
+    headers: idempotencyHeaders(idempotencyKey)
+  }),
   getOffers: (bookingId) => api.get(`/bookings/${bookingId}/offers`),
   respondToOffer: (offerId, data) => api.put(`/offers/${offerId}/respond`, data)
 };
@@ -84,6 +144,11 @@ export const notificationsAPI = {
   markRead: (id) => api.put(`/notifications/${id}/read`)
 };
 
+// Dashboard API: bookings, wallet, notifications and profile status in one request
+export const dashboardAPI = {
+  get: () => api.get('/dashboard')
+};
+
 // Transactions API
 export const transactionsAPI = {
   getAll: () => api.get('/transactions')
@@ -91,7 +156,10 @@ export const transactionsAPI = {
 
 // Withdrawals API
 export const withdrawalsAPI = {
-  request: (data) => api.post('/withdrawals/request', data),
+  // Reuse idempotencyKey when retrying the same request so it is only applied once
+  request: (data, idempotencyKey) => api.post('/withdrawals/request', data, {
+    headers: idempotencyHeaders(idempotencyKey)
+  }),
   getAll: () => api.get('/withdrawals')
 };
 
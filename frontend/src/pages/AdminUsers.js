@@ -1,7 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useNavigate, Link } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
-import { adminAPI } from '../api/api';
+import { adminAPI, imageUrl } from '../api/api';
 import { Card, CardHeader, CardTitle, CardContent } from '../components/ui/card';
 import { Badge } from '../components/ui/badge';
 import { Button } from '../components/ui/button';
@@ -94,9 +94,9 @@ const AdminUsers = () => {
   const UserCard = ({ userData }) => (
     <div className="border rounded-lg p-4 hover:shadow-md transition-shadow bg-white">
       <div className="flex items-start gap-3 mb-3">
-        {userData.profile_photo ? (
+        {userData.profile_photo_url ? (
           <img 
-            src={userData.profile_photo} 
+            src={imageUrl(userData.profile_photo_url)} 
             alt={userData.full_name}
             className="w-12 h-12 rounded-full object-cover"
           />
@@ -1,6 +1,6 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
-import { servicesAPI, bookingsAPI } from '../api/api';
+import { servicesAPI, bookingsAPI, newIdempotencyKey } from '../api/api';
 import Navbar from '../components/Navbar';
 import { Card, CardHeader, CardTitle, CardContent } from '../components/ui/card';
 import { Button } from '../components/ui/button';
@@ -18,6 +18,8 @@ const BookService = () => {
   const [submitting, setSubmitting] = useState(false);
   const [error, setError] = useState('');
   const [success, setSuccess] = useState(false);
+  // Same key for resubmits of an unchanged form, so a double tap or retry books once
+  const pendingBooking = useRef(null);
   const [formData, setFormData] = useState({
     preferred_date: '',
     preferred_time: '',
@@ -78,7 +80,11 @@ const BookService = () => {
         estimated_budget: formData.estimated_budget ? parseFloat(formData.estimated_budget) : null
       };
 
-      const response = await bookingsAPI.create(bookingData);
+      const fingerprint = JSON.stringify(bookingData);
+      if (!pendingBooking.current || pendingBooking.current.fingerprint !== fingerprint) {
+        pendingBooking.current = { fingerprint, key: newIdempotencyKey() };
+      }
+      const response = await bookingsAPI.create(bookingData, pendingBooking.current.key);
       setSuccess(true);
       
       // Redirect to payment page
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { providerAPI, categoriesAPI } from '../api/api';
+import { providerAPI, categoriesAPI, imageUrl } from '../api/api';
 import Navbar from '../components/Navbar';
 import { Card, CardContent } from '../components/ui/card';
 import { Input } from '../components/ui/input';
@@ -193,9 +193,9 @@ const BrowseProviders = () => {
                 <Card className="h-full hover:shadow-lg transition-shadow cursor-pointer" data-testid={`provider-card-${provider.user.id}`}>
                   <CardContent className="p-6">
                     <div className="flex items-start gap-4 mb-4">
-                      {provider.user.profile_photo ? (
+                      {provider.user.profile_photo_url ? (
                         <img 
-                          src={provider.user.profile_photo} 
+                          src={imageUrl(provider.user.profile_photo_url)} 
                           alt={provider.user.full_name}
                           className="w-16 h-16 rounded-full object-cover border-2 border-blue-500"
                         />
@@ -1,7 +1,7 @@
 import React, { useState, useEffect, useRef } from 'react';
 import { useParams } from 'react-router-dom';
 import { useAuth } from '../context/AuthContext';
-import { messagesAPI, bookingsAPI } from '../api/api';
+import { messagesAPI, bookingsAPI, newIdempotencyKey } from '../api/api';
 import Navbar from '../components/Navbar';
 import { Card, CardHeader, CardTitle, CardContent } from '../components/ui/card';
 import { Input } from '../components/ui/input';
@@ -23,6 +23,7 @@ const Chat = () => {
   const [priceOffers, setPriceOffers] = useState([]);
   const [showOfferModal, setShowOfferModal] = useState(false);
   const messagesEndRef = useRef(null);
+  const pendingOffer = useRef(null);
 
   useEffect(() => {
     loadData();
@@ -103,10 +104,13 @@ const Chat = () => {
 
   const handleSendOffer = async (amount, message) => {
     try {
-      await bookingsAPI.makeOffer(bookingId, {
-        offered_price: amount,
-        message: message
-      });
+      const offer = { offer_amount: amount, message: message };
+      const fingerprint = JSON.stringify(offer);
+      if (!pendingOffer.current || pendingOffer.current.fingerprint !== fingerprint) {
+        pendingOffer.current = { fingerprint, key: newIdempotencyKey() };
+      }
+      await bookingsAPI.makeOffer(bookingId, offer, pendingOffer.current.key);
+      pendingOffer.current = null;
       // Reload offers and booking data
       const [offersRes, bookingRes] = await Promise.all([
         bookingsAPI.getOffers(bookingId),
@@ -123,8 +127,8 @@ const Chat = () => {
   const handleRespondToOffer = async (offerId, response, counterAmount = null) => {
     try {
       const data = {
-        response: response,
-        ...(counterAmount && { counter_offer: counterAmount })
+        action: response,
+        ...(counterAmount && { counter_amount: counterAmount })
       };
       await bookingsAPI.respondToOffer(offerId, data);
       // Reload offers and booking data
@@ -208,7 +212,7 @@ const Chat = () => {
             </CardHeader>
             <CardContent className="p-4 space-y-3">
               {priceOffers.map((offer, index) => {
-                const isOwnOffer = offer.offered_by === user.id;
+                const isOwnOffer = offer.sender_id === user.id;
                 const isProvider = user.id === booking.provider_id;
                 const canRespond = !isOwnOffer && offer.status === 'pending';
                 
@@ -217,7 +221,7 @@ const Chat = () => {
                     key={offer.id} 
                     className={`border rounded-lg p-3 ${
                       offer.status === 'accepted' ? 'bg-green-50 border-green-300' : 
-                      offer.status === 'rejected' ? 'bg-red-50 border-red-300' : 
+                      offer.status === 'declined' ? 'bg-red-50 border-red-300' : 
                       'bg-gray-50'
                     }`}
                   >
@@ -227,12 +231,12 @@ const Chat = () => {
                           {isOwnOffer ? 'You' : (isProvider ? 'Customer' : 'Provider')} offered:
                         </p>
                         <p className="text-xl font-bold text-blue-600">
-                          ₦{offer.offered_price.toLocaleString()}
+                          ₦{offer.offer_amount.toLocaleString()}
                         </p>
                       </div>
                       <Badge className={
                         offer.status === 'accepted' ? 'bg-green-100 text-green-800' :
-                        offer.status === 'rejected' ? 'bg-red-100 text-red-800' :
+                        offer.status === 'declined' ? 'bg-red-100 text-red-800' :
                         'bg-yellow-100 text-yellow-800'
                       }>
                         {offer.status}
@@ -271,7 +275,7 @@ const Chat = () => {
                         </Button>
                         <Button 
                           size="sm" 
-                          onClick={() => handleRespondToOffer(offer.id, 'reject')}
+                          onClick={() => handleRespondToOffer(offer.id, 'decline')}
                           variant="outline"
                           className="flex-1 text-red-600 hover:text-red-700"
                         >
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '../context/AuthContext';
-import { bookingsAPI } from '../api/api';
+import { bookingsAPI, dashboardAPI } from '../api/api';
 import Navbar from '../components/Navbar';
 import { Card, CardHeader, CardTitle, CardContent } from '../components/ui/card';
 import { Button } from '../components/ui/button';
@@ -25,12 +25,12 @@ const CustomerDashboard = () => {
 
   const loadData = async () => {
     try {
-      const response = await bookingsAPI.getAll();
-      setBookings(response.data);
+      const { data } = await dashboardAPI.get();
+      setBookings(data.bookings);
 
-      const pendingCount = response.data.filter(b => b.status === 'pending').length;
-      const confirmedCount = response.data.filter(b => b.status === 'accepted').length;
-      const completedCount = response.data.filter(b => b.status === 'customer_confirmed' || b.payment_status === 'paid').length;
+      const pendingCount = data.bookings.filter(b => b.status === 'pending').length;
+      const confirmedCount = data.bookings.filter(b => b.status === 'accepted').length;
+      const completedCount = data.bookings.filter(b => b.status === 'customer_confirmed' || b.payment_status === 'paid').length;
 
       setStats({
         pendingBookings: pendingCount,
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '../context/AuthContext';
-import { bookingsAPI, providerAPI, transactionsAPI } from '../api/api';
+import { bookingsAPI, dashboardAPI } from '../api/api';
 import Navbar from '../components/Navbar';
 import { Card, CardHeader, CardTitle, CardContent } from '../components/ui/card';
 import { Button } from '../components/ui/button';
@@ -29,29 +29,24 @@ const ProviderDashboard = () => {
 
   const loadData = async () => {
     try {
-      const [bookingsRes, profileRes, transactionsRes, walletRes] = await Promise.all([
-        bookingsAPI.getAll(),
-        providerAPI.getProfile(),
-        transactionsAPI.getAll(),
-        providerAPI.getWallet()
-      ]);
+      const { data } = await dashboardAPI.get();
 
-      setBookings(bookingsRes.data);
-      setProfile(profileRes.data);
-      setTransactions(transactionsRes.data);
-      setWallet(walletRes.data);
+      setBookings(data.bookings);
+      setProfile(data.profile);
+      setTransactions(data.transactions);
+      setWallet(data.wallet);
 
       // Calculate stats
-      const totalEarnings = walletRes.data.total_earned || 0;
+      const totalEarnings = data.wallet.total_earned || 0;
       
-      const pendingCount = bookingsRes.data.filter(b => b.status === 'pending').length;
-      const completedCount = bookingsRes.data.filter(b => b.payment_status === 'paid').length;
+      const pendingCount = data.bookings.filter(b => b.status === 'pending').length;
+      const completedCount = data.bookings.filter(b => b.payment_status === 'paid').length;
 
       setStats({
         totalEarnings,
         pendingBookings: pendingCount,
         completedBookings: completedCount,
-        averageRating: profileRes.data.average_rating || 0
+        averageRating: data.profile.average_rating || 0
       });
     } catch (error) {
       console.error('Failed to load data:', error);
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { servicesAPI, categoriesAPI } from '../api/api';
 import Navbar from '../components/Navbar';
 import MultiImageUpload from '../components/MultiImageUpload';
@@ -19,6 +19,7 @@ const ProviderServices = () => {
   const [dialogOpen, setDialogOpen] = useState(false);
   const [editingService, setEditingService] = useState(null);
   const [generatingDesc, setGeneratingDesc] = useState(false);
+  const descStreamRef = useRef(null);
   const [formData, setFormData] = useState({
     title: '',
     description: '',
@@ -35,7 +36,7 @@ const ProviderServices = () => {
   const loadData = async () => {
     try {
       const [servicesRes, categoriesRes] = await Promise.all([
-        servicesAPI.getAll(),
+        servicesAPI.getAll({ fields: 'description,images' }),
         categoriesAPI.getAll()
       ]);
       setServices(servicesRes.data);
@@ -54,15 +55,28 @@ const ProviderServices = () => {
     }
 
     setGeneratingDesc(true);
+    const request = { title: formData.title, category: formData.category };
+    const controller = new AbortController();
+    descStreamRef.current = controller;
+    let streamed = '';
     try {
-      const response = await servicesAPI.generateDescription({
-        title: formData.title,
-        category: formData.category
-      });
-      setFormData({ ...formData, description: response.data.description });
-    } catch (error) {
-      console.error('Failed to generate description:', error);
+      // Show tokens as they arrive instead of waiting for the full completion
+      const description = await servicesAPI.streamDescription(request, (text) => {
+        streamed += text;
+        setFormData((current) => ({ ...current, description: streamed }));
+      }, controller.signal);
+      setFormData((current) => ({ ...current, description }));
+    } catch (streamError) {
+      if (controller.signal.aborted) return;
+      console.error('Description stream failed, retrying without streaming:', streamError);
+      try {
+        const response = await servicesAPI.generateDescription(request);
+        setFormData((current) => ({ ...current, description: response.data.description }));
+      } catch (error) {
+        console.error('Failed to generate description:', error);
+      }
     } finally {
+      if (descStreamRef.current === controller) descStreamRef.current = null;
       setGeneratingDesc(false);
     }
   };
@@ -115,6 +129,8 @@ const ProviderServices = () => {
   };
 
   const resetForm = () => {
+    // Closing the form stops a description still streaming in; the server cancels the LLM call
+    if (descStreamRef.current) descStreamRef.current.abort();
     setFormData({
       title: '',
       description: '',
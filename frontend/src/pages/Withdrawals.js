@@ -1,10 +1,10 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import Navbar from '../components/Navbar';
 import { Card, CardHeader, CardTitle, CardContent } from '../components/ui/card';
 import { Button } from '../components/ui/button';
 import { Badge } from '../components/ui/badge';
-import { providerAPI, withdrawalsAPI } from '../api/api';
+import { providerAPI, withdrawalsAPI, newIdempotencyKey } from '../api/api';
 import { FiCreditCard, FiDollarSign, FiClock } from 'react-icons/fi';
 
 const Withdrawals = () => {
@@ -15,6 +15,8 @@ const Withdrawals = () => {
   const [loading, setLoading] = useState(true);
   const [requesting, setRequesting] = useState(false);
   const [error, setError] = useState('');
+  // One key per intended withdrawal; a retry after a timeout reuses it
+  const pendingRequest = useRef(null);
 
   useEffect(() => {
     loadData();
@@ -67,9 +69,14 @@ const Withdrawals = () => {
       return;
     }
 
+    if (!pendingRequest.current || pendingRequest.current.amount !== withdrawalAmount) {
+      pendingRequest.current = { amount: withdrawalAmount, key: newIdempotencyKey() };
+    }
+
     try {
       setRequesting(true);
-      await withdrawalsAPI.request({ amount: withdrawalAmount });
+      await withdrawalsAPI.request({ amount: withdrawalAmount }, pendingRequest.current.key);
+      pendingRequest.current = null;
       alert('Withdrawal request submitted successfully! It will be processed by admin.');
       setAmount('');
       loadData();